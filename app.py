@@ -1,10 +1,33 @@
 import streamlit as st
 import pandas as pd
-import plotly.express as px
+import numpy as np
 import datetime
 import base64
+import functools
+import os
+import re
+import time
+import uuid
 from io import BytesIO
 
+import figurer
+import tidtaking
+from eksport import ARK, VALGFRIE_ARK, ark_i_fil, bygg_excel, bygg_snapshot, finn_format, les_ark, tabell_hash
+from gjesteimport import fil_hash, fjern_duplikater, les_csv, les_forhandsvisning, les_svarliste
+from bryllup import Bryllup, Konflikt
+from lagring import Lagring, SqliteLagring
+from skjema import BORDREGLER, MAKS_ANTALL, OPPGAVE_STATUSER, POSTERINGSTYPER, PRIORITETER, RSVP_STATUSER
+from tidsplan import STANDARD_VARIGHET
+
+# Brukes til å legge ut en figur med ferdig spesifikasjon (se vis_figur). Finnes de ikke i
+# denne versjonen av Streamlit, brukes st.plotly_chart.
+try:
+    from streamlit.elements.lib.layout_utils import LayoutConfig
+    from streamlit.elements.lib.utils import compute_and_register_element_id
+    from streamlit.proto.PlotlyChart_pb2 import PlotlyChart as PlotlyChartProto
+except ImportError:
+    PlotlyChartProto = None
+
 # Sett sidekonfigurasjon
 st.set_page_config(
     page_title="Bryllupsplanlegger",
@@ -13,6 +36,10 @@ st.set_page_config(
     initial_sidebar_state="expanded"
 )
 
+# Tidtaking av seksjonene i denne kjøringen (se tidtaking.py). Minnet måles bare når
+# ytelsespanelet er slått på, siden tracemalloc gjør alt annet tregere.
+kjøring = tidtaking.start_kjøring(st.session_state, "", mål_minne=st.session_state.get('vis_ytelsespanel', False))
+
 # Funksjon for å eksportere én DataFrame til Excel (brukes i andre funksjoner om ønskelig)
 def download_excel(df, sheet_name):
     output = BytesIO()
@@ -22,66 +49,389 @@ def download_excel(df, sheet_name):
     b64 = base64.b64encode(processed_data).decode()
     return f'data:application/vnd.openxmlformats-officedocument.spreadsheetml.sheet;base64,{b64}'
 
+# Maks antall ferdige arbeidsbøker som holdes i hurtigbufferen (delt mellom alle økter)
+EKSPORT_MAKS_ANTALL = 16
+
+# Funksjon for å hente tabellene som skal med i eksporten, i arkrekkefølge.
+# Ark fra en opplastet fil som ingen side har trengt ennå, leses ikke her; de tas med
+# som en funksjon som leser arket først når eksporten faktisk bygges.
+def excel_tabeller():
+    return hent_bryllup().eksporttabeller(ARK)
+
+def _les_ventende(tabeller):
+    return {ark: tabell() if callable(tabell) else tabell for ark, tabell in tabeller.items()}
+
+# Bygger arbeidsboken. Resultatet caches på innholdsnøkkelen, så samme data gir aldri
+# en ny bygging, og max_entries holder minnebruken flat uansett antall økter.
+@st.cache_data(max_entries=EKSPORT_MAKS_ANTALL, show_spinner=False)
+def _bygg_excel(nøkkel, _tabeller):
+    return bygg_excel(_tabeller)
+
+@st.cache_data(max_entries=EKSPORT_MAKS_ANTALL, show_spinner=False)
+def _bygg_snapshot(nøkkel, _tabeller):
+    return bygg_snapshot(_tabeller)
+
+def _eksport_nøkkel(tabeller):
+    return tuple((ark, tabell_hash(df)) for ark, df in tabeller.items())
+
 # Funksjon for å eksportere alle dataene til én Excel-fil med flere ark
-def save_all_to_excel():
-    output = BytesIO()
-    with pd.ExcelWriter(output, engine='xlsxwriter') as writer:
-        st.session_state.gjester.to_excel(writer, sheet_name="Gjester", index=False)
-        st.session_state.budsjett.to_excel(writer, sheet_name="Budsjett", index=False)
-        st.session_state.oppgaver.to_excel(writer, sheet_name="Oppgaver", index=False)
-        st.session_state.tidsplan.to_excel(writer, sheet_name="Tidsplan", index=False)
-    return output.getvalue()
-
-# Funksjon for å initiere session_state hvis de ikke eksisterer
-def init_session_state():
-    if 'gjester' not in st.session_state:
-        st.session_state.gjester = pd.DataFrame({
-            'Navn': [],
-            'Relasjon': [],
-            'Invitert': [],
-            'RSVP Status': [],
-            'Antall gjester': [],
-            'Spesielle behov': []
-        })
-    
-    if 'budsjett' not in st.session_state:
-        st.session_state.budsjett = pd.DataFrame({
-            'Kategori': ['Lokale', 'Catering', 'Fotograf', 'Blomster', 'Kake', 'Klær', 'Ringer', 'Dekorasjoner', 'Transport', 'Musikk', 'Invitasjoner', 'Annet'],
-            'Budsjettert': [0] * 12,
-            'Faktisk': [0] * 12,
-            'Betalt': [0] * 12,
-            'Beskrivelse': [''] * 12
-        })
-    
-    if 'oppgaver' not in st.session_state:
-        st.session_state.oppgaver = pd.DataFrame({
-            'Oppgave': [],
-            'Beskrivelse': [],
-            'Frist': [],
-            'Ansvarlig': [],
-            'Status': [],
-            'Prioritet': [],
-            'Notater': []
-        })
-    
-    if 'tidsplan' not in st.session_state:
-        st.session_state.tidsplan = pd.DataFrame({
-            'Tid': [],
-            'Aktivitet': [],
-            'Sted': [],
-            'Ansvarlig': [],
-            'Notater': []
-        })
+def save_all_to_excel(tabeller=None):
+    if tabeller is None:
+        tabeller = excel_tabeller()
+    tabeller = _les_ventende(tabeller)
+    return _bygg_excel(_eksport_nøkkel(tabeller), tabeller)
+
+# Funksjon for å lagre alle dataene som et øyeblikksbilde (se eksport.py)
+def save_all_to_snapshot(tabeller=None):
+    if tabeller is None:
+        tabeller = excel_tabeller()
+    tabeller = _les_ventende(tabeller)
+    return _bygg_snapshot(_eksport_nøkkel(tabeller), tabeller)
+
+# Bryllupet økten planlegger, fra adressen (?bryllup=navn). Alle økter med samme
+# bryllup deler de samme dataene.
+STANDARD_BRYLLUP = "standard"
+
+def valgt_bryllup():
+    navn = re.sub(r"[^\w-]", "", st.query_params.get("bryllup", STANDARD_BRYLLUP))
+    return navn or STANDARD_BRYLLUP
+
+# Lagringen deles av alle økter i prosessen. Som standard lagres dataene i en lokal
+# SQLite-fil (BRYLLUP_DB, med navnet på bryllupet lagt til for andre bryllup enn
+# standard); med BRYLLUP_LAGRING=minne finnes de bare så lenge prosessen lever.
+@st.cache_resource
+def hent_lagring(bryllup_id):
+    if os.environ.get("BRYLLUP_LAGRING", "sqlite") == "minne":
+        return Lagring()
+    sti = os.environ.get("BRYLLUP_DB", "bryllupsdata.db")
+    if bryllup_id != STANDARD_BRYLLUP:
+        rot, ending = os.path.splitext(sti)
+        sti = f"{rot}-{bryllup_id}{ending}"
+    return SqliteLagring(sti)
+
+# Ett felles lager per bryllup i prosessen (se bryllup.py). Øktene har ingen egne
+# kopier av tabellene; alle endringer går gjennom lageret.
+@st.cache_resource
+def _bryllup(bryllup_id):
+    return Bryllup(hent_lagring(bryllup_id))
+
+def hent_bryllup():
+    return _bryllup(valgt_bryllup())
+
+# ID for økten, slik at lageret kan skille endringer herfra fra andres
+def økt_id():
+    return st.session_state.setdefault('økt_id', uuid.uuid4().hex)
+
+# Et ark fra en opplastet fil leses bare én gang per filinnhold, og deles av alle økter
+@st.cache_data(max_entries=EKSPORT_MAKS_ANTALL, show_spinner="Leser fil ...")
+def _les_ark(filhash, ark, format, _innhold):
+    return les_ark(_innhold, ark, format)
+
+# Tabellene lastes inn i lageret første gang en side trenger dem: fra en opplastet fil
+# hvis den har arket, ellers fra lagringen hvis de finnes der, ellers som nye tabeller.
+def hent_tabell(navn):
+    bryllup = hent_bryllup()
+    if not bryllup.er_lastet(navn):
+        with kjøring.spenn(f"Innlasting: {navn}"):
+            return bryllup.tabell(navn)
+    return bryllup.tabell(navn)
+
+def hent_gjestelager():
+    bryllup = hent_bryllup()
+    if not bryllup.er_lastet("Gjester"):
+        with kjøring.spenn("Innlasting: Gjester"):
+            return bryllup.gjestelager()
+    return bryllup.gjestelager()
+
+# Nøkkeltallene for budsjettet, summert fra posteringene én gang per utgave av budsjettet
+# og posteringene (se nokkeltall.py). Nøkkeltallene for gjestene vedlikeholdes av gjestelageret.
+def hent_budsjetttall():
+    hent_tabell("Posteringer")
+    hent_tabell("Budsjett")
+    return hent_bryllup().budsjetttall()
+
+# Oppgavelageret med fristene sortert (se oppgaver.py)
+def hent_oppgavelager():
+    bryllup = hent_bryllup()
+    if not bryllup.er_lastet("Oppgaver"):
+        with kjøring.spenn("Innlasting: Oppgaver"):
+            return bryllup.oppgavelager()
+    return bryllup.oppgavelager()
+
+# Tidsindeksen for tidsplanen (se tidsplan.py), bygget én gang per utgave av tidsplanen
+def hent_tidsindeks():
+    hent_tabell("Tidsplan")
+    return hent_bryllup().tidsindeks()
+
+# Skjemaene for å redigere én rad: widget-nøkkel per kolonne. Versjonen av raden da
+# økten begynte å redigere den, ligger i session_state under redigeringsversjon-nøkkelen.
+REDIGERING = {
+    'Gjester': {
+        'RSVP Status': "oppdater_rsvp_status_{}",
+        'Antall gjester': "oppdater_antall_gjester_{}",
+        'Spesielle behov': "oppdater_spesielle_behov_{}",
+    },
+    'Budsjett': {
+        'Budsjettert': "budsjett_budsjettert_{}",
+        'Beskrivelse': "budsjett_beskrivelse_{}",
+    },
+    'Oppgaver': {
+        'Status': "oppgave_status_{}",
+        'Prioritet': "oppgave_prioritet_{}",
+        'Frist': "oppgave_frist_{}",
+        'Ansvarlig': "oppgave_ansvarlig_{}",
+        'Notater': "oppgave_notater_{}",
+    },
+    'Tidsplan': {
+        'Aktivitet': "aktivitet_aktivitet_{}",
+        'Tid': "aktivitet_tid_{}",
+        'Slutt': "aktivitet_slutt_{}",
+        'Sted': "aktivitet_sted_{}",
+        'Ansvarlig': "aktivitet_ansvarlig_{}",
+        'Notater': "aktivitet_notater_{}",
+    },
+}
+
+# Verdien slik den settes i et skjemafelt: dato- og tidsfelt tar datetime (None når
+# feltet er tomt), mens tabellene har Timestamp og NaT
+def skjemaverdi(verdi):
+    if verdi is pd.NaT:
+        return None
+    if isinstance(verdi, pd.Timestamp):
+        return verdi.to_pydatetime()
+    return verdi
+
+# Verdien i et skjemafelt slik den står i tabellen, så de kan sammenlignes: datofelt gir
+# datetime.date og tidsfelt datetime.datetime
+def tabellverdi(verdi):
+    if verdi is None or verdi is pd.NaT:
+        return None
+    if isinstance(verdi, datetime.date):
+        return pd.Timestamp(verdi)
+    return verdi
+
+def _versjonsnøkkel(tabell, nøkkel):
+    return f"redigeringsversjon_{tabell}_{nøkkel}"
+
+# Versjonen av dataene da økten begynte å redigere raden. Settes til versjonen av det
+# som vises (versjon) første gang skjemaet vises for raden.
+def redigeringsversjon(tabell, nøkkel, versjon):
+    return st.session_state.setdefault(_versjonsnøkkel(tabell, nøkkel), versjon)
+
+# Glemmer at økten redigerer raden, slik at skjemaet viser verdiene i lageret neste gang
+def glem_redigering(tabell, nøkkel):
+    st.session_state.pop(_versjonsnøkkel(tabell, nøkkel), None)
+    for mal in REDIGERING[tabell].values():
+        st.session_state.pop(mal.format(nøkkel), None)
+
+# Som glem_redigering, for et skjema som allerede er vist i denne kjøringen. Verdiene
+# i skjemaet kan ikke fjernes etter at det er vist, så de glemmes i neste kjøring.
+def glem_redigering_senere(tabell, nøkkel):
+    st.session_state.pop(_versjonsnøkkel(tabell, nøkkel), None)
+    st.session_state.setdefault('glem_redigering', []).append((tabell, nøkkel))
+
+# Glemmer redigeringen av alle radene i tabellen
+def glem_all_redigering(tabell):
+    prefikser = tuple([_versjonsnøkkel(tabell, "")] + [mal.format("") for mal in REDIGERING[tabell].values()])
+    for nøkkel in [nøkkel for nøkkel in st.session_state if str(nøkkel).startswith(prefikser)]:
+        del st.session_state[nøkkel]
+
+# Henter inn endringer andre økter har gjort siden forrige kjøring, også i andre
+# prosesser som deler lagringen (se Bryllup.synkroniser). Tabellene leses
+# direkte fra lageret, så her er det bare skjemaene for rader andre har endret som må
+# oppdateres: er skjemaet urørt, vises de nye verdiene; har økten endret noe i det, blir
+# det stående, og lagringen gir en konflikt.
+def hent_endringer():
+    for tabell, nøkkel in st.session_state.pop('glem_redigering', []):
+        glem_redigering(tabell, nøkkel)
+    bryllup = hent_bryllup()
+    bryllup.synkroniser()
+    sett = st.session_state.get('sett_versjon')
+    st.session_state.sett_versjon = bryllup.versjon
+    if sett is None or st.session_state.get('sett_bryllup') != valgt_bryllup():
+        st.session_state.sett_bryllup = valgt_bryllup()
+        return
+    endringer = bryllup.endringer_siden(sett)
+    if endringer is None:
+        for tabell in REDIGERING:
+            glem_all_redigering(tabell)
+        st.toast("Dataene er endret av andre og lest inn på nytt")
+        return
+    andres = [endring for endring in endringer if endring.økt != økt_id()]
+    for endring in andres:
+        if endring.handling == 'erstattet':
+            if endring.tabell in REDIGERING:
+                glem_all_redigering(endring.tabell)
+        elif endring.gammel is not None and endring.tabell in REDIGERING:
+            urørt = all(
+                tabellverdi(st.session_state.get(mal.format(endring.nøkkel), endring.gammel[kolonne])) == tabellverdi(endring.gammel[kolonne])
+                for kolonne, mal in REDIGERING[endring.tabell].items()
+            )
+            if urørt:
+                glem_redigering(endring.tabell, endring.nøkkel)
+    if andres:
+        st.toast(f"{len(andres)} endringer fra andre planleggere er hentet inn")
+
+# Deler av siden som kjøres på nytt for seg (st.fragment): når et filter eller skjema
+# inne i delen endres, kjøres bare delen, ikke hele skriptet. Delen tas tid på som et
+# spenn i kjøringen; kjøres den for seg, blir det en egen kjøring i ytelsespanelet, og
+# endringer fra andre økter hentes inn før delen vises.
+def seksjon(navn):
+    def dekoratør(funksjon):
+        @st.fragment
+        @functools.wraps(funksjon)
+        def kjør():
+            global kjøring
+            if kjøring.totalt is None:
+                with kjøring.spenn(navn):
+                    return funksjon()
+            kjøring = tidtaking.start_kjøring(st.session_state, f"{side}: {navn}", mål_minne=st.session_state.get('vis_ytelsespanel', False))
+            try:
+                hent_endringer()
+                with kjøring.spenn(navn):
+                    return funksjon()
+            finally:
+                kjøring.avslutt()
+        return kjør
+    return dekoratør
+
+# Etter en endring kjøres hele siden på nytt, slik at også delene utenfor skjemaet viser
+# den. Meldingen vises når siden er kjørt.
+def fullfør(melding):
+    st.session_state.melding = melding
+    st.rerun()
+
+# Viser en figur fra figurer.py, bygget med lag_figur(*args). versjon er det figuren
+# bygges fra (som versjonene av tabellene bak den, se Bryllup.endret_i); er den uendret,
+# hentes spesifikasjonen fra hurtigbufferen. Grafen legges ut slik st.plotly_chart gjør
+# det, men med den ferdige spesifikasjonen, siden st.plotly_chart lager den på nytt ved
+# hver kjøring. Gir False når figuren ikke har noe å vise. Tiden det tok vises under
+# figuren når "Vis figurtider" er slått på.
+def vis_figur(navn, versjon, lag_figur, *args):
+    start = time.perf_counter()
+    nøkkel = (valgt_bryllup(), navn, versjon)
+    spesifikasjon, fra_hurtigbuffer = figurer.spesifikasjon(nøkkel, lag_figur, *args)
+    if spesifikasjon is None:
+        return False
+    if PlotlyChartProto is None:
+        import plotly.io
+
+        st.plotly_chart(plotly.io.from_json(spesifikasjon), width="stretch", key=f"figur_{navn}")
+    else:
+        figur = PlotlyChartProto(spec=spesifikasjon, config="{}", theme="streamlit")
+        figur.id = compute_and_register_element_id(
+            "plotly_chart", user_key=f"figur_{navn}", key_as_main_identity=False, dg=st._main,
+            figur=repr(nøkkel),
+        )
+        st._main._enqueue("plotly_chart", figur, layout_config=LayoutConfig(width="stretch", height=450))
+    millisekunder = (time.perf_counter() - start) * 1000
+    st.session_state.setdefault('figurtider', {})[navn] = (millisekunder, fra_hurtigbuffer)
+    if st.session_state.get('vis_figurtider'):
+        kilde = "fra hurtigbuffer" if fra_hurtigbuffer else "bygget på nytt"
+        st.caption(f"Tegnet på {millisekunder:.1f} ms ({kilde})")
+    return True
 
-# Initier session_state
-init_session_state()
+# Gjestetabellen vises én side om gangen. Filtrering, sortering og utsnitt gjøres i
+# lageret, og bare radene på siden sendes til nettleseren.
+GJESTE_SORTERING = {"Lagt til": None, "Navn": "Navn", "Relasjon": "Relasjon", "RSVP Status": "RSVP Status", "Antall gjester": "Antall gjester"}
+RADER_PER_SIDE = [50, 100, 250, 500]
+
+# Henter siden av gjestetabellen som er valgt i sidevelgeren med nøkkelen (se sidevelger).
+# Et nytt søk, filter eller en ny sortering begynner på første side, og er gjester
+# slettet så siden ikke finnes lenger, vises den siste. Returnerer (gjesteside, sidenummer,
+# antall sider).
+def hent_gjesteside(nøkkel, tekst, filtre, sorter_etter=None, stigende=True, per_side=RADER_PER_SIDE[0]):
+    valg = (tekst, tuple(sorted(filtre.items())), sorter_etter, stigende, per_side)
+    if st.session_state.get(f"{nøkkel}_valg") != valg:
+        st.session_state[f"{nøkkel}_valg"] = valg
+        st.session_state[nøkkel] = 1
+    sidenummer = st.session_state.get(nøkkel, 1)
+    gjesteside = hent_bryllup().gjesteside(tekst, filtre, sorter_etter, stigende, (sidenummer - 1) * per_side, per_side)
+    antall_sider = max(1, -(-gjesteside.antall // per_side))
+    if sidenummer > antall_sider:
+        sidenummer = st.session_state[nøkkel] = antall_sider
+        gjesteside = hent_bryllup().gjesteside(tekst, filtre, sorter_etter, stigende, (sidenummer - 1) * per_side, per_side)
+    return gjesteside, sidenummer, antall_sider
+
+# ID-ene til radene som er forskjellige i de to tabellene (eller bare finnes i én av dem)
+def endrede_rader(før, nå):
+    def rader(df):
+        return set(df.astype(object).where(df.notna(), None).itertuples(index=False, name=None))
+    return sorted({rad[0] for rad in rader(før) ^ rader(nå)})
+
+# Gjester som kan velges i en nedtrekksliste, og rader i tabellen for masseredigering
+MAKS_VALG = 200
+RUTENETT_RADER = 100
+
+# Navn på gjester som ble hoppet over i en CSV-import, som nevnes i meldingen
+VISTE_HOPPET_OVER = 10
+
+# Posteringer som vises i listen, nyeste først
+POSTERING_RADER = 200
+
+# Beløp beholdes som tall i tabellene; tabellen viser dem med tusenskille
+def kronekolonne(navn):
+    return st.column_config.NumberColumn(f"{navn} (kr)", format="localized")
+
+# Plasser per bord i en ny bordplan når ingen bord er valgt ennå
+STANDARD_PLASSER = 8
+
+# Oppgaver med frist de neste dagene på oversikten, og oppgaver som vises i en liste
+OPPGAVE_DAGER = 7
+OPPGAVE_RADER = 200
+
+# Viser navnet, og ID-en i tillegg når flere gjester har samme navn
+def gjest_etikett(gjestelager, gjest_id):
+    if gjest_id not in gjestelager:
+        return f"#{gjest_id}"
+    navn = gjestelager.navn(gjest_id)
+    if len(gjestelager.ider_for_navn(navn)) > 1:
+        return f"{navn} (#{gjest_id})"
+    return navn
+
+# Etiketter for oppgavene i en nedtrekksliste: oppgaven og den ansvarlige, og ID-en i
+# tillegg når flere oppgaver får samme etikett
+def oppgave_etiketter(oppgaver):
+    etiketter = pd.Series([
+        f"{oppgave} ({ansvarlig})" if ansvarlig else oppgave
+        for oppgave, ansvarlig in zip(oppgaver['Oppgave'].tolist(), oppgaver['Ansvarlig'].tolist())
+    ], dtype='str')
+    flere = etiketter.duplicated(keep=False).tolist()
+    return {
+        oppgave_id: f"{etikett} (#{oppgave_id})" if flere_like else etikett
+        for oppgave_id, etikett, flere_like in zip(oppgaver['ID'].tolist(), etiketter.tolist(), flere)
+    }
+
+# Etiketter for aktivitetene i en nedtrekksliste: starttid (hvis den er satt), aktivitet og
+# sted, og ID-en i tillegg når flere aktiviteter får samme etikett
+def aktivitet_etiketter(aktiviteter):
+    etiketter = pd.Series([
+        (f"{tid:%d.%m. %H:%M} " if pd.notna(tid) else "") + aktivitet + (f" ({sted})" if sted else "")
+        for tid, aktivitet, sted in zip(aktiviteter['Tid'].tolist(), aktiviteter['Aktivitet'].tolist(), aktiviteter['Sted'].tolist())
+    ], dtype='str')
+    flere = etiketter.duplicated(keep=False).tolist()
+    return {
+        aktivitet_id: f"{etikett} (#{aktivitet_id})" if flere_like else etikett
+        for aktivitet_id, etikett, flere_like in zip(aktiviteter['ID'].tolist(), etiketter.tolist(), flere)
+    }
+
+def sidevelger(nøkkel, gjesteside, sidenummer, antall_sider, per_side):
+    col_side, col_vises = st.columns([1, 3])
+    with col_side:
+        st.number_input("Side", min_value=1, max_value=antall_sider, step=1, key=nøkkel)
+    with col_vises:
+        første = (sidenummer - 1) * per_side + 1
+        st.caption(f"Viser {første}–{første + len(gjesteside.rader) - 1} av {gjesteside.antall} gjester (side {sidenummer} av {antall_sider})")
 
 # Sidebar for navigasjon
 st.sidebar.title("Bryllupsplanlegger 💍")
 side = st.sidebar.radio(
     "Naviger til:",
-    ["Oversikt", "Gjestehåndtering", "Budsjett"]
+    ["Oversikt", "Gjestehåndtering", "Budsjett", "Oppgaver", "Tidsplan", "Bordplassering"]
 )
+kjøring.navn = side
+st.sidebar.checkbox("Vis figurtider", key="vis_figurtider")
+st.sidebar.checkbox("Vis ytelsespanel", key="vis_ytelsespanel")
 
 # Fargeskjema
 primary_color = "#FF4B4B"
@@ -104,6 +454,10 @@ st.markdown("""
     </style>
     """, unsafe_allow_html=True)
 
+hent_endringer()
+if 'melding' in st.session_state:
+    st.toast(st.session_state.pop('melding'), icon="✅")
+
 # ==============================
 # SIDER
 # ==============================
@@ -114,24 +468,37 @@ if side == "Oversikt":
     
     # --------------------------------------
     # Excel-import: Ekspanderbar seksjon
-    with st.expander("Last opp Excel-fil for å fortsette der du var", expanded=False):
-        uploaded_excel = st.file_uploader("Velg Excel-fil", type=["xlsx"], key="excel_uploader_dashboard")
-        if uploaded_excel is not None:
+    with st.expander("Last opp Excel-fil eller øyeblikksbilde for å fortsette der du var", expanded=False), kjøring.spenn("Opplasting"):
+        uploaded_excel = st.file_uploader("Velg Excel-fil eller øyeblikksbilde", type=["xlsx", "zip"], key="excel_uploader_dashboard")
+        # Filen tas i bruk én gang per opplasting. Arkene leses ikke her, men først
+        # når en side trenger tabellen (se hent_tabell). Filen erstatter dataene for
+        # alle som planlegger bryllupet.
+        if uploaded_excel is not None and uploaded_excel.file_id != st.session_state.get('innlest_fil_id'):
             try:
-                xls = pd.ExcelFile(uploaded_excel)
-                st.session_state.gjester = pd.read_excel(xls, sheet_name="Gjester")
-                st.session_state.budsjett = pd.read_excel(xls, sheet_name="Budsjett")
-                st.session_state.oppgaver = pd.read_excel(xls, sheet_name="Oppgaver")
-                st.session_state.tidsplan = pd.read_excel(xls, sheet_name="Tidsplan")
-                st.success("Data lastet fra Excel!")
+                innhold = uploaded_excel.getvalue()
+                # Formatet gjenkjennes ut fra innholdet i filen
+                format = finn_format(innhold)
+                i_fil = ark_i_fil(innhold, format)
+                mangler = [ark for ark in ARK if ark not in i_fil and ark not in VALGFRIE_ARK]
+                if mangler:
+                    raise ValueError(f"Filen mangler arkene {', '.join(mangler)}")
+                filhash = fil_hash(innhold)
+                hent_bryllup().vent_på_fil(
+                    {ark: functools.partial(_les_ark, filhash, ark, format, innhold) for ark in ARK},
+                    økt_id()
+                )
+                for tabell in REDIGERING:
+                    glem_all_redigering(tabell)
+                st.session_state.innlest_fil_id = uploaded_excel.file_id
+                st.success("Data lastet fra fil!")
             except Exception as e:
-                st.error(f"Kunne ikke laste Excel-fil: {e}")
+                st.error(f"Kunne ikke laste filen: {e}")
     # --------------------------------------
     
     # Øvre rad: Bryllupsdato og budsjettoversikt
     col_date, col_budget = st.columns(2)
     
-    with col_date:
+    with col_date, kjøring.spenn("Nedtelling"):
         st.subheader("Nedtelling")
         # Hardkodet bryllupsdato: 31. mai
         today = datetime.date.today()
@@ -143,46 +510,52 @@ if side == "Oversikt":
         st.markdown("**Bryllupsdato: 31. mai**")
         dager_igjen = (bryllupsdato - today).days
         st.markdown(f"### 🗓️ {dager_igjen} dager igjen!")
+
+    # Tallene regnes ut fra de sorterte fristene, uten å gå gjennom oppgavene
+    with col_date, kjøring.spenn("Oppgavetall"):
+        oppgavetall = hent_oppgavelager().tall(today, OPPGAVE_DAGER)
+        col_forfalt, col_snart, col_åpne = st.columns(3)
+        col_forfalt.metric("Forfalte oppgaver", oppgavetall.forfalt)
+        col_snart.metric(f"Frist neste {OPPGAVE_DAGER} dager", oppgavetall.snart)
+        col_åpne.metric("Åpne oppgaver", oppgavetall.åpne)
     
-    with col_budget:
+    # Endres totalbudsjettet, kjøres bare denne boksen på nytt
+    @seksjon("Budsjettoversikt")
+    def budsjettboks():
         st.subheader("Budsjettoversikt")
         if 'budsjett_total' not in st.session_state:
             st.session_state.budsjett_total = 160000
         budsjett_total = st.number_input("Totalt budsjett", min_value=0, value=st.session_state.budsjett_total, key="dashboard_budsjett_total")
         st.session_state.budsjett_total = budsjett_total
-        brukt = st.session_state.budsjett['Faktisk'].sum()
+        brukt = hent_budsjetttall().totalt['Faktisk']
         prosent = int(brukt / budsjett_total * 100) if budsjett_total else 0
         st.markdown(f"### 💰 {brukt:,.0f} kr brukt av {budsjett_total:,.0f} kr ({prosent}%)")
-    
+
+    with col_budget:
+        budsjettboks()
+
     st.markdown("---")
     
     # Nøkkeltall
     st.markdown("## Nøkkeltall")
     col1, col2, col3, col4 = st.columns(4)
 
-    # Håndter tomme dataframes ved å sjekke om den er tom
-    inviterte = st.session_state.gjester['Antall gjester'].sum() if not st.session_state.gjester.empty else 0
-
-    rsvp_ja = st.session_state.gjester.loc[
-        st.session_state.gjester['RSVP Status'] == 'Kommer', 'Antall gjester'
-    ].sum() if not st.session_state.gjester.empty else 0
+    with kjøring.spenn("Nøkkeltall"):
+        # Tallene vedlikeholdes ved hver endring, så her slipper vi å gå gjennom gjestelisten
+        gjestetall = hent_gjestelager().tall
+        inviterte = gjestetall.antall_gjester
+        rsvp_ja = gjestetall.status('Kommer')
+        rsvp_nei = gjestetall.status('Kommer ikke')
+        rsvp_venter = gjestetall.status('Venter på svar')
 
-    rsvp_nei = st.session_state.gjester.loc[
-        st.session_state.gjester['RSVP Status'] == 'Kommer ikke', 'Antall gjester'
-    ].sum() if not st.session_state.gjester.empty else 0
-
-    rsvp_venter = st.session_state.gjester.loc[
-        st.session_state.gjester['RSVP Status'] == 'Venter på svar', 'Antall gjester'
-    ].sum() if not st.session_state.gjester.empty else 0
-
-    with col1:
-        st.metric(label="Inviterte gjester", value=inviterte)
-    with col2:
-        st.metric(label="Bekreftet kommer", value=rsvp_ja)
-    with col3:
-        st.metric(label="Bekreftet kommer ikke", value=rsvp_nei)
-    with col4:
-        st.metric(label="Venter på svar", value=rsvp_venter)
+        with col1:
+            st.metric(label="Inviterte gjester", value=inviterte)
+        with col2:
+            st.metric(label="Bekreftet kommer", value=rsvp_ja)
+        with col3:
+            st.metric(label="Bekreftet kommer ikke", value=rsvp_nei)
+        with col4:
+            st.metric(label="Venter på svar", value=rsvp_venter)
 
 
     
@@ -192,39 +565,39 @@ if side == "Oversikt":
     st.markdown("## Statistikk")
     col_chart1, col_chart2 = st.columns(2)
     
-    with col_chart1:
+    with col_chart1, kjøring.spenn("Figur: RSVP-status"):
         st.markdown("### RSVP-status")
         if inviterte > 0:
-            rsvp_data = pd.DataFrame({
-                'Status': ['Kommer', 'Kommer ikke', 'Venter på svar'],
-                'Antall': [rsvp_ja, rsvp_nei, rsvp_venter]
-            })
-            fig = px.pie(rsvp_data, names='Status', values='Antall', 
-                         title='RSVP-status',
-                         color_discrete_sequence=['#ffc107', '#28a745', '#dc3545'])
-            st.plotly_chart(fig, use_container_width=True)
+            vis_figur("rsvp_status", (rsvp_ja, rsvp_nei, rsvp_venter), figurer.rsvp_kake, rsvp_ja, rsvp_nei, rsvp_venter)
         else:
             st.info("Ingen RSVP-data tilgjengelig.")
     
-    with col_chart2:
+    with col_chart2, kjøring.spenn("Figur: budsjettfordeling"):
         st.markdown("### Budsjettfordeling")
-        budget_data = st.session_state.budsjett.copy()
-        budget_data = budget_data[budget_data['Budsjettert'] > 0]
-        if not budget_data.empty:
-            fig = px.bar(budget_data, x='Kategori', y=['Budsjettert', 'Faktisk'], 
-                         title='Budsjett vs. Faktiske utgifter',
-                         barmode='group',
-                         color_discrete_sequence=[primary_color, secondary_color])
-            st.plotly_chart(fig, use_container_width=True)
-        else:
+        tall = hent_budsjetttall()
+        farger = (primary_color, secondary_color)
+        versjon = (hent_bryllup().endret_i("Budsjett", "Posteringer"), farger)
+        if not vis_figur("budsjettfordeling", versjon, figurer.budsjettfordeling, tall, farger):
             st.info("Fyll inn budsjettet for å se fordelingen.")
     
     st.markdown("---")
     
     # Eksportering av data
     st.markdown("## Eksporter Data")
-    if st.download_button("Lagre data til Excel", data=save_all_to_excel(), file_name="bryllupsdata.xlsx", mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"):
-        st.success("Data eksportert!")
+    col_excel, col_snapshot = st.columns(2)
+    
+    # Tabellene hentes og filene bygges først når knappen trykkes (ikke ved hver omkjøring
+    # av siden). Knappen kjører funksjonen utenfor økten, så bryllupet velges her.
+    bryllup = hent_bryllup()
+    with col_excel, kjøring.spenn("Eksportknapper"):
+        if st.download_button("Lagre data til Excel", data=lambda: save_all_to_excel(bryllup.eksporttabeller(ARK)), file_name="bryllupsdata.xlsx", mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"):
+            st.success("Data eksportert!")
+    
+    # Øyeblikksbildet er mye raskere å lagre og laste inn igjen enn Excel, men kan bare
+    # åpnes av bryllupsplanleggeren
+    with col_snapshot, kjøring.spenn("Eksportknapper"):
+        if st.download_button("Lagre øyeblikksbilde", data=lambda: save_all_to_snapshot(bryllup.eksporttabeller(ARK)), file_name="bryllupsdata.zip", mime="application/zip"):
+            st.success("Øyeblikksbilde lagret!")
 
 
 # Gjestehåndtering side
@@ -233,89 +606,108 @@ elif side == "Gjestehåndtering":
     
     tab1, tab2, tab3 = st.tabs(["Oversikt", "Legg til gjester", "Rediger gjester"])
     
-    with tab1:
+    # Endres et filter, kjøres bare filtrene og tabellen på nytt
+    @seksjon("Gjesteoversikt")
+    def gjesteoversikt():
         # Filtrering og visning
         st.subheader("Gjesteoversikt")
-        
+
         # Filtreringsalternativer
         col1, col2, col3 = st.columns(3)
         with col1:
-            filter_status = st.selectbox("Filtrer etter RSVP status", 
+            filter_status = st.selectbox("Filtrer etter RSVP status",
                                         ["Alle", "Kommer", "Kommer ikke", "Venter på svar"])
         with col2:
-            filter_relasjon = st.selectbox("Filtrer etter relasjon", 
+            filter_relasjon = st.selectbox("Filtrer etter relasjon",
                                           ["Alle", "Familie brud", "Familie brudgom", "Venn brud", "Venn brudgom", "Kollega", "Annet"])
         with col3:
             filter_text = st.text_input("Søk etter navn")
-        
-        # Filtrer dataframe
-        filtered_df = st.session_state.gjester.copy()
-        
+
+        # Filtrene (via søkeindeksen i gjestelageret)
+        filtre = {}
         if filter_status != "Alle":
-            filtered_df = filtered_df[filtered_df['RSVP Status'] == filter_status]
-        
+            filtre['RSVP Status'] = filter_status
+
         if filter_relasjon != "Alle":
-            filtered_df = filtered_df[filtered_df['Relasjon'] == filter_relasjon]
-        
-        if filter_text:
-            filtered_df = filtered_df[filtered_df['Navn'].str.contains(filter_text, case=False, na=False)]
-        
-        # Vis filtrert dataframe
-        if not filtered_df.empty:
-            st.dataframe(filtered_df, use_container_width=True)
-            
-            # Statistikk
+            filtre['Relasjon'] = filter_relasjon
+
+        # Sortering og antall rader per side
+        col4, col5, col6 = st.columns(3)
+        with col4:
+            sorter_etter = st.selectbox("Sorter etter", list(GJESTE_SORTERING), key="gjester_sorter_etter")
+        with col5:
+            per_side = st.selectbox("Rader per side", RADER_PER_SIDE, key="gjester_per_side")
+        with col6:
+            synkende = st.checkbox("Synkende rekkefølge", key="gjester_synkende")
+
+        # Siden hentes fra lageret, som husker sidene til gjestelisten endres
+        with kjøring.spenn("Gjestesøk"):
+            gjesteside, sidenummer, antall_sider = hent_gjesteside("gjester_side", filter_text, filtre, GJESTE_SORTERING[sorter_etter], not synkende, per_side)
+
+        # Vis siden av utvalget
+        if gjesteside.antall > 0:
+            with kjøring.spenn("Gjestetabell"):
+                st.dataframe(gjesteside.rader, width="stretch", hide_index=True)
+
+            sidevelger("gjester_side", gjesteside, sidenummer, antall_sider, per_side)
+
+            # Statistikk for hele utvalget, ikke bare siden
             st.subheader("Statistikk")
             col1, col2 = st.columns(2)
-            
+
             with col1:
-                st.metric("Antall i utvalget", len(filtered_df))
-                st.metric("Antall personer totalt", 
-                         filtered_df['Antall gjester'].sum() if 'Antall gjester' in filtered_df.columns else 0)
-            
+                st.metric("Antall i utvalget", gjesteside.antall)
+                st.metric("Antall personer totalt", gjesteside.personer)
+
             with col2:
                 # Spesielle behov
-                special_needs = filtered_df[filtered_df['Spesielle behov'].notna() & 
-                                         (filtered_df['Spesielle behov'] != "")]
-                st.metric("Spesielle behov", len(special_needs))
-                
+                st.metric("Spesielle behov", gjesteside.spesielle_behov)
+
         else:
             st.info("Ingen gjester funnet som matcher kriteriene.")
-    
-    with tab2:
-        st.subheader("Legg til gjester")
-        
-        # Enkeltgjest
-        with st.expander("Legg til enkeltgjest", expanded=True):
+
+    # Feltene sendes samlet når skjemaet sendes inn, ikke ved hvert tastetrykk
+    @seksjon("Legg til enkeltgjest")
+    def legg_til_enkeltgjest():
+        with st.form("legg_til_gjest"):
             col1, col2 = st.columns(2)
-            
+
             with col1:
                 ny_navn = st.text_input("Navn")
-                ny_relasjon = st.selectbox("Relasjon", 
+                ny_relasjon = st.selectbox("Relasjon",
                                          ["Familie brud", "Familie brudgom", "Venn brud", "Venn brudgom", "Kollega", "Annet"])
                 ny_invitert = st.checkbox("Invitert", value=True)
-            
+
             with col2:
                 ny_rsvp = st.selectbox("RSVP Status", ["Venter på svar", "Kommer", "Kommer ikke"])
                 ny_antall = st.number_input("Antall gjester (inkl. følge)", min_value=1, value=1, key="legg_til_antall_gjester")
                 ny_behov = st.text_area("Spesielle behov", key="legg_til_spesielle_behov")
-            
-            if st.button("Legg til gjest"):
+
+            if st.form_submit_button("Legg til gjest"):
                 if ny_navn:
-                    ny_gjest = pd.DataFrame({
-                        'Navn': [ny_navn],
-                        'Relasjon': [ny_relasjon],
-                        'Invitert': [ny_invitert],
-                        'RSVP Status': [ny_rsvp],
-                        'Antall gjester': [ny_antall],
-                        'Spesielle behov': [ny_behov]
-                    })
-                    
-                    st.session_state.gjester = pd.concat([st.session_state.gjester, ny_gjest], ignore_index=True)
-                    st.success(f"Gjest {ny_navn} lagt til!")
+                    ny_rad = {
+                        'Navn': ny_navn,
+                        'Relasjon': ny_relasjon,
+                        'Invitert': ny_invitert,
+                        'RSVP Status': ny_rsvp,
+                        'Antall gjester': ny_antall,
+                        'Spesielle behov': ny_behov
+                    }
+                    hent_bryllup().legg_til_gjest(ny_rad, økt_id())
+                    fullfør(f"Gjest {ny_navn} lagt til!")
                 else:
                     st.error("Du må fylle inn navn.")
-        
+
+    with tab1:
+        gjesteoversikt()
+
+    with tab2, kjøring.spenn("Legg til gjester"):
+        st.subheader("Legg til gjester")
+
+        # Enkeltgjest
+        with st.expander("Legg til enkeltgjest", expanded=True):
+            legg_til_enkeltgjest()
+
         # Bulk import
         with st.expander("Importer gjester fra CSV"):
             st.markdown("""
@@ -332,84 +724,305 @@ elif side == "Gjestehåndtering":
             
             if uploaded_file is not None:
                 try:
-                    df_upload = pd.read_csv(uploaded_file)
+                    # Filen hashes og forhåndsvises bare én gang per opplasting, og den
+                    # ferdig leste filen gjenbrukes så lenge innholdet er det samme
+                    opplasting = st.session_state.get('csv_opplasting')
+                    if opplasting is None or opplasting['file_id'] != uploaded_file.file_id:
+                        innhold = uploaded_file.getvalue()
+                        filhash = fil_hash(innhold)
+                        if opplasting is None or opplasting['hash'] != filhash:
+                            opplasting = {
+                                'hash': filhash,
+                                'forhandsvisning': les_forhandsvisning(innhold),
+                                'lest': None
+                            }
+                        opplasting['file_id'] = uploaded_file.file_id
+                        st.session_state.csv_opplasting = opplasting
+                    
+                    df_upload = opplasting['forhandsvisning']
                     if 'Navn' in df_upload.columns:
-                        st.dataframe(df_upload.head())
+                        st.dataframe(df_upload)
                         
                         if st.button("Importer gjester"):
-                            required_columns = ['Navn']
-                            for col in required_columns:
-                                if col not in df_upload.columns:
-                                    st.error(f"Kolonnen '{col}' mangler i CSV-filen!")
-                                    break
-                            else:
-                                # Legg til manglende kolonner
-                                all_columns = st.session_state.gjester.columns
-                                for col in all_columns:
-                                    if col not in df_upload.columns:
-                                        df_upload[col] = ""
-                                
-                                # Importer bare kolonnene som finnes i gjester-dataframen
-                                df_upload = df_upload[all_columns]
-                                
-                                st.session_state.gjester = pd.concat([st.session_state.gjester, df_upload], ignore_index=True)
-                                st.success(f"{len(df_upload)} gjester importert!")
+                            if opplasting['lest'] is None:
+                                fremdrift = st.progress(0.0, text="Leser CSV-fil ...")
+                                opplasting['lest'] = les_csv(
+                                    uploaded_file.getvalue(),
+                                    fremdrift=lambda andel: fremdrift.progress(andel, text=f"Leser CSV-fil ... {andel:.0%}")
+                                )
+                                fremdrift.empty()
+                            
+                            df_upload, rapport = opplasting['lest']
+                            df_upload, rapport = fjern_duplikater(df_upload, hent_tabell("Gjester"), rapport)
+                            ider = hent_bryllup().legg_til_gjester(df_upload, økt_id())
+                            
+                            merknader = []
+                            if rapport['fantes_fra_før']:
+                                merknader.append(f"{rapport['fantes_fra_før']} fantes fra før og ble hoppet over")
+                            if rapport['duplikat_i_filen']:
+                                merknader.append(f"{rapport['duplikat_i_filen']} rader var like en annen rad i filen og ble hoppet over")
+                            if rapport['uten_navn']:
+                                merknader.append(f"{rapport['uten_navn']} rader uten navn ble hoppet over")
+                            if rapport['antall_rettet']:
+                                merknader.append(f"{rapport['antall_rettet']} ugyldige antall ble satt til 1")
+                            if rapport['invitert_rettet']:
+                                merknader.append(f"{rapport['invitert_rettet']} ukjente Invitert-verdier ble satt til ja")
+                            if rapport['relasjon_rettet']:
+                                merknader.append(f"{rapport['relasjon_rettet']} ukjente relasjoner ble satt til 'Annet'")
+                            if rapport['status_rettet']:
+                                merknader.append(f"{rapport['status_rettet']} ukjente RSVP-statuser ble satt til 'Venter på svar'")
+                            # Siden kjøres på nytt, så tallene og tabellen viser de nye gjestene
+                            melding = f"{len(ider)} gjester importert!"
+                            if merknader:
+                                melding += " Merk: " + "; ".join(merknader) + "."
+                            if rapport['hoppet_over']:
+                                navn = rapport['hoppet_over']
+                                melding += " Hoppet over: " + ", ".join(navn[:VISTE_HOPPET_OVER])
+                                melding += f" og {len(navn) - VISTE_HOPPET_OVER} til." if len(navn) > VISTE_HOPPET_OVER else "."
+                            fullfør(melding)
                     else:
                         st.error("CSV-filen mangler kolonnen 'Navn'.")
                 except Exception as e:
                     st.error(f"Feil ved import: {e}")
     
-    with tab3:
-        st.subheader("Oppdater RSVP status")
-        
-        if not st.session_state.gjester.empty:
-            gjest_å_oppdatere = st.selectbox("Velg gjest", st.session_state.gjester['Navn'].tolist())
-            
-            gjest_idx = st.session_state.gjester[st.session_state.gjester['Navn'] == gjest_å_oppdatere].index[0]
-            
+    # Én gjest om gangen. Gjesten velges blant treffene på et navnesøk, så listen å velge
+    # fra holder seg kort uansett hvor mange gjester det er.
+    def rediger_én_gjest():
+        gjestelager = hent_gjestelager()
+        if len(gjestelager) == 0:
+            st.info("Ingen gjester lagt til ennå.")
+            return
+
+        søk = st.text_input("Finn gjest", key="rediger_søk", placeholder="Skriv en del av navnet")
+
+        # Treffene leses under låsen, men nedtrekkslisten vises etter at den er sluppet,
+        # så andre økter ikke venter på at denne tegnes
+        with hent_bryllup().lås:
+            treff = hent_bryllup().gjesteside(søk, antall=MAKS_VALG)
+            etiketter = {gjest_id: gjest_etikett(gjestelager, gjest_id) for gjest_id in treff.rader['ID'].tolist()}
+        gjest_id = st.selectbox("Velg gjest", list(etiketter), format_func=etiketter.get) if etiketter else None
+
+        if treff.antall > MAKS_VALG:
+            st.caption(f"Viser de {MAKS_VALG} første av {treff.antall} gjester. Søk for å finne andre.")
+        if gjest_id is None:
+            st.info("Ingen gjester funnet som matcher søket.")
+            return
+
+        # Gjesten og versjonen den har, leses sammen, så ingen endrer den imens
+        with hent_bryllup().lås:
+            gjest = gjestelager.rad(gjest_id) if gjest_id in gjestelager else None
+            if gjest is not None:
+                versjon = redigeringsversjon("Gjester", gjest_id, hent_bryllup().radversjon("Gjester", gjest_id))
+        if gjest is None:
+            st.info("Gjesten er slettet av en annen planlegger.")
+            return
+
+        gjest_å_oppdatere = gjest['Navn']
+
+        with st.form("rediger_gjest"):
             col1, col2 = st.columns(2)
-            
+
             with col1:
                 ny_rsvp_status = st.selectbox(
-                    "RSVP Status", 
+                    "RSVP Status",
                     ["Venter på svar", "Kommer", "Kommer ikke"],
                     index=["Venter på svar", "Kommer", "Kommer ikke"].index(
-                        st.session_state.gjester.at[gjest_idx, 'RSVP Status']
+                        gjest['RSVP Status']
                     ),
-                    key=f"oppdater_rsvp_status_{gjest_idx}"  # Unik nøkkel for hver gjest
+                    key=f"oppdater_rsvp_status_{gjest_id}"  # Unik nøkkel for hver gjest
                 )
-    
+
                 ny_antall_gjester = st.number_input(
-                    "Antall gjester (inkl. følge)", 
-                    min_value=1, 
-                    value=int(st.session_state.gjester.at[gjest_idx, 'Antall gjester']),
-                    key=f"oppdater_antall_gjester_{gjest_idx}"
+                    "Antall gjester (inkl. følge)",
+                    min_value=1,
+                    value=int(gjest['Antall gjester']),
+                    key=f"oppdater_antall_gjester_{gjest_id}"
                 )
-            
+
             with col2:
-                ny_spesielle_behov = st.text_area("Spesielle behov", value=st.session_state.gjester.at[gjest_idx, 'Spesielle behov'], key=f"oppdater_spesielle_behov_{gjest_idx}")
+                ny_spesielle_behov = st.text_area("Spesielle behov", value=gjest['Spesielle behov'], key=f"oppdater_spesielle_behov_{gjest_id}")
 
-        
-            if st.button("Oppdater gjest"):
-                st.session_state.gjester.at[gjest_idx, 'RSVP Status'] = ny_rsvp_status
-                st.session_state.gjester.at[gjest_idx, 'Antall gjester'] = ny_antall_gjester
-                st.session_state.gjester.at[gjest_idx, 'Spesielle behov'] = ny_spesielle_behov
-                
-                st.success(f"Gjest {gjest_å_oppdatere} oppdatert!")
-            
-            if st.button("Slett gjest"):
-                st.session_state.gjester = st.session_state.gjester.drop(gjest_idx).reset_index(drop=True)
-                st.success(f"Gjest {gjest_å_oppdatere} slettet!")
+            col_oppdater, col_slett = st.columns(2)
+            oppdater = col_oppdater.form_submit_button("Oppdater gjest")
+            slett = col_slett.form_submit_button("Slett gjest")
+
+        # Endringen lagres bare hvis ingen andre har endret gjesten siden skjemaet ble vist
+        if oppdater:
+            try:
+                hent_bryllup().oppdater_gjest(gjest_id, {
+                    'RSVP Status': ny_rsvp_status,
+                    'Antall gjester': ny_antall_gjester,
+                    'Spesielle behov': ny_spesielle_behov
+                }, versjon, økt_id())
+            except Konflikt:
+                glem_redigering_senere("Gjester", gjest_id)
+                st.error(f"{gjest_å_oppdatere} er endret av en annen planlegger, så endringen ble ikke lagret. Skjemaet oppdateres med de nye verdiene.")
+            else:
+                st.session_state.pop(_versjonsnøkkel("Gjester", gjest_id), None)
+                fullfør(f"Gjest {gjest_å_oppdatere} oppdatert!")
+
+        if slett:
+            try:
+                hent_bryllup().slett_gjest(gjest_id, versjon, økt_id())
+            except Konflikt:
+                glem_redigering_senere("Gjester", gjest_id)
+                st.error(f"{gjest_å_oppdatere} er endret av en annen planlegger, så gjesten ble ikke slettet.")
+            else:
+                st.session_state.pop(_versjonsnøkkel("Gjester", gjest_id), None)
+                fullfør(f"Gjest {gjest_å_oppdatere} slettet!")
+
+    # Mange gjester i en tabell. Endringene samles i skjemaet og lagres med ett trykk:
+    # lageret finner radene som faktisk er endret og lagrer dem i én omgang.
+    def rediger_flere_gjester():
+        col1, col2 = st.columns(2)
+        with col1:
+            status = st.selectbox("Vis gjester med RSVP status", ["Alle", *RSVP_STATUSER], key="rutenett_status")
+        with col2:
+            søk = st.text_input("Søk etter navn", key="rutenett_søk")
+        filtre = {} if status == "Alle" else {'RSVP Status': status}
+
+        # Versjonen av tabellen slik økten så den da endringene ble gjort, altså ved
+        # forrige visning
+        with hent_bryllup().lås:
+            gjesteside, sidenummer, antall_sider = hent_gjesteside("rutenett_side", søk, filtre, per_side=RUTENETT_RADER)
+            vist_nå = hent_bryllup().versjon
+        versjon = st.session_state.get('rutenett_versjon', vist_nå)
+        st.session_state.rutenett_versjon = vist_nå
+
+        if gjesteside.antall == 0:
+            st.info("Ingen gjester funnet som matcher kriteriene.")
+            return
+
+        # Ny nøkkel for hver side og etter hver lagring, så tabellen ikke tar med seg
+        # endringer fra en annen side
+        nummer = st.session_state.get('rutenett_nummer', 0)
+        nøkkel = f"rutenett_{nummer}_{sidenummer}_{status}_{søk}"
+        # Har andre endret radene på siden siden forrige visning, er tabellen en ny for
+        # Streamlit, og endringene i den er borte. Gjestene det gjelder, gir da en konflikt
+        # når økten lagrer.
+        vist = gjesteside.rader[['ID', 'Navn', 'Relasjon', *REDIGERING['Gjester']]]
+        forrige_nøkkel, forrige = st.session_state.get('rutenett_vist', (None, None))
+        st.session_state.rutenett_vist = (nøkkel, vist)
+        endret_av_andre = endrede_rader(forrige, vist) if forrige_nøkkel == nøkkel else []
+        with st.form("rediger_flere_gjester"):
+            redigert = st.data_editor(
+                vist,
+                key=nøkkel,
+                hide_index=True,
+                width="stretch",
+                disabled=['ID', 'Navn', 'Relasjon'],
+                column_config={
+                    'RSVP Status': st.column_config.SelectboxColumn(options=RSVP_STATUSER, required=True),
+                    'Antall gjester': st.column_config.NumberColumn(min_value=1, max_value=MAKS_ANTALL, step=1, required=True),
+                },
+            )
+            lagre = st.form_submit_button("Lagre endringer")
+        sidevelger("rutenett_side", gjesteside, sidenummer, antall_sider, RUTENETT_RADER)
+
+        if 'rutenett_konflikt' in st.session_state:
+            st.error(st.session_state.pop('rutenett_konflikt'))
+
+        # Nøkkelen byttes bare når noe er lagret eller ga konflikt, og siden kjøres da på
+        # nytt, så tabellen som vises alltid er den endringene sendes fra
+        if lagre:
+            try:
+                if endret_av_andre:
+                    raise Konflikt("Siden er endret av andre", endret_av_andre)
+                endret = hent_bryllup().oppdater_gjester(redigert[['ID', *REDIGERING['Gjester']]], versjon, økt_id())
+            except Konflikt as feil:
+                navn = [gjest_etikett(hent_gjestelager(), gjest_id) for gjest_id in feil.nøkler[:10]]
+                st.session_state.rutenett_nummer = nummer + 1
+                st.session_state.rutenett_konflikt = f"{len(feil.nøkler)} av gjestene er endret av en annen planlegger ({', '.join(navn)}{' ...' if len(feil.nøkler) > 10 else ''}), så ingen endringer ble lagret. Tabellen viser nå de nye verdiene."
+                st.rerun()
+            else:
+                if endret.empty:
+                    st.info("Ingen endringer å lagre.")
+                else:
+                    st.session_state.rutenett_nummer = nummer + 1
+                    fullfør(f"{len(endret)} gjester oppdatert!")
+
+    # Svar fra svarkortene limes inn som én gjest per linje. Gjestene finnes på navn, og
+    # endringene vises før de lagres samlet.
+    def lim_inn_svarliste():
+        with st.form("svarliste_skjema"):
+            tekst = st.text_area(
+                "Svarliste",
+                key="svarliste_tekst",
+                height=200,
+                placeholder="Ola Nordmann; Kommer; 2\nKari Nordmann; Kommer ikke",
+                help="Én gjest per linje: navn, svar og eventuelt antall (inkl. følge), skilt med semikolon, komma eller tabulator. Svaret kan være Kommer, Kommer ikke, Venter, ja eller nei."
+            )
+            vis = st.form_submit_button("Vis endringer")
+        # Teksten og versjonen av gjestelisten da endringene ble vist
+        if vis:
+            st.session_state.svarliste = (tekst, hent_bryllup().versjon)
+        if 'svarliste' not in st.session_state:
+            return
+        tekst, versjon = st.session_state.svarliste
+
+        svar, ugyldige = les_svarliste(tekst)
+        with hent_bryllup().lås:
+            gjestelager = hent_gjestelager()
+            treff = gjestelager.finn_navn(svar['Navn'].tolist())
+            entydig = np.array([len(ider) == 1 for ider in treff], dtype=bool)
+            redigert = svar[entydig].drop(columns=['Navn']).assign(ID=[ider[0] for ider in treff if len(ider) == 1])
+            endret = gjestelager.forskjeller(redigert)
+        ukjente = [navn for navn, ider in zip(svar['Navn'], treff) if not ider]
+        flertydige = [navn for navn, ider in zip(svar['Navn'], treff) if len(ider) > 1]
+
+        st.markdown(f"**{len(endret)}** gjester endres, {int(entydig.sum()) - len(endret)} svar er som før.")
+        andres = [gjest_id for gjest_id in endret['ID'].tolist() if hent_bryllup().radversjon("Gjester", gjest_id) > versjon]
+        if andres:
+            st.warning(f"{len(andres)} av gjestene er endret av en annen planlegger siden endringene ble vist, så lagringen vil gi konflikt. Trykk «Vis endringer» for å se endringene mot de nye verdiene.")
+        if ugyldige:
+            st.warning(f"{len(ugyldige)} linjer kunne ikke leses: " + "; ".join(ugyldige[:10]) + (" ..." if len(ugyldige) > 10 else ""))
+        if ukjente:
+            st.warning(f"{len(ukjente)} navn finnes ikke i gjestelisten: " + ", ".join(ukjente[:10]) + (" ..." if len(ukjente) > 10 else ""))
+        if flertydige:
+            st.warning(f"{len(flertydige)} navn finnes flere ganger og må endres enkeltvis: " + ", ".join(flertydige[:10]) + (" ..." if len(flertydige) > 10 else ""))
+        if endret.empty:
+            return
+        st.dataframe(endret[['ID', 'Navn', 'RSVP Status', 'Antall gjester']], width="stretch", hide_index=True)
+
+        if st.button(f"Lagre {len(endret)} svar"):
+            try:
+                endret = hent_bryllup().oppdater_gjester(redigert, versjon, økt_id())
+            except Konflikt as feil:
+                st.session_state.svarliste = (tekst, hent_bryllup().versjon)
+                st.error(f"{len(feil.nøkler)} av gjestene er endret av en annen planlegger siden endringene ble vist, så ingen svar ble lagret. Se over endringene på nytt og lagre igjen.")
+            else:
+                del st.session_state.svarliste
+                fullfør(f"{len(endret)} svar lagret!")
+
+    # Redigeringen kjøres på nytt for seg; bare måten som er valgt, vises
+    @seksjon("Rediger gjester")
+    def rediger_gjester():
+        st.subheader("Oppdater RSVP status")
+        måte = st.radio("Rediger", ["Én gjest", "Flere gjester", "Lim inn svarliste"], horizontal=True, key="redigeringsmåte")
+        if måte == "Én gjest":
+            rediger_én_gjest()
+        elif måte == "Flere gjester":
+            rediger_flere_gjester()
         else:
-            st.info("Ingen gjester lagt til ennå.")
+            lim_inn_svarliste()
+
+    with tab3:
+        rediger_gjester()
 
 # Budsjett side
 elif side == "Budsjett":
     st.title("Budsjett")
     
-    tab1, tab2 = st.tabs(["Budsjett oversikt", "Rediger budsjett"])
+    budsjett = hent_tabell("Budsjett")
     
-    with tab1:
+    tab1, tab2, tab3 = st.tabs(["Budsjett oversikt", "Posteringer", "Rediger budsjett"])
+    
+    # Totalbudsjettet, tabellen og statistikken. Endres totalbudsjettet, kjøres bare
+    # denne delen på nytt, ikke figurene under.
+    @seksjon("Budsjett oversikt")
+    def budsjettoversikt():
+        tall = hent_budsjetttall()
+
         # Total budsjett
         if 'budsjett_total' not in st.session_state:
             st.session_state.budsjett_total = 160000
@@ -417,143 +1030,708 @@ elif side == "Budsjett":
         budsjett_total = st.number_input("Totalt budsjett", min_value=0, value=st.session_state.budsjett_total)
         st.session_state.budsjett_total = budsjett_total
         
+        # Summene regnes ut fra posteringene én gang per endring
+        totalt = tall.totalt
+        
         # Viser budsjett
-        if not st.session_state.budsjett.empty:
-            # Legg til summering
-            sum_row = pd.DataFrame({
-                'Kategori': ['Sum'],
-                'Budsjettert': [st.session_state.budsjett['Budsjettert'].sum()],
-                'Faktisk': [st.session_state.budsjett['Faktisk'].sum()],
-                'Betalt': [st.session_state.budsjett['Betalt'].sum()],
-                'Beskrivelse': ['']
-            })
-            
-            display_df = pd.concat([st.session_state.budsjett, sum_row], ignore_index=True)
-            
-            # Formater tall
-            display_df['Budsjettert'] = display_df['Budsjettert'].apply(lambda x: f"{x:,.0f} kr")
-            display_df['Faktisk'] = display_df['Faktisk'].apply(lambda x: f"{x:,.0f} kr")
-            display_df['Betalt'] = display_df['Betalt'].apply(lambda x: f"{x:,.0f} kr")
-            
-            st.dataframe(display_df, use_container_width=True)
+        if not tall.tabell.empty:
+            with kjøring.spenn("Budsjettabell"):
+                # Summeringen legges til som en egen rad. Tallene forblir tall, og
+                # tabellen formaterer dem.
+                sum_rad = pd.DataFrame(totalt, index=pd.Index(['Sum'], name='Kategori'))
+                display_df = pd.concat([tall.tabell, sum_rad])
+                display_df['Beskrivelse'] = tall.budsjett.set_index('Kategori')['Beskrivelse'].reindex(display_df.index, fill_value="")
+                st.dataframe(display_df, width="stretch", column_config={
+                    kolonne: kronekolonne(kolonne) for kolonne in tall.tabell.columns
+                })
             
             # Budsjett statistikk
             st.subheader("Budsjett statistikk")
             
             col1, col2, col3 = st.columns(3)
             
-            with col1:
-                sum_budsjettert = st.session_state.budsjett['Budsjettert'].sum()
+            with col1, kjøring.spenn("Budsjettstatistikk"):
+                sum_budsjettert = totalt['Budsjettert']
                 st.metric("Totalt budsjettert", f"{sum_budsjettert:,.0f} kr")
                 st.metric("Prosent av totalbudsjett", f"{sum_budsjettert/budsjett_total*100:.1f}%" if budsjett_total else "0%")
             
-            with col2:
-                sum_faktisk = st.session_state.budsjett['Faktisk'].sum()
-                st.metric("Totalt faktisk", f"{sum_faktisk:,.0f} kr")
-                st.metric("Differanse", f"{(sum_budsjettert-sum_faktisk):,.0f} kr")
-            
-            with col3:
-                sum_betalt = st.session_state.budsjett['Betalt'].sum()
-                st.metric("Totalt betalt", f"{sum_betalt:,.0f} kr")
-                st.metric("Gjenstående å betale", f"{(sum_faktisk-sum_betalt):,.0f} kr")
+            with col2, kjøring.spenn("Budsjettstatistikk"):
+                st.metric("Totalt faktisk", f"{totalt['Faktisk']:,.0f} kr")
+                st.metric("Differanse", f"{totalt['Avvik']:,.0f} kr")
             
+            with col3, kjøring.spenn("Budsjettstatistikk"):
+                st.metric("Totalt betalt", f"{totalt['Betalt']:,.0f} kr")
+                st.metric("Gjenstående å betale", f"{totalt['Gjenstående']:,.0f} kr")
+
+    with tab1:
+        budsjettoversikt()
+
+        if not budsjett.empty:
             # Visuelle oversikter
             st.subheader("Grafisk oversikt")
             
             col1, col2 = st.columns(2)
             
-            with col1:
-                kategori_df = st.session_state.budsjett[st.session_state.budsjett['Budsjettert'] > 0].copy()
-                
-                if not kategori_df.empty:
-                    fig = px.pie(
-                        kategori_df, 
-                        values='Budsjettert', 
-                        names='Kategori',
-                        title='Budsjett fordeling',
-                        color_discrete_sequence=px.colors.qualitative.Pastel
-                    )
-                    st.plotly_chart(fig, use_container_width=True)
+            tall = hent_budsjetttall()
+            versjon = hent_bryllup().endret_i("Budsjett", "Posteringer")
             
-            with col2:
+            with col1, kjøring.spenn("Figur: budsjettfordeling"):
+                vis_figur("budsjett_kake", versjon, figurer.budsjett_kake, tall)
+            
+            with col2, kjøring.spenn("Figur: budsjett mot faktisk"):
                 # Sammenligning budsjett vs faktisk
-                if not st.session_state.budsjett.empty:
-                    # Fjern rader der alt er 0
-                    compare_df = st.session_state.budsjett[
-                        (st.session_state.budsjett['Budsjettert'] > 0) | 
-                        (st.session_state.budsjett['Faktisk'] > 0)
-                    ].copy()
-                    
-                    if not compare_df.empty:
-                        fig = px.bar(
-                            compare_df,
-                            x='Kategori',
-                            y=['Budsjettert', 'Faktisk', 'Betalt'],
-                            title='Budsjett vs. Faktisk vs. Betalt',
-                            barmode='group'
-                        )
-                        st.plotly_chart(fig, use_container_width=True)
-    
+                vis_figur("budsjett_sammenligning", versjon, figurer.budsjett_sammenligning, tall)
+
+            # Fakturert og betalt over tid, fra posteringene med dato
+            with kjøring.spenn("Figur: utgifter over tid"):
+                vis_figur("budsjett_forløp", versjon, figurer.budsjett_forløp, tall)
+
+    # Fakturaer og betalinger føres hver for seg; Faktisk og Betalt i budsjettet er
+    # summene av dem
+    @seksjon("Posteringer")
+    def posteringer():
+        with hent_bryllup().lås:
+            tall = hent_budsjetttall()
+            alle = hent_tabell("Posteringer")
+        kategorier = tall.budsjett['Kategori'].tolist()
+
+        st.subheader("Før faktura eller betaling")
+        with st.form("ny_postering", clear_on_submit=True):
+            col1, col2 = st.columns(2)
+
+            with col1:
+                kategori = st.selectbox("Kategori", kategorier)
+                type_ = st.radio("Type", POSTERINGSTYPER, horizontal=True)
+                dato = st.date_input("Dato", value=datetime.date.today(), format="DD.MM.YYYY")
+
+            with col2:
+                beløp = st.number_input("Beløp (kr)", min_value=0, max_value=10**12, step=1000, key="postering_beløp")
+                beskrivelse = st.text_input("Beskrivelse")
+
+            if st.form_submit_button("Før postering"):
+                if beløp <= 0:
+                    st.error("Beløpet må være større enn 0.")
+                else:
+                    hent_bryllup().legg_til_postering({
+                        'Dato': dato,
+                        'Kategori': kategori,
+                        'Type': type_,
+                        'Beløp': beløp,
+                        'Beskrivelse': beskrivelse
+                    }, økt_id())
+                    # Betaling før faktura er lov (f.eks. depositum), men nevnes
+                    summer = tall.per_kategori.get(kategori, {'Faktisk': 0, 'Betalt': 0})
+                    betalt = summer['Betalt'] + (beløp if type_ == "Betaling" else 0)
+                    fakturert = summer['Faktisk'] + (beløp if type_ == "Faktura" else 0)
+                    merknad = f" Merk: det er betalt {betalt - fakturert:,.0f} kr mer enn fakturert for {kategori}." if betalt > fakturert else ""
+                    fullfør(f"{type_} på {beløp:,.0f} kr ført på {kategori}!{merknad}")
+
+        st.subheader("Posteringer")
+        if alle.empty:
+            st.info("Ingen fakturaer eller betalinger ført ennå.")
+            return
+        valgt = st.selectbox("Vis kategori", ["Alle"] + kategorier, key="postering_kategori")
+        utvalg = alle if valgt == "Alle" else alle[alle['Kategori'] == valgt]
+        nyeste = utvalg.sort_values(['Dato', 'ID'], ascending=False, kind='stable', na_position='last').head(POSTERING_RADER)
+        st.dataframe(nyeste.drop(columns=['ID']), width="stretch", hide_index=True, column_config={
+            'Dato': st.column_config.DateColumn("Dato", format="DD.MM.YYYY"),
+            'Beløp': kronekolonne("Beløp"),
+        })
+        if len(utvalg) > POSTERING_RADER:
+            st.caption(f"Viser de {POSTERING_RADER} nyeste av {len(utvalg)} posteringer.")
+        if nyeste.empty:
+            return
+
+        # En feilført postering slettes og føres på nytt
+        etiketter = {
+            postering_id: (f"{dato:%d.%m.%Y} " if pd.notna(dato) else "") + f"{kategori}: {type_.lower()} {beløp:,.0f} kr (#{postering_id})"
+            for postering_id, dato, kategori, type_, beløp in zip(
+                nyeste['ID'].tolist(), nyeste['Dato'].tolist(), nyeste['Kategori'].tolist(), nyeste['Type'].tolist(), nyeste['Beløp'].tolist())
+        }
+        col_postering, col_slett = st.columns([3, 1])
+        postering_id = col_postering.selectbox("Velg postering", list(etiketter), format_func=etiketter.get, key="postering_valgt")
+        versjon = redigeringsversjon("Posteringer", postering_id, hent_bryllup().radversjon("Posteringer", postering_id))
+        if col_slett.button("Slett postering"):
+            try:
+                hent_bryllup().slett_postering(postering_id, versjon, økt_id())
+            except Konflikt:
+                st.error("Posteringen er slettet av en annen planlegger.")
+            else:
+                st.session_state.pop(_versjonsnøkkel("Posteringer", postering_id), None)
+                fullfør("Postering slettet!")
+
     with tab2:
+        posteringer()
+
+    # Valget av kategori og skjemaene kjøres på nytt for seg; feltene sendes samlet
+    @seksjon("Rediger budsjett")
+    def rediger_budsjett():
         st.subheader("Rediger budsjett")
-        
+
+        # Budsjettet endres aldri på stedet; versjonen sier hvilken utgave av det skjemaet viser
+        with hent_bryllup().lås:
+            budsjett = hent_tabell("Budsjett")
+            budsjettversjon = hent_bryllup().versjon
+
         # Velg kategori å redigere
-        kategori_å_redigere = st.selectbox("Velg kategori", st.session_state.budsjett['Kategori'].tolist())
-        
-        kategori_idx = st.session_state.budsjett[st.session_state.budsjett['Kategori'] == kategori_å_redigere].index[0]
-        
-        col1, col2 = st.columns(2)
-        
-        with col1:
-            ny_budsjettert = st.number_input(
-                "Budsjettert beløp", 
-                min_value=0, 
-                value=int(st.session_state.budsjett.at[kategori_idx, 'Budsjettert'])
-            )
-            
-            ny_faktisk = st.number_input(
-                "Faktisk beløp", 
-                min_value=0, 
-                value=int(st.session_state.budsjett.at[kategori_idx, 'Faktisk'])
-            )
-            
-            ny_betalt = st.number_input(
-                "Betalt beløp", 
-                min_value=0, 
-                max_value=int(ny_faktisk),
-                value=min(int(st.session_state.budsjett.at[kategori_idx, 'Betalt']), int(ny_faktisk))
-            )
-        
-        with col2:
-            ny_beskrivelse = st.text_area(
-                "Beskrivelse", 
-                value=st.session_state.budsjett.at[kategori_idx, 'Beskrivelse']
-            )
-        
-        if st.button("Oppdater budsjett"):
-            st.session_state.budsjett.at[kategori_idx, 'Budsjettert'] = ny_budsjettert
-            st.session_state.budsjett.at[kategori_idx, 'Faktisk'] = ny_faktisk
-            st.session_state.budsjett.at[kategori_idx, 'Betalt'] = ny_betalt
-            st.session_state.budsjett.at[kategori_idx, 'Beskrivelse'] = ny_beskrivelse
-            
-            st.success(f"Budsjett for {kategori_å_redigere} oppdatert!")
-        
+        kategori_å_redigere = st.selectbox("Velg kategori", budsjett['Kategori'].tolist())
+
+        kategori_idx = budsjett[budsjett['Kategori'] == kategori_å_redigere].index[0]
+        versjon = redigeringsversjon("Budsjett", kategori_å_redigere, budsjettversjon)
+
+        with st.form("rediger_budsjett"):
+            col1, col2 = st.columns(2)
+
+            with col1:
+                ny_budsjettert = st.number_input(
+                    "Budsjettert beløp",
+                    min_value=0,
+                    value=int(budsjett.at[kategori_idx, 'Budsjettert']),
+                    key=f"budsjett_budsjettert_{kategori_å_redigere}"
+                )
+
+                # Faktisk og betalt er summene av posteringene
+                st.caption(f"Fakturert: {budsjett.at[kategori_idx, 'Faktisk']:,.0f} kr · Betalt: {budsjett.at[kategori_idx, 'Betalt']:,.0f} kr. "
+                           "Fakturaer og betalinger føres under Posteringer.")
+
+            with col2:
+                ny_beskrivelse = st.text_area(
+                    "Beskrivelse",
+                    value=budsjett.at[kategori_idx, 'Beskrivelse'],
+                    key=f"budsjett_beskrivelse_{kategori_å_redigere}"
+                )
+
+            oppdater = st.form_submit_button("Oppdater budsjett")
+
+        if oppdater:
+            try:
+                hent_bryllup().oppdater_budsjett(kategori_å_redigere, {
+                    'Budsjettert': ny_budsjettert,
+                    'Beskrivelse': ny_beskrivelse
+                }, versjon, økt_id())
+            except Konflikt:
+                glem_redigering_senere("Budsjett", kategori_å_redigere)
+                st.error(f"Budsjettet for {kategori_å_redigere} er endret av en annen planlegger, så endringen ble ikke lagret. Skjemaet oppdateres med de nye verdiene.")
+            else:
+                st.session_state.pop(_versjonsnøkkel("Budsjett", kategori_å_redigere), None)
+                fullfør(f"Budsjett for {kategori_å_redigere} oppdatert!")
+
         # Legg til ny kategori
         st.subheader("Legg til ny kategori")
-        
-        ny_kategori_navn = st.text_input("Navn på ny kategori")
-        
-        if st.button("Legg til kategori"):
-            if ny_kategori_navn and ny_kategori_navn not in st.session_state.budsjett['Kategori'].values:
-                ny_kategori = pd.DataFrame({
-                    'Kategori': [ny_kategori_navn],
-                    'Budsjettert': [0],
-                    'Faktisk': [0],
-                    'Betalt': [0],
-                    'Beskrivelse': [''],
-                })
-                
-                st.session_state.budsjett = pd.concat([st.session_state.budsjett, ny_kategori], ignore_index=True)
-                st.success(f"Kategori {ny_kategori_navn} lagt til!")
-            else:
+
+        with st.form("ny_kategori", clear_on_submit=True):
+            ny_kategori_navn = st.text_input("Navn på ny kategori")
+            legg_til = st.form_submit_button("Legg til kategori")
+
+        if legg_til:
+            try:
+                if not ny_kategori_navn:
+                    raise ValueError("Fyll inn et unikt kategorinavn.")
+                hent_bryllup().legg_til_kategori(ny_kategori_navn, økt_id())
+            except ValueError:
                 st.error("Fyll inn et unikt kategorinavn.")
+            else:
+                fullfør(f"Kategori {ny_kategori_navn} lagt til!")
+
+    with tab3:
+        rediger_budsjett()
+
+# Oppgaver side
+elif side == "Oppgaver":
+    st.title("Oppgaver")
+
+    tab1, tab2, tab3 = st.tabs(["Oversikt", "Legg til oppgave", "Rediger oppgaver"])
+
+    # Listene hentes fra de sorterte fristene i oppgavelageret, så bare oppgavene som
+    # vises, leses. Endres valget, kjøres bare denne delen på nytt.
+    @seksjon("Oppgaveoversikt")
+    def oppgaveoversikt():
+        idag = datetime.date.today()
+        col_vis, col_valg = st.columns(2)
+        with col_vis:
+            vis = st.selectbox("Vis", ["Forfalt", "Frist snart", "Neste for ansvarlig", "Alle"], key="oppgaver_vis")
+
+        lager = hent_oppgavelager()
+        dager = OPPGAVE_DAGER
+        with col_valg:
+            if vis == "Frist snart":
+                dager = st.number_input("Antall dager", min_value=0, value=OPPGAVE_DAGER, key="oppgaver_dager")
+            elif vis == "Neste for ansvarlig":
+                with hent_bryllup().lås:
+                    ansvarlige = lager.ansvarlige()
+                    if lager.neste_for("", 1):
+                        ansvarlige.append("")
+                ansvarlig = st.selectbox("Ansvarlig", ansvarlige, key="oppgaver_ansvarlig", format_func=lambda navn: navn or "(ingen)")
+
+        # Tallene og radene leses under låsen; de vises etter at den er sluppet
+        with hent_bryllup().lås:
+            tall = lager.tall(idag, dager)
+            if vis == "Forfalt":
+                oppgaver, antall = lager.rader(lager.forfalt(idag, OPPGAVE_RADER)), tall.forfalt
+            elif vis == "Frist snart":
+                oppgaver, antall = lager.rader(lager.frist_innen(idag, dager, OPPGAVE_RADER)), tall.snart
+            elif vis == "Neste for ansvarlig":
+                oppgaver = lager.rader(lager.neste_for(ansvarlig, OPPGAVE_RADER))
+                antall = len(oppgaver)
+            else:
+                oppgaver, antall = lager.tabell(), len(lager)
+
+        col1, col2, col3, col4 = st.columns(4)
+        col1.metric("Åpne oppgaver", tall.åpne)
+        col2.metric("Forfalt", tall.forfalt)
+        col3.metric(f"Frist neste {dager} dager", tall.snart)
+        col4.metric("Ferdige", tall.ferdige)
+
+        if oppgaver.empty:
+            st.info("Ingen oppgaver å vise.")
+            return
+        st.dataframe(
+            oppgaver.drop(columns=['ID']),
+            width="stretch",
+            hide_index=True,
+            column_config={'Frist': st.column_config.DateColumn("Frist", format="DD.MM.YYYY")}
+        )
+        if antall > len(oppgaver):
+            st.caption(f"Viser de {len(oppgaver)} første av {antall} oppgaver.")
+
+    # Feltene sendes samlet når skjemaet sendes inn
+    @seksjon("Legg til oppgave")
+    def legg_til_oppgave():
+        with st.form("legg_til_oppgave", clear_on_submit=True):
+            col1, col2 = st.columns(2)
+
+            with col1:
+                ny_oppgave = st.text_input("Oppgave")
+                ny_frist = st.date_input("Frist", value=None, format="DD.MM.YYYY")
+                ny_ansvarlig = st.text_input("Ansvarlig")
+                ny_status = st.selectbox("Status", OPPGAVE_STATUSER)
+                ny_prioritet = st.selectbox("Prioritet", PRIORITETER, index=PRIORITETER.index("Middels"))
+
+            with col2:
+                ny_beskrivelse = st.text_area("Beskrivelse")
+                nye_notater = st.text_area("Notater")
+
+            if st.form_submit_button("Legg til oppgave"):
+                if ny_oppgave:
+                    hent_bryllup().legg_til_oppgave({
+                        'Oppgave': ny_oppgave,
+                        'Beskrivelse': ny_beskrivelse,
+                        'Frist': ny_frist,
+                        'Ansvarlig': ny_ansvarlig,
+                        'Status': ny_status,
+                        'Prioritet': ny_prioritet,
+                        'Notater': nye_notater
+                    }, økt_id())
+                    fullfør(f"Oppgave {ny_oppgave} lagt til!")
+                else:
+                    st.error("Du må fylle inn oppgaven.")
+
+    # Én oppgave om gangen, valgt blant treffene på et søk
+    @seksjon("Rediger oppgaver")
+    def rediger_oppgaver():
+        st.subheader("Rediger oppgave")
+        lager = hent_oppgavelager()
+        if len(lager) == 0:
+            st.info("Ingen oppgaver lagt til ennå.")
+            return
+
+        søk = st.text_input("Finn oppgave", key="oppgave_søk", placeholder="Skriv en del av oppgaven")
+
+        # Treffene leses under låsen; nedtrekkslisten vises etter at den er sluppet
+        with hent_bryllup().lås:
+            treff = lager.tabell()
+            if søk:
+                treff = treff[treff['Oppgave'].str.contains(søk, case=False, regex=False)]
+            etiketter = oppgave_etiketter(treff.head(MAKS_VALG))
+        oppgave_id = st.selectbox("Velg oppgave", list(etiketter), format_func=etiketter.get) if etiketter else None
+
+        if len(treff) > MAKS_VALG:
+            st.caption(f"Viser de {MAKS_VALG} første av {len(treff)} oppgaver. Søk for å finne andre.")
+        if oppgave_id is None:
+            st.info("Ingen oppgaver funnet som matcher søket.")
+            return
+
+        # Oppgaven og versjonen den har, leses sammen, så ingen endrer den imens
+        with hent_bryllup().lås:
+            oppgave = lager.rad(oppgave_id) if oppgave_id in lager else None
+            if oppgave is not None:
+                versjon = redigeringsversjon("Oppgaver", oppgave_id, hent_bryllup().radversjon("Oppgaver", oppgave_id))
+        if oppgave is None:
+            st.info("Oppgaven er slettet av en annen planlegger.")
+            return
+
+        navn = oppgave['Oppgave']
+
+        with st.form("rediger_oppgave"):
+            col1, col2 = st.columns(2)
+
+            with col1:
+                ny_status = st.selectbox("Status", OPPGAVE_STATUSER, index=OPPGAVE_STATUSER.index(oppgave['Status']), key=f"oppgave_status_{oppgave_id}")
+                ny_prioritet = st.selectbox("Prioritet", PRIORITETER, index=PRIORITETER.index(oppgave['Prioritet']), key=f"oppgave_prioritet_{oppgave_id}")
+                ny_frist = st.date_input("Frist", value=skjemaverdi(oppgave['Frist']), format="DD.MM.YYYY", key=f"oppgave_frist_{oppgave_id}")
+
+            with col2:
+                ny_ansvarlig = st.text_input("Ansvarlig", value=oppgave['Ansvarlig'], key=f"oppgave_ansvarlig_{oppgave_id}")
+                nye_notater = st.text_area("Notater", value=oppgave['Notater'], key=f"oppgave_notater_{oppgave_id}")
+
+            col_oppdater, col_slett = st.columns(2)
+            oppdater = col_oppdater.form_submit_button("Oppdater oppgave")
+            slett = col_slett.form_submit_button("Slett oppgave")
+
+        # Endringen lagres bare hvis ingen andre har endret oppgaven siden skjemaet ble vist
+        if oppdater:
+            try:
+                hent_bryllup().oppdater_oppgave(oppgave_id, {
+                    'Status': ny_status,
+                    'Prioritet': ny_prioritet,
+                    'Frist': ny_frist,
+                    'Ansvarlig': ny_ansvarlig,
+                    'Notater': nye_notater
+                }, versjon, økt_id())
+            except Konflikt:
+                glem_redigering_senere("Oppgaver", oppgave_id)
+                st.error(f"{navn} er endret av en annen planlegger, så endringen ble ikke lagret. Skjemaet oppdateres med de nye verdiene.")
+            else:
+                st.session_state.pop(_versjonsnøkkel("Oppgaver", oppgave_id), None)
+                fullfør(f"Oppgave {navn} oppdatert!")
+
+        if slett:
+            try:
+                hent_bryllup().slett_oppgave(oppgave_id, versjon, økt_id())
+            except Konflikt:
+                glem_redigering_senere("Oppgaver", oppgave_id)
+                st.error(f"{navn} er endret av en annen planlegger, så oppgaven ble ikke slettet.")
+            else:
+                st.session_state.pop(_versjonsnøkkel("Oppgaver", oppgave_id), None)
+                fullfør(f"Oppgave {navn} slettet!")
+
+    with tab1:
+        oppgaveoversikt()
+
+    with tab2:
+        st.subheader("Legg til oppgave")
+        legg_til_oppgave()
+
+    with tab3:
+        rediger_oppgaver()
+
+# Tidsplan side
+elif side == "Tidsplan":
+    st.title("Tidsplan")
+
+    tab1, tab2, tab3 = st.tabs(["Dagen", "Legg til aktivitet", "Rediger aktivitet"])
+
+    # Figuren, overlappene og "hva skjer" hentes fra tidsindeksen, som bare bygges på nytt
+    # når tidsplanen endres. Endres et valg, kjøres bare denne delen på nytt.
+    @seksjon("Tidsplan")
+    def tidsplanoversikt():
+        indeks = hent_tidsindeks()
+        if len(indeks) == 0:
+            st.info("Ingen aktiviteter med tid lagt til ennå.")
+            return
+
+        gruppe = st.radio("Vis per", ["Sted", "Ansvarlig"], horizontal=True, key="tidsplan_gruppe")
+        with kjøring.spenn("Figur: tidsplan"):
+            vis_figur("tidsplan", (hent_bryllup().endret_i("Tidsplan"), gruppe), figurer.tidsplan_gantt, indeks, gruppe)
+
+        tidskolonner = {
+            kolonne: st.column_config.DatetimeColumn(kolonne, format="DD.MM. HH:mm")
+            for kolonne in ['Tid', 'Slutt', 'Fra', 'Til']
+        }
+
+        # Overlapp på samme sted eller med samme ansvarlig
+        st.subheader("Overlappende aktiviteter")
+        ingen_overlapp = True
+        for kolonne, hva in [("Sted", "samme sted"), ("Ansvarlig", "samme ansvarlig")]:
+            konflikter = indeks.konflikter(kolonne)
+            if konflikter.empty:
+                continue
+            ingen_overlapp = False
+            st.warning(f"{len(konflikter)} aktiviteter overlapper med en annen på {hva}.")
+            st.dataframe(konflikter.drop(columns=['ID', 'Overlapper med ID']), width="stretch", hide_index=True, column_config=tidskolonner)
+        if ingen_overlapp:
+            st.success("Ingen aktiviteter overlapper på samme sted eller med samme ansvarlig.")
+
+        # Hva skjer på et gitt tidspunkt
+        st.subheader("Hva skjer klokka ...")
+        første = indeks.aktiviteter['Tid'].iloc[0].to_pydatetime()
+        tidspunkt = st.datetime_input("Tidspunkt", value=første, format="DD.MM.YYYY", step=datetime.timedelta(minutes=5), key="tidsplan_tidspunkt")
+        if tidspunkt is not None:
+            pågår = indeks.pågår(tidspunkt)
+            if pågår.empty:
+                st.info("Ingenting på tidsplanen da.")
+            else:
+                st.dataframe(pågår.drop(columns=['ID']), width="stretch", hide_index=True, column_config=tidskolonner)
+
+        with st.expander("Hele tidsplanen"):
+            st.dataframe(indeks.aktiviteter.drop(columns=['ID']), width="stretch", hide_index=True, column_config=tidskolonner)
+
+    # Aktiviteter som overlapper tidsrommet på samme sted eller med samme ansvarlig, som
+    # tekst til meldingen når aktiviteten er lagret
+    def overlapp_melding(start, slutt, sted, ansvarlig, unntatt=None):
+        if start is None:
+            return ""
+        til = slutt if slutt is not None and slutt > start else start + STANDARD_VARIGHET
+        overlapp = hent_tidsindeks().overlapper(start, til)
+        overlapp = overlapp[(overlapp['ID'] != unntatt) & (((overlapp['Sted'] == sted) & (sted != "")) | ((overlapp['Ansvarlig'] == ansvarlig) & (ansvarlig != "")))]
+        if overlapp.empty:
+            return ""
+        return " Merk: overlapper med " + ", ".join(overlapp['Aktivitet'].tolist()[:5]) + (" ..." if len(overlapp) > 5 else "") + "."
+
+    # Feltene sendes samlet når skjemaet sendes inn
+    @seksjon("Legg til aktivitet")
+    def legg_til_aktivitet():
+        with st.form("legg_til_aktivitet", clear_on_submit=True):
+            col1, col2 = st.columns(2)
+
+            with col1:
+                ny_aktivitet = st.text_input("Aktivitet")
+                ny_tid = st.datetime_input("Start", value=None, format="DD.MM.YYYY", step=datetime.timedelta(minutes=5))
+                ny_slutt = st.datetime_input("Slutt", value=None, format="DD.MM.YYYY", step=datetime.timedelta(minutes=5),
+                                             help=f"Uten slutt regnes aktiviteten å vare i {STANDARD_VARIGHET.seconds // 60} minutter.")
+
+            with col2:
+                nytt_sted = st.text_input("Sted")
+                ny_ansvarlig = st.text_input("Ansvarlig")
+                nye_notater = st.text_area("Notater")
+
+            if st.form_submit_button("Legg til aktivitet"):
+                if not ny_aktivitet or ny_tid is None:
+                    st.error("Du må fylle inn aktivitet og start.")
+                elif ny_slutt is not None and ny_slutt <= ny_tid:
+                    st.error("Slutt må være etter start.")
+                else:
+                    merknad = overlapp_melding(ny_tid, ny_slutt, nytt_sted, ny_ansvarlig)
+                    hent_bryllup().legg_til_aktivitet({
+                        'Aktivitet': ny_aktivitet,
+                        'Tid': ny_tid,
+                        'Slutt': ny_slutt,
+                        'Sted': nytt_sted,
+                        'Ansvarlig': ny_ansvarlig,
+                        'Notater': nye_notater
+                    }, økt_id())
+                    fullfør(f"Aktivitet {ny_aktivitet} lagt til!{merknad}")
+
+    # Én aktivitet om gangen, valgt fra tidsplanen sortert etter start
+    @seksjon("Rediger aktivitet")
+    def rediger_aktivitet():
+        st.subheader("Rediger aktivitet")
+
+        # Tidsplanen endres aldri på stedet, så utgaven som leses her kan vises uten låsen
+        tidsplan = hent_tabell("Tidsplan")
+        if tidsplan.empty:
+            st.info("Ingen aktiviteter lagt til ennå.")
+            return
+        etiketter = aktivitet_etiketter(tidsplan.sort_values('Tid', kind='stable', na_position='last'))
+        # Etiketten endres når tiden endres, så aktiviteten som var valgt, velges igjen
+        ider = list(etiketter)
+        valgt = st.session_state.get('valgt_aktivitet')
+        aktivitet_id = st.selectbox("Velg aktivitet", ider, index=ider.index(valgt) if valgt in etiketter else 0, format_func=etiketter.get)
+        st.session_state.valgt_aktivitet = aktivitet_id
+
+        # Aktiviteten og versjonen den har, leses sammen fra den nyeste utgaven
+        with hent_bryllup().lås:
+            tidsplan = hent_tabell("Tidsplan")
+            rad = tidsplan[tidsplan['ID'] == aktivitet_id]
+            aktivitet = rad.iloc[0].to_dict() if len(rad) else None
+            if aktivitet is not None:
+                versjon = redigeringsversjon("Tidsplan", aktivitet_id, hent_bryllup().radversjon("Tidsplan", aktivitet_id))
+        if aktivitet is None:
+            st.info("Aktiviteten er slettet av en annen planlegger.")
+            return
+
+        navn = aktivitet['Aktivitet']
+
+        with st.form("rediger_aktivitet"):
+            col1, col2 = st.columns(2)
+
+            with col1:
+                ny_aktivitet = st.text_input("Aktivitet", value=navn, key=f"aktivitet_aktivitet_{aktivitet_id}")
+                ny_tid = st.datetime_input("Start", value=skjemaverdi(aktivitet['Tid']), format="DD.MM.YYYY", step=datetime.timedelta(minutes=5), key=f"aktivitet_tid_{aktivitet_id}")
+                ny_slutt = st.datetime_input("Slutt", value=skjemaverdi(aktivitet['Slutt']), format="DD.MM.YYYY", step=datetime.timedelta(minutes=5), key=f"aktivitet_slutt_{aktivitet_id}")
+
+            with col2:
+                nytt_sted = st.text_input("Sted", value=aktivitet['Sted'], key=f"aktivitet_sted_{aktivitet_id}")
+                ny_ansvarlig = st.text_input("Ansvarlig", value=aktivitet['Ansvarlig'], key=f"aktivitet_ansvarlig_{aktivitet_id}")
+                nye_notater = st.text_area("Notater", value=aktivitet['Notater'], key=f"aktivitet_notater_{aktivitet_id}")
+
+            col_oppdater, col_slett = st.columns(2)
+            oppdater = col_oppdater.form_submit_button("Oppdater aktivitet")
+            slett = col_slett.form_submit_button("Slett aktivitet")
+
+        # Endringen lagres bare hvis ingen andre har endret aktiviteten siden skjemaet ble vist
+        if oppdater:
+            if not ny_aktivitet:
+                st.error("Du må fylle inn aktiviteten.")
+            elif ny_tid is not None and ny_slutt is not None and ny_slutt <= ny_tid:
+                st.error("Slutt må være etter start.")
+            else:
+                merknad = overlapp_melding(ny_tid, ny_slutt, nytt_sted, ny_ansvarlig, unntatt=aktivitet_id)
+                try:
+                    hent_bryllup().oppdater_aktivitet(aktivitet_id, {
+                        'Aktivitet': ny_aktivitet,
+                        'Tid': ny_tid,
+                        'Slutt': ny_slutt,
+                        'Sted': nytt_sted,
+                        'Ansvarlig': ny_ansvarlig,
+                        'Notater': nye_notater
+                    }, versjon, økt_id())
+                except Konflikt:
+                    glem_redigering_senere("Tidsplan", aktivitet_id)
+                    st.error(f"{navn} er endret av en annen planlegger, så endringen ble ikke lagret. Skjemaet oppdateres med de nye verdiene.")
+                else:
+                    st.session_state.pop(_versjonsnøkkel("Tidsplan", aktivitet_id), None)
+                    fullfør(f"Aktivitet {ny_aktivitet} oppdatert!{merknad}")
+
+        if slett:
+            try:
+                hent_bryllup().slett_aktivitet(aktivitet_id, versjon, økt_id())
+            except Konflikt:
+                glem_redigering_senere("Tidsplan", aktivitet_id)
+                st.error(f"{navn} er endret av en annen planlegger, så aktiviteten ble ikke slettet.")
+            else:
+                st.session_state.pop(_versjonsnøkkel("Tidsplan", aktivitet_id), None)
+                fullfør(f"Aktivitet {navn} slettet!")
+
+    with tab1:
+        tidsplanoversikt()
+
+    with tab2:
+        st.subheader("Legg til aktivitet")
+        legg_til_aktivitet()
+
+    with tab3:
+        rediger_aktivitet()
+
+elif side == "Bordplassering":
+    st.title("Bordplassering")
+
+    tab1, tab2 = st.tabs(["Bordplan", "Regler"])
+
+    # Gjestene som kommer, plasseres med følget sitt ved samme bord (se bordplassering.py).
+    # Planen oppdateres av seg selv når svarene endres; bare en ny plan lages fra bunnen.
+    @seksjon("Bordplan")
+    def bordplanoversikt():
+        bryllup = hent_bryllup()
+        hent_gjestelager()
+        # Planen endres på stedet, så den leses under låsen
+        with bryllup.lås:
+            with kjøring.spenn("Bordplan: oppdatering"):
+                plan = bryllup.bordplan()
+            kommer = bryllup.utvalg("", {'RSVP Status': 'Kommer'})[['ID', 'Navn', 'Relasjon', 'Antall gjester']]
+            bord = dict(plan.bord)
+            plassering = dict(plan.plassering)
+            ikke_plassert = list(plan.ikke_plassert)
+            oversikt = plan.oversikt(kommer)
+            samhold = plan.samhold(kommer)
+
+        personer = int(kommer['Antall gjester'].sum())
+        with st.form("ny_bordplan"):
+            plasser = next(iter(bord.values()), STANDARD_PLASSER)
+            col1, col2 = st.columns(2)
+            antall_bord = col1.number_input("Antall bord", min_value=1, value=len(bord) or max(1, -(-personer // plasser)), step=1)
+            plasser = col2.number_input("Plasser per bord", min_value=1, max_value=MAKS_ANTALL, value=plasser, step=1)
+            if st.form_submit_button("Lag ny bordplan", help="Plasserer alle som kommer på nytt. Endringer i svarene trenger ikke ny plan."):
+                start = time.perf_counter()
+                ny = bryllup.lag_bordplan(int(antall_bord), int(plasser), økt_id())
+                millisekunder = (time.perf_counter() - start) * 1000
+                fullfør(f"Ny bordplan laget på {millisekunder:.0f} ms! {len(ny.ikke_plassert)} gjester fikk ikke plass.")
+
+        if not bord:
+            st.info("Ingen bordplan ennå. Velg antall bord og plasser per bord, og lag en ny bordplan.")
+            return
+
+        plassert = oversikt['Opptatt'].sum()
+        col1, col2, col3, col4 = st.columns(4)
+        col1.metric("Bord i bruk", f"{(oversikt['Opptatt'] > 0).sum()} av {len(bord)}")
+        col2.metric("Plassert", f"{plassert} av {personer}")
+        col3.metric("Ledige plasser", oversikt['Plasser'].sum() - plassert)
+        col4.metric("Samme relasjon ved bordet", f"{samhold:.0%}", help="Andelen som sitter ved et bord der flest er fra samme relasjon som dem")
+
+        if ikke_plassert:
+            uten_plass = kommer[kommer['ID'].isin(ikke_plassert)]
+            st.warning(f"{len(uten_plass)} gjester får ikke plass: " + ", ".join(uten_plass['Navn'].tolist()[:10])
+                       + (" ..." if len(uten_plass) > 10 else "") + ". Legg til bord eller plasser, eller se over reglene.")
+
+        st.subheader("Bordene")
+        st.dataframe(oversikt, width="stretch", hide_index=True, column_config={
+            'Opptatt': st.column_config.ProgressColumn("Opptatt", min_value=0, max_value=int(oversikt['Plasser'].max()), format="%d"),
+        })
+
+        st.subheader("Gjester per bord")
+        valgt = st.selectbox("Bord", list(bord), key="bordplan_bord")
+        ved_bordet = kommer[kommer['ID'].map(plassering) == valgt].sort_values('Navn', kind='stable')
+        st.dataframe(ved_bordet[['Navn', 'Relasjon', 'Antall gjester']], width="stretch", hide_index=True)
+
+    # Gjester som skal sitte sammen eller ikke ved samme bord. Planen rettes med en gang en
+    # regel legges til, ved å flytte bare gjestene regelen gjelder.
+    @seksjon("Bordregler")
+    def bordregler():
+        bryllup = hent_bryllup()
+        gjestelager = hent_gjestelager()
+        if len(gjestelager) == 0:
+            st.info("Ingen gjester lagt til ennå.")
+            return
+        etikett = functools.partial(gjest_etikett, gjestelager)
+
+        st.subheader("Ny regel")
+        col1, col2 = st.columns(2)
+        valgte = []
+        for kolonne, nøkkel, tittel in [(col1, "bordregel_gjest", "Gjest"), (col2, "bordregel_annen", "Annen gjest")]:
+            with kolonne:
+                søk = st.text_input(f"Finn {tittel.lower()}", key=f"{nøkkel}_søk", placeholder="Skriv en del av navnet")
+                treff = bryllup.gjesteside(søk, antall=MAKS_VALG)
+                valgte.append(st.selectbox(tittel, treff.rader['ID'].tolist(), format_func=etikett, key=nøkkel) if treff.antall > 0 else None)
+        regel = st.radio("Regel", BORDREGLER, horizontal=True, key="bordregel_regel",
+                         format_func={"Sammen": "Ved samme bord", "Adskilt": "Ved forskjellige bord"}.get)
+        if st.button("Legg til regel"):
+            gjest_id, annen_id = valgte
+            if gjest_id is None or annen_id is None:
+                st.error("Velg to gjester.")
+            else:
+                try:
+                    bryllup.legg_til_bordregel(gjest_id, annen_id, regel, økt_id())
+                except (ValueError, Konflikt) as feil:
+                    st.error(str(feil))
+                else:
+                    fullfør(f"Regel for {etikett(gjest_id)} og {etikett(annen_id)} lagret!")
+
+        st.subheader("Regler")
+        with bryllup.lås:
+            regler = dict(bryllup.bordplan().regler)
+        if not regler:
+            st.info("Ingen regler lagt til ennå.")
+            return
+        beskrivelser = {
+            regel_id: f"{etikett(gjest)} og {etikett(annen)}: " + ("ved samme bord" if regel == "Sammen" else "ved forskjellige bord")
+            for regel_id, (gjest, annen, regel) in regler.items()
+        }
+        st.dataframe(pd.DataFrame({'Regel': list(beskrivelser.values())}), width="stretch", hide_index=True)
+        col_regel, col_slett = st.columns([3, 1])
+        regel_id = col_regel.selectbox("Velg regel", list(beskrivelser), format_func=beskrivelser.get, key="bordregel_valgt")
+        if col_slett.button("Slett regel"):
+            bryllup.slett_bordregel(regel_id, økt_id())
+            fullfør("Regel slettet!")
+
+    with tab1:
+        bordplanoversikt()
+
+    with tab2:
+        bordregler()
+
+# ==============================
+# YTELSESPANEL
+# ==============================
+
+# Tidene for seksjonene i de siste kjøringene. Panelet tegnes etter at kjøringen er
+# avsluttet, så det regnes ikke med i tidene selv.
+kjøring.avslutt()
+if st.session_state.get('vis_ytelsespanel'):
+    with st.sidebar.expander("Ytelse", expanded=True):
+        st.caption(f"Millisekunder per seksjon, de siste {tidtaking.HISTORIKK_ANTALL} kjøringene (nyeste først)")
+        st.dataframe(pd.DataFrame(tidtaking.tidstabell(st.session_state.kjøringer)).round(1), width="stretch")
+        if kjøring.allokert:
+            st.caption("Allokert minne i denne kjøringen (KiB, topp per seksjon)")
+            st.dataframe(pd.Series(tidtaking.minnetabell(kjøring), name="KiB").round(1), width="stretch")
+        if tidtaking.PROFIL_MAPPE:
+            st.caption(f"Profiler for hver kjøring skrives til {tidtaking.PROFIL_MAPPE}")
@@ -0,0 +1,129 @@
+import numpy as np
+import pandas as pd
+
+# Syntetiske bryllupsdata for ytelsesmålinger.
+# Lager Gjester, Budsjett, Posteringer, Oppgaver og Tidsplan med et gitt antall rader og samme
+# kolonner og verdier som appen selv bruker. Dataene er tilfeldige, men bestemt av
+# frøet, slik at to kjøringer med samme størrelse måler på nøyaktig de samme tabellene.
+
+STORRELSER = [100, 10_000, 100_000]
+
+FORNAVN = ['Ola', 'Kari', 'Per', 'Åse', 'Bjørn', 'Ingrid', 'Håkon', 'Sølvi', 'Ærling', 'Marte',
+           'Jørgen', 'Sigrid', 'Øystein', 'Liv', 'Anders', 'Ragnhild', 'Ståle', 'Tove', 'Geir', 'Aase']
+ETTERNAVN = ['Hansen', 'Johansen', 'Olsen', 'Larsen', 'Andersen', 'Pedersen', 'Nilsen', 'Kristiansen',
+             'Jensen', 'Karlsen', 'Haugen', 'Bakken', 'Sæther', 'Løken', 'Dahl', 'Strøm', 'Aasen', 'Ødegård']
+RELASJONER = ['Familie brud', 'Familie brudgom', 'Venn brud', 'Venn brudgom', 'Kollega', 'Annet']
+RSVP = ['Venter på svar', 'Kommer', 'Kommer ikke']
+BEHOV = ['', '', '', '', 'Vegetar', 'Glutenfri', 'Laktosefri', 'Rullestol', 'Nøtteallergi']
+KATEGORIER = ['Lokale', 'Catering', 'Fotograf', 'Blomster', 'Kake', 'Klær', 'Ringer', 'Dekorasjoner',
+              'Transport', 'Musikk', 'Invitasjoner', 'Annet']
+OPPGAVER = ['Bestille', 'Ringe', 'Betale', 'Sende', 'Hente', 'Avtale', 'Prøve', 'Skrive']
+STATUSER = ['Ikke startet', 'Pågår', 'Ferdig']
+PRIORITETER = ['Lav', 'Middels', 'Høy']
+STEDER = ['Kirken', 'Festlokalet', 'Hagen', 'Hotellet', 'Stranden']
+ANSVARLIGE = ['Brud', 'Brudgom', 'Forlover', 'Toastmaster', 'Foreldre', 'Fotograf']
+
+BRYLLUPSDAG = pd.Timestamp("2027-06-19 12:00")
+
+
+def _velg(rng, verdier, antall):
+    return np.asarray(verdier, dtype=object)[rng.integers(0, len(verdier), antall)]
+
+
+def lag_gjester(antall, rng):
+    navn = _velg(rng, FORNAVN, antall) + " " + _velg(rng, ETTERNAVN, antall)
+    return pd.DataFrame({
+        'ID': np.arange(1, antall + 1),
+        'Navn': navn,
+        'Relasjon': _velg(rng, RELASJONER, antall),
+        'Invitert': rng.random(antall) < 0.9,
+        'RSVP Status': _velg(rng, RSVP, antall),
+        'Antall gjester': rng.choice([1, 1, 1, 2, 2, 3, 4], antall),
+        'Spesielle behov': _velg(rng, BEHOV, antall),
+    })
+
+
+# De første radene er appens faste kategorier; resten får nummererte navn, siden
+# Kategori er nøkkelen i budsjettet
+def lag_budsjett(antall, rng):
+    kategorier = KATEGORIER[:antall] + [f"Post {nummer}" for nummer in range(len(KATEGORIER) + 1, antall + 1)]
+    budsjettert = rng.integers(0, 50, antall) * 1000
+    faktisk = (budsjettert * rng.uniform(0, 1.3, antall)).round().astype(int)
+    return pd.DataFrame({
+        'Kategori': kategorier,
+        'Budsjettert': budsjettert,
+        'Faktisk': faktisk,
+        'Betalt': (faktisk * rng.uniform(0, 1, antall)).round().astype(int),
+        'Beskrivelse': _velg(rng, ['', '', 'Depositum betalt', 'Tilbud mottatt'], antall),
+    })
+
+
+def lag_oppgaver(antall, rng):
+    return pd.DataFrame({
+        'ID': np.arange(1, antall + 1),
+        'Oppgave': _velg(rng, OPPGAVER, antall) + " " + _velg(rng, [kategori.lower() for kategori in KATEGORIER], antall),
+        'Beskrivelse': _velg(rng, ['', 'Se e-post', 'Sjekk pris'], antall),
+        'Frist': BRYLLUPSDAG - pd.to_timedelta(rng.integers(0, 365, antall), unit='D'),
+        'Ansvarlig': _velg(rng, ANSVARLIGE, antall),
+        'Status': _velg(rng, STATUSER, antall),
+        'Prioritet': _velg(rng, PRIORITETER, antall),
+        'Notater': _velg(rng, ['', '', 'Venter på svar'], antall),
+    })
+
+
+def lag_tidsplan(antall, rng):
+    tid = BRYLLUPSDAG + pd.to_timedelta(np.sort(rng.integers(0, 12 * 60, antall)), unit='min')
+    return pd.DataFrame({
+        'ID': np.arange(1, antall + 1),
+        'Tid': tid,
+        'Slutt': tid + pd.to_timedelta(rng.choice([15, 30, 45, 60, 90], antall), unit='min'),
+        'Aktivitet': _velg(rng, ['Vielse', 'Fotografering', 'Middag', 'Tale', 'Kake', 'Dans', 'Nattmat'], antall),
+        'Sted': _velg(rng, STEDER, antall),
+        'Ansvarlig': _velg(rng, ANSVARLIGE, antall),
+        'Notater': _velg(rng, ['', '', 'Husk mikrofon'], antall),
+    })
+
+
+# Fakturaer og betalinger fordelt på appens faste kategorier, datert året før bryllupet
+def lag_posteringer(antall, rng):
+    return pd.DataFrame({
+        'ID': np.arange(1, antall + 1),
+        'Dato': BRYLLUPSDAG.normalize() - pd.to_timedelta(rng.integers(0, 365, antall), unit='D'),
+        'Kategori': _velg(rng, KATEGORIER, antall),
+        'Type': _velg(rng, ['Faktura', 'Betaling'], antall),
+        'Beløp': rng.integers(1, 200, antall) * 100,
+        'Beskrivelse': _velg(rng, ['', '', 'Depositum', 'Sluttfaktura'], antall),
+    })
+
+
+# Plasser per bord i bordplanen, og andelen bord i tillegg til dem som trengs
+PLASSER_PER_BORD = 8
+EKSTRA_BORD = 0.1
+
+# Alle tabellene med antall rader hver, i arkrekkefølge. Posteringene lages sist, så
+# de andre tabellene er de samme som før posteringene kom til.
+def lag_tabeller(antall, frø=0):
+    rng = np.random.default_rng(frø)
+    tabeller = {
+        'Gjester': lag_gjester(antall, rng),
+        'Budsjett': lag_budsjett(antall, rng),
+        'Oppgaver': lag_oppgaver(antall, rng),
+        'Tidsplan': lag_tidsplan(antall, rng),
+    }
+    posteringer = lag_posteringer(antall, rng)
+    return {navn: posteringer if navn == 'Posteringer' else tabeller[navn]
+            for navn in ['Gjester', 'Budsjett', 'Posteringer', 'Oppgaver', 'Tidsplan']}
+
+
+# Gjestene som kommer (ID, Relasjon og Antall gjester), og bordene til en bordplan for
+# dem: nok bord med PLASSER_PER_BORD plasser til alle, og litt til
+def lag_bord(gjester):
+    kommer = gjester.loc[gjester['RSVP Status'] == 'Kommer', ['ID', 'Relasjon', 'Antall gjester']]
+    antall_bord = int(np.ceil(kommer['Antall gjester'].sum() * (1 + EKSTRA_BORD) / PLASSER_PER_BORD))
+    return kommer, {nummer: PLASSER_PER_BORD for nummer in range(1, antall_bord + 1)}
+
+
+# Gjestene som en CSV-fil slik brukerne laster den opp (uten ID, ja/nei i Invitert)
+def lag_gjeste_csv(gjester):
+    csv = gjester.drop(columns=['ID']).assign(Invitert=gjester['Invitert'].map({True: 'Ja', False: 'Nei'}))
+    return csv.to_csv(index=False).encode('utf-8')
@@ -0,0 +1,268 @@
+import argparse
+import copy
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+import pandas as pd
+import streamlit as st
+from streamlit.testing.v1 import AppTest
+
+from benchmark.datasett import BRYLLUPSDAG, STORRELSER, lag_bord, lag_gjeste_csv, lag_tabeller
+from bordplassering import Bordplan
+from eksport import bygg_excel, bygg_snapshot, les_fil
+from gjesteimport import fjern_duplikater, les_csv
+from gjestelager import GjesteLager
+from lagring import SqliteLagring
+from nokkeltall import BudsjettTall
+from oppgaver import OppgaveLager
+from skjema import tilpass
+from tidsplan import Tidsindeks
+
+# Ytelsesmålinger for bryllupsplanleggeren.
+# Kjøres fra rotmappen med
+#
+#     python -m benchmark.kjor [--storrelser 100 10000] [--gjentak 3]
+#
+# For hver størrelse lages syntetiske tabeller (se datasett.py) som legges i en
+# midlertidig SQLite-database. Sidene kjøres hodeløst med Streamlits AppTest: første
+# visning (tabellene lastes fra databasen) og en ny kjøring av samme side. I tillegg
+# måles eksport, Excel-import, CSV-import, navnesøket, sidene av gjestetabellen,
+# oppgavelageret (indeksen og fristspørringene), budsjettsummene fra posteringene,
+# tidsindeksen for tidsplanen og bordplasseringen (ny plan og oppdatering etter endrede
+# svar) hver for seg, uten Streamlit. Databasen får en ferdig bordplan, så bordplassering-siden viser en plan.
+# Resultatene sammenlignes med en baseline (benchmark/baseline.json); målinger som
+# er blitt tregere enn terskelen merkes, og da avslutter skriptet med kode 1.
+#
+# Oppstarten måles i en ny Python-prosess med tom lagring: tiden fra prosessen starter
+# til forsiden er ferdig kjørt første gang. Den skal holde seg innenfor et budsjett, og
+# de tunge bibliotekene (TUNGE_MODULER) skal ikke være lastet før de trengs.
+
+APP = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "app.py")
+BASELINE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "baseline.json")
+SIDER = ["Oversikt", "Gjestehåndtering", "Budsjett", "Oppgaver", "Tidsplan", "Bordplassering"]
+
+# Endringer mindre enn dette regnes som støy uansett prosent
+MIN_FORSKJELL = 0.005
+
+# Sekunder en kald oppstart (ny prosess til ferdig forside) kan ta
+OPPSTART_BUDSJETT = 4.0
+
+# Biblioteker som bare skal importeres når en figur, eksport eller import trengs
+TUNGE_MODULER = ['plotly.express', 'xlsxwriter', 'openpyxl']
+
+_OPPSTART_SKRIPT = """
+import json, sys, time
+from streamlit.testing.v1 import AppTest
+at = AppTest.from_file(sys.argv[1], default_timeout=float(sys.argv[2]))
+start = time.perf_counter()
+at.run()
+tid = time.perf_counter() - start
+if at.exception:
+    raise SystemExit(at.exception[0].message)
+print(json.dumps({'tid': tid, 'lastet': [modul for modul in sys.argv[3:] if modul in sys.modules]}))
+"""
+
+
+# Kjører funksjonen gjentak ganger og returnerer mediantiden i sekunder.
+# oppsett kalles før hver kjøring, utenfor tidtakingen, og resultatet sendes til funksjonen.
+def _tid(funksjon, gjentak, oppsett=None):
+    tider = []
+    for _ in range(gjentak):
+        argumenter = (oppsett(),) if oppsett else ()
+        start = time.perf_counter()
+        funksjon(*argumenter)
+        tider.append(time.perf_counter() - start)
+    return statistics.median(tider)
+
+
+def _kjør(at):
+    start = time.perf_counter()
+    at.run()
+    tid = time.perf_counter() - start
+    if at.exception:
+        raise RuntimeError(f"Appen feilet: {at.exception[0].message}")
+    return tid
+
+
+# Første visning og ny kjøring av en side, med tomme hurtigbuffere og en ny økt
+def mål_side(side, gjentak, tidsavbrudd):
+    st.cache_data.clear()
+    st.cache_resource.clear()
+    at = AppTest.from_file(APP, default_timeout=tidsavbrudd)
+    første = _kjør(at)
+    if side != SIDER[0]:
+        at.sidebar.radio[0].set_value(side)
+        første = _kjør(at)
+    ny = statistics.median(_kjør(at) for _ in range(gjentak))
+    return {f"side {side} (første)": første, f"side {side} (ny kjøring)": ny}
+
+
+# Kald oppstart i en ny prosess med tom lagring. Returnerer (tider, tunge moduler som ble lastet).
+def mål_oppstart(gjentak, tidsavbrudd):
+    miljø = dict(os.environ, BRYLLUP_LAGRING="minne")
+    prosesser, kjøringer, lastet = [], [], set()
+    for _ in range(gjentak):
+        start = time.perf_counter()
+        resultat = subprocess.run(
+            [sys.executable, "-c", _OPPSTART_SKRIPT, APP, str(tidsavbrudd), *TUNGE_MODULER],
+            capture_output=True, text=True, env=miljø, timeout=tidsavbrudd
+        )
+        prosesser.append(time.perf_counter() - start)
+        if resultat.returncode != 0:
+            raise RuntimeError(f"Oppstarten feilet: {resultat.stderr.strip()}")
+        data = json.loads(resultat.stdout.strip().splitlines()[-1])
+        kjøringer.append(data['tid'])
+        lastet.update(data['lastet'])
+    tider = {"oppstart (ny prosess)": statistics.median(prosesser), "oppstart (første kjøring)": statistics.median(kjøringer)}
+    return tider, sorted(lastet)
+
+
+def mål_isolert(tabeller, gjentak):
+    gjester = tabeller['Gjester']
+    excel = bygg_excel(tabeller)
+    csv = lag_gjeste_csv(gjester)
+    eksisterende = gjester.iloc[:len(gjester) // 2]
+
+    def csv_import(lager):
+        nye, _ = les_csv(csv)
+        nye, _ = fjern_duplikater(nye, lager.tabell())
+        lager.legg_til_tabell(nye)
+
+    # Nytt lager med ferdig bygget tabell, så første side måler bare sorteringen
+    def nytt_lager():
+        lager = GjesteLager(gjester)
+        lager.tabell()
+        return lager
+
+    lager = GjesteLager(gjester)
+    oppgaver = OppgaveLager(tabeller['Oppgaver'])
+    # Et halvt år før bryllupet, så omtrent halvparten av fristene er passert
+    idag = (BRYLLUPSDAG - pd.Timedelta(days=182)).date()
+    budsjett = tilpass(tabeller['Budsjett'], 'Budsjett')
+    posteringer = tilpass(tabeller['Posteringer'], 'Posteringer')
+    tidsplan = tilpass(tabeller['Tidsplan'], 'Tidsplan')
+    tidsindeks = Tidsindeks(tidsplan)
+    kommer, bord = lag_bord(gjester)
+    plan = Bordplan()
+    plan.lag(kommer, bord)
+    # Én gjest kommer ikke likevel, og én annen får større følge
+    svar = kommer.iloc[1:].copy()
+    svar.iloc[0, svar.columns.get_loc('Antall gjester')] += 1
+    return {
+        "eksport excel": _tid(lambda: bygg_excel(tabeller), gjentak),
+        "eksport øyeblikksbilde": _tid(lambda: bygg_snapshot(tabeller), gjentak),
+        "import excel": _tid(lambda: les_fil(excel), gjentak),
+        "import csv": _tid(csv_import, gjentak, oppsett=lambda: GjesteLager(eksisterende)),
+        "navnesøk": _tid(lambda: lager.utvalg("ola han", {}), gjentak),
+        "navnesøk kort": _tid(lambda: lager.utvalg("ol", {}), gjentak),
+        "filter status og relasjon": _tid(lambda: lager.utvalg("", {'RSVP Status': "Kommer", 'Relasjon': "Kollega"}), gjentak),
+        "gjesteside sortert (første)": _tid(lambda ny: ny.side("", {}, "Navn"), gjentak, oppsett=nytt_lager),
+        "gjesteside bla og filtrer": _tid(lambda: lager.side("", {'Relasjon': "Kollega"}, "Navn", start=len(gjester) // 20), gjentak),
+        "oppgaver bygg indeks": _tid(lambda: OppgaveLager(tabeller['Oppgaver']), gjentak),
+        "oppgaver frister": _tid(lambda: (oppgaver.tall(idag), oppgaver.forfalt(idag, 200), oppgaver.neste_for("Brud", 200)), gjentak),
+        "budsjett summer": _tid(lambda: BudsjettTall(budsjett, posteringer).forløp(), gjentak),
+        "tidsplan indeks og overlapp": _tid(lambda: [Tidsindeks(tidsplan).konflikter(kolonne) for kolonne in ["Sted", "Ansvarlig"]], gjentak),
+        "tidsplan hva skjer": _tid(lambda: tidsindeks.pågår(BRYLLUPSDAG + pd.Timedelta(hours=6)), gjentak),
+        "bordplan ny": _tid(lambda: Bordplan().lag(kommer, bord), gjentak),
+        "bordplan oppdatering": _tid(lambda kopi: kopi.oppdater(svar), gjentak, oppsett=lambda: copy.deepcopy(plan)),
+    }
+
+
+def mål(storrelse, gjentak, tidsavbrudd, med_sider=True):
+    tabeller = lag_tabeller(storrelse)
+    resultater = mål_isolert(tabeller, gjentak)
+    if med_sider:
+        with tempfile.TemporaryDirectory() as mappe:
+            db = os.path.join(mappe, "benchmark.db")
+            lagring = SqliteLagring(db)
+            for navn, df in tabeller.items():
+                lagring.erstatt(navn, df)
+            plan = Bordplan()
+            plan.lag(*lag_bord(tabeller['Gjester']))
+            lagring.erstatt("Bord", plan.bordtabell())
+            lagring.erstatt("Bordplan", plan.plasstabell())
+            lagring.lukk()
+            os.environ["BRYLLUP_LAGRING"] = "sqlite"
+            os.environ["BRYLLUP_DB"] = db
+            for side in SIDER:
+                resultater.update(mål_side(side, gjentak, tidsavbrudd))
+            st.cache_resource.clear()
+    return resultater
+
+
+def _nøkkel(storrelse, måling):
+    return f"{storrelse}:{måling}"
+
+
+# Skriver regresjonstabellen og returnerer antall målinger som er tregere enn terskelen
+def skriv_tabell(resultater, baseline, terskel):
+    regresjoner = 0
+    print(f"{'Måling':<40} {'Rader':>8} {'Tid (ms)':>10} {'Baseline':>10} {'Endring':>9}")
+    print("-" * 81)
+    for (storrelse, måling), tid in resultater.items():
+        tidligere = baseline.get(_nøkkel(storrelse, måling))
+        if tidligere is None:
+            print(f"{måling:<40} {storrelse:>8} {tid * 1000:>10.1f} {'-':>10} {'ny':>9}")
+            continue
+        endring = (tid - tidligere) / tidligere if tidligere > 0 else 0.0
+        merke = ""
+        if endring > terskel and tid - tidligere > MIN_FORSKJELL:
+            merke = "  TREGERE"
+            regresjoner += 1
+        print(f"{måling:<40} {storrelse:>8} {tid * 1000:>10.1f} {tidligere * 1000:>10.1f} {endring:>+9.0%}{merke}")
+    return regresjoner
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Ytelsesmålinger for bryllupsplanleggeren")
+    parser.add_argument("--storrelser", type=int, nargs="+", default=STORRELSER, help="antall rader per tabell")
+    parser.add_argument("--gjentak", type=int, default=3, help="antall kjøringer per måling (medianen brukes)")
+    parser.add_argument("--uten-sider", action="store_true", help="mål bare funksjonene, ikke sidene")
+    parser.add_argument("--tidsavbrudd", type=float, default=600, help="sekunder én kjøring av appen kan ta")
+    parser.add_argument("--baseline", default=BASELINE, help="JSON-fil med tidligere resultater")
+    parser.add_argument("--terskel", type=float, default=0.25, help="hvor mye tregere (andel) som regnes som regresjon")
+    parser.add_argument("--uten-oppstart", action="store_true", help="ikke mål kald oppstart")
+    parser.add_argument("--oppstart-budsjett", type=float, default=OPPSTART_BUDSJETT, help="sekunder en kald oppstart kan ta")
+    parser.add_argument("--lagre-baseline", action="store_true", help="skriv resultatene til baseline-filen")
+    args = parser.parse_args(argv)
+
+    resultater = {}
+    feil = []
+    if not args.uten_oppstart:
+        print("Måler oppstart ...", file=sys.stderr)
+        tider, lastet = mål_oppstart(args.gjentak, args.tidsavbrudd)
+        for måling, tid in tider.items():
+            resultater[(0, måling)] = tid
+        if tider["oppstart (ny prosess)"] > args.oppstart_budsjett:
+            feil.append(f"Oppstarten tok {tider['oppstart (ny prosess)']:.2f} s, budsjettet er {args.oppstart_budsjett:.2f} s")
+        if lastet:
+            feil.append(f"Lastet ved oppstart selv om de ikke trengs: {', '.join(lastet)}")
+    for storrelse in args.storrelser:
+        print(f"Måler med {storrelse} rader ...", file=sys.stderr)
+        for måling, tid in mål(storrelse, args.gjentak, args.tidsavbrudd, not args.uten_sider).items():
+            resultater[(storrelse, måling)] = tid
+
+    baseline = {}
+    if os.path.exists(args.baseline):
+        with open(args.baseline, encoding="utf-8") as fil:
+            baseline = json.load(fil)
+    regresjoner = skriv_tabell(resultater, baseline, args.terskel)
+    for melding in feil:
+        print(melding)
+
+    if args.lagre_baseline:
+        baseline.update({_nøkkel(storrelse, måling): tid for (storrelse, måling), tid in resultater.items()})
+        with open(args.baseline, "w", encoding="utf-8") as fil:
+            json.dump(baseline, fil, ensure_ascii=False, indent=2, sort_keys=True)
+        print(f"Baseline lagret i {args.baseline}", file=sys.stderr)
+        return 0
+    return 1 if regresjoner or feil else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
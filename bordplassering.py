@@ -0,0 +1,364 @@
+import collections
+import heapq
+import random
+import time
+
+import pandas as pd
+
+from skjema import tilpass
+
+# Bordplassering for gjestene som kommer.
+# Hver gjest i gjestelisten er et selskap (Antall gjester, inkl. følge) som alltid sitter
+# ved samme bord. Selskaper med regelen "Sammen" slås sammen til én blokk (union-find),
+# og blokker med regelen "Adskilt" mellom seg settes aldri ved samme bord.
+# En ny bordplan (Bordplan.lag) pakkes først grådig: blokkene tas relasjon for relasjon,
+# de største først, og hver blokk settes ved bordet med flest fra samme relasjon, ellers
+# ved et tomt bord, ellers der den passer trangest (best fit). Bordene er indeksert etter
+# relasjon og ledige plasser, så valget går ikke gjennom alle bordene. Deretter forbedres planen
+# med lokalsøk: en blokk flyttes, eller to blokker bytter bord, når det gir flere med
+# samme relasjon ved samme bord. Poengene er summen over bordene av antall personer per
+# relasjon i andre, så endringen for et trekk regnes ut fra antallene ved de to bordene.
+# Når svarene eller reglene endres (Bordplan.oppdater), flyttes bare selskapene som er
+# nye, har fått nytt antall eller ny relasjon, eller bryter en regel; resten blir
+# sittende, og lokalsøket flytter bare de som ble plassert på nytt.
+
+# Sekunder lokalsøket får for en ny plan og for en oppdatering
+TIDSGRENSE = 0.5
+TIDSGRENSE_OPPDATERING = 0.1
+
+# Antall bord med flest fra samme relasjon som prøves for bytte av bord
+BYTTE_KANDIDATER = 3
+
+
+class _Pakking:
+    # bord: dict bord -> plasser; selskaper: dict gjest -> (antall, relasjon);
+    # regler: (gjest, annen gjest, regel) for hver regel
+    def __init__(self, bord, selskaper, regler):
+        self.kapasitet = dict(bord)
+        self.største = max(bord.values(), default=0)
+        self.ledig = dict(bord)
+        self.totalt_ledig = sum(bord.values())
+        self.antall = {nummer: collections.Counter() for nummer in bord}
+        self.blokker_ved = {nummer: set() for nummer in bord}
+        self.bord_for = {}
+        # Indekser over bordene, så et bord kan velges uten å gå gjennom alle:
+        # bordene per antall ledige plasser, bordene med noen fra hver relasjon (og blant
+        # dem de som har ledig plass), og de tomme bordene (en haug, størst først, med
+        # bord som ikke lenger er tomme liggende til de kommer øverst)
+        self.med_ledig = collections.defaultdict(set)
+        for nummer, plasser in bord.items():
+            self.med_ledig[plasser].add(nummer)
+        self.bord_med = collections.defaultdict(set)
+        self.åpne_med = collections.defaultdict(set)
+        self.tomme = [(-plasser, nummer) for nummer, plasser in bord.items()]
+        heapq.heapify(self.tomme)
+
+        # Union-find over Sammen-reglene
+        forelder = {gjest: gjest for gjest in selskaper}
+
+        def rot(gjest):
+            while forelder[gjest] != gjest:
+                forelder[gjest] = forelder[forelder[gjest]]
+                gjest = forelder[gjest]
+            return gjest
+
+        for gjest, annen, regel in regler:
+            if regel == "Sammen" and gjest in selskaper and annen in selskaper:
+                forelder[rot(gjest)] = rot(annen)
+        medlemmer = collections.defaultdict(list)
+        for gjest in selskaper:
+            medlemmer[rot(gjest)].append(gjest)
+        self.medlemmer = list(medlemmer.values())
+        self.blokk_for = {gjest: blokk for blokk, gjester in enumerate(self.medlemmer) for gjest in gjester}
+        self.størrelse = [sum(selskaper[gjest][0] for gjest in gjester) for gjester in self.medlemmer]
+        self.relasjoner = []
+        for gjester in self.medlemmer:
+            relasjoner = collections.Counter()
+            for gjest in gjester:
+                relasjoner[selskaper[gjest][1]] += selskaper[gjest][0]
+            self.relasjoner.append(relasjoner)
+        self.hovedrelasjon = [relasjoner.most_common(1)[0][0] for relasjoner in self.relasjoner]
+        self.adskilt = [set() for _ in self.medlemmer]
+        for gjest, annen, regel in regler:
+            if regel == "Adskilt" and gjest in selskaper and annen in selskaper:
+                blokk, andre = self.blokk_for[gjest], self.blokk_for[annen]
+                if blokk != andre:
+                    self.adskilt[blokk].add(andre)
+                    self.adskilt[andre].add(blokk)
+
+    def passer(self, blokk, nummer):
+        return self.ledig[nummer] >= self.størrelse[blokk] and not (self.adskilt[blokk] & self.blokker_ved[nummer])
+
+    def _endre_ledig(self, nummer, endring):
+        self.med_ledig[self.ledig[nummer]].discard(nummer)
+        self.ledig[nummer] += endring
+        self.totalt_ledig += endring
+        self.med_ledig[self.ledig[nummer]].add(nummer)
+        for relasjon, antall in self.antall[nummer].items():
+            if antall > 0:
+                self.bord_med[relasjon].add(nummer)
+            else:
+                self.bord_med[relasjon].discard(nummer)
+            if antall > 0 and self.ledig[nummer] > 0:
+                self.åpne_med[relasjon].add(nummer)
+            else:
+                self.åpne_med[relasjon].discard(nummer)
+
+    def sett(self, blokk, nummer):
+        self.bord_for[blokk] = nummer
+        self.antall[nummer].update(self.relasjoner[blokk])
+        self.blokker_ved[nummer].add(blokk)
+        self._endre_ledig(nummer, -self.størrelse[blokk])
+
+    def fjern(self, blokk):
+        nummer = self.bord_for.pop(blokk)
+        self.antall[nummer].subtract(self.relasjoner[blokk])
+        self.blokker_ved[nummer].discard(blokk)
+        self._endre_ledig(nummer, self.størrelse[blokk])
+        if not self.blokker_ved[nummer]:
+            heapq.heappush(self.tomme, (-self.kapasitet[nummer], nummer))
+
+    # Endringen i poeng når blokken flyttes til bordet
+    def _flytt_gevinst(self, blokk, nummer):
+        fra, til = self.antall[self.bord_for[blokk]], self.antall[nummer]
+        return sum(2 * antall * (til[relasjon] - fra[relasjon] + antall) for relasjon, antall in self.relasjoner[blokk].items())
+
+    # Endringen i poeng når blokkene (ved hvert sitt bord) bytter bord
+    def _bytte_gevinst(self, blokk, annen):
+        a, b = self.antall[self.bord_for[blokk]], self.antall[self.bord_for[annen]]
+        fra, til = self.relasjoner[blokk], self.relasjoner[annen]
+        gevinst = 0
+        for relasjon in fra.keys() | til.keys():
+            endring = til[relasjon] - fra[relasjon]
+            gevinst += (a[relasjon] + endring) ** 2 - a[relasjon] ** 2 + (b[relasjon] - endring) ** 2 - b[relasjon] ** 2
+        return gevinst
+
+    def _kan_bytte(self, blokk, annen):
+        a, b = self.bord_for[blokk], self.bord_for[annen]
+        endring = self.størrelse[blokk] - self.størrelse[annen]
+        return (
+            self.ledig[a] + endring >= 0 and self.ledig[b] - endring >= 0
+            and not (self.adskilt[blokk] & (self.blokker_ved[b] - {annen}))
+            and not (self.adskilt[annen] & (self.blokker_ved[a] - {blokk}))
+        )
+
+    # Det største tomme bordet hvis blokken får plass ved det, ellers None
+    def _tomt_bord(self, blokk):
+        while self.tomme and self.blokker_ved[self.tomme[0][1]]:
+            heapq.heappop(self.tomme)
+        if self.tomme and -self.tomme[0][0] >= self.størrelse[blokk]:
+            return self.tomme[0][1]
+        return None
+
+    # Bordet blokken passer best ved (se øverst), eller None
+    def _velg_bord(self, blokk):
+        hoved = self.hovedrelasjon[blokk]
+        beste, beste_nøkkel = None, None
+        for nummer in self.åpne_med[hoved]:
+            if self.passer(blokk, nummer):
+                nøkkel = (self.antall[nummer][hoved], -self.ledig[nummer])
+                if beste_nøkkel is None or nøkkel > beste_nøkkel:
+                    beste, beste_nøkkel = nummer, nøkkel
+        if beste is not None:
+            return beste
+        tomt = self._tomt_bord(blokk)
+        if tomt is not None:
+            return tomt
+        for ledig in range(self.størrelse[blokk], self.største + 1):
+            for nummer in self.med_ledig.get(ledig, ()):
+                if self.passer(blokk, nummer):
+                    return nummer
+        return None
+
+    def _største_ledig(self):
+        return max((ledig for ledig, bord in self.med_ledig.items() if bord), default=0)
+
+    # Får ikke blokken plass noe sted, prøves det å flytte én annen blokk fra et bord til et
+    # annet, så blokken får plass der. Bordet kan mangle plasser, eller ha en blokk som
+    # blokken skal sitte adskilt fra; da er det den som må flyttes.
+    def _gjør_plass(self, blokk):
+        størrelse = self.størrelse[blokk]
+        if self.totalt_ledig < størrelse:
+            return False
+        # Blokken som flyttes bort, må få plass ved et annet bord
+        største_ledig = self._største_ledig()
+        for ledig in range(max(0, størrelse - største_ledig), self.største + 1):
+            for nummer in list(self.med_ledig.get(ledig, ())):
+                adskilt = self.adskilt[blokk] & self.blokker_ved[nummer]
+                if len(adskilt) > 1:
+                    continue
+                for annen in sorted(adskilt or self.blokker_ved[nummer], key=self.størrelse.__getitem__):
+                    if self.størrelse[annen] > største_ledig or ledig + self.størrelse[annen] < størrelse:
+                        continue
+                    self.fjern(annen)
+                    if self.passer(blokk, nummer):
+                        self.sett(blokk, nummer)
+                        ny = self._velg_bord(annen)
+                        if ny is not None:
+                            self.sett(annen, ny)
+                            return True
+                        self.fjern(blokk)
+                    self.sett(annen, nummer)
+        return False
+
+    # Plasserer blokkene grådig. Returnerer blokkene som ikke fikk plass.
+    def plasser(self, blokker):
+        rekkefølge = sorted(blokker, key=lambda blokk: (str(self.hovedrelasjon[blokk]), -self.størrelse[blokk]))
+        uten_plass = []
+        for blokk in rekkefølge:
+            nummer = self._velg_bord(blokk)
+            if nummer is not None:
+                self.sett(blokk, nummer)
+            elif not self._gjør_plass(blokk):
+                uten_plass.append(blokk)
+        return uten_plass
+
+    # Lokalsøk over blokkene til ingen flytting eller bytte gir flere poeng, eller tiden er
+    # ute. Med bytte=False flyttes bare blokkene selv, ingen andre.
+    # Å flytte en blokk til et bord uten noen fra relasjonene i den gir aldri flere poeng,
+    # så bare bordene med ledig plass og noen fra de samme relasjonene prøves.
+    def forbedre(self, blokker, tidsgrense, bytte=True):
+        frist = time.perf_counter() + tidsgrense
+        blokker = [blokk for blokk in blokker if blokk in self.bord_for]
+        random.Random(0).shuffle(blokker)
+        forbedret = True
+        while forbedret and time.perf_counter() < frist:
+            forbedret = False
+            for blokk in blokker:
+                fra = self.bord_for[blokk]
+                beste, beste_gevinst = None, 0
+                kandidater = set().union(*(self.åpne_med[relasjon] for relasjon in self.relasjoner[blokk]))
+                for nummer in kandidater:
+                    if nummer != fra and self.passer(blokk, nummer):
+                        gevinst = self._flytt_gevinst(blokk, nummer)
+                        if gevinst > beste_gevinst:
+                            beste, beste_gevinst = nummer, gevinst
+                if beste is not None:
+                    self.fjern(blokk)
+                    self.sett(blokk, beste)
+                    forbedret = True
+                elif bytte and self._bytt(blokk):
+                    forbedret = True
+                if time.perf_counter() >= frist:
+                    break
+
+    # Bytter blokken med en blokk ved et av bordene med flest fra samme relasjon
+    def _bytt(self, blokk):
+        fra, hoved = self.bord_for[blokk], self.hovedrelasjon[blokk]
+        kandidater = heapq.nlargest(BYTTE_KANDIDATER + 1, self.bord_med[hoved], key=lambda nummer: self.antall[nummer][hoved])
+        for nummer in kandidater:
+            if nummer == fra:
+                continue
+            for annen in list(self.blokker_ved[nummer]):
+                if self._kan_bytte(blokk, annen) and self._bytte_gevinst(blokk, annen) > 0:
+                    self.fjern(blokk)
+                    self.fjern(annen)
+                    self.sett(blokk, nummer)
+                    self.sett(annen, fra)
+                    return True
+        return False
+
+    def plassering(self):
+        return {gjest: nummer for blokk, nummer in self.bord_for.items() for gjest in self.medlemmer[blokk]}
+
+
+class Bordplan:
+    # bord: dict bord -> plasser; plassering: dict gjest -> bord; regler: dict ID ->
+    # (gjest, annen gjest, regel)
+    def __init__(self, bord=None, plassering=None, regler=None):
+        self.bord = dict(bord or {})
+        self.plassering = dict(plassering or {})
+        self.regler = dict(regler or {})
+        self.ikke_plassert = []
+        # Antall og relasjon per selskap da planen sist ble oppdatert (None: ukjent)
+        self._selskaper = None
+
+    # Planen fra tabellene Bord, Bordplan og Bordregler (se skjema.py)
+    @classmethod
+    def fra_tabeller(cls, bord, plassering, regler):
+        return cls(
+            dict(zip(bord['Bord'].tolist(), bord['Plasser'].tolist())),
+            dict(zip(plassering['ID'].tolist(), plassering['Bord'].tolist())),
+            {regel_id: (gjest, annen, regel) for regel_id, gjest, annen, regel in zip(
+                regler['ID'].tolist(), regler['Gjest'].tolist(), regler['Annen gjest'].tolist(), regler['Regel'].tolist())},
+        )
+
+    def bordtabell(self):
+        return tilpass(pd.DataFrame({'Bord': list(self.bord), 'Plasser': list(self.bord.values())}), 'Bord')
+
+    def plasstabell(self):
+        return tilpass(pd.DataFrame({'ID': list(self.plassering), 'Bord': list(self.plassering.values())}), 'Bordplan')
+
+    # selskaper: DataFrame med ID, Relasjon og Antall gjester for gjestene som kommer
+    @staticmethod
+    def _som_dict(selskaper):
+        return dict(zip(selskaper['ID'].tolist(), zip(selskaper['Antall gjester'].tolist(), selskaper['Relasjon'].astype(str).tolist())))
+
+    def _avslutt(self, pakking, uten_plass, selskaper):
+        gammel = self.plassering
+        self.plassering = pakking.plassering()
+        self.ikke_plassert = [gjest for blokk in uten_plass for gjest in pakking.medlemmer[blokk]]
+        self._selskaper = selskaper
+        endret = {gjest: nummer for gjest, nummer in self.plassering.items() if gammel.get(gjest) != nummer}
+        fjernet = [gjest for gjest in gammel if gjest not in self.plassering]
+        return endret, fjernet
+
+    # Lager en ny plan for selskapene ved bordene. Returnerer (endret, fjernet): gjestene
+    # som har fått nytt bord (dict gjest -> bord) og gjestene som ikke lenger har bord.
+    def lag(self, selskaper, bord, tidsgrense=TIDSGRENSE):
+        self.bord = dict(bord)
+        selskaper = self._som_dict(selskaper)
+        pakking = _Pakking(self.bord, selskaper, self.regler.values())
+        alle = range(len(pakking.medlemmer))
+        uten_plass = pakking.plasser(alle)
+        pakking.forbedre(alle, tidsgrense)
+        return self._avslutt(pakking, uten_plass, selskaper)
+
+    # Oppdaterer planen etter endrede svar eller regler uten å lage den på nytt (se
+    # øverst). Returnerer det samme som lag.
+    def oppdater(self, selskaper, tidsgrense=TIDSGRENSE_OPPDATERING):
+        selskaper = self._som_dict(selskaper)
+        pakking = _Pakking(self.bord, selskaper, self.regler.values())
+        tidligere = self._selskaper
+        nye = []
+        for blokk, gjester in enumerate(pakking.medlemmer):
+            bord = {self.plassering.get(gjest) for gjest in gjester}
+            nummer = bord.pop() if len(bord) == 1 else None
+            uendret = tidligere is None or all(tidligere.get(gjest) == selskaper[gjest] for gjest in gjester)
+            if nummer in pakking.kapasitet and uendret and pakking.passer(blokk, nummer):
+                pakking.sett(blokk, nummer)
+            else:
+                nye.append(blokk)
+        uten_plass = pakking.plasser(nye)
+        pakking.forbedre(nye, tidsgrense, bytte=False)
+        return self._avslutt(pakking, uten_plass, selskaper)
+
+    # Andelen av de plasserte som sitter ved et bord der flest er fra deres relasjon
+    def samhold(self, selskaper):
+        selskaper = self._som_dict(selskaper)
+        per_bord = collections.defaultdict(collections.Counter)
+        for gjest, nummer in self.plassering.items():
+            if gjest in selskaper:
+                antall, relasjon = selskaper[gjest]
+                per_bord[nummer][relasjon] += antall
+        plassert = sum(sum(antall.values()) for antall in per_bord.values())
+        if not plassert:
+            return 0.0
+        return sum(antall.most_common(1)[0][1] for antall in per_bord.values()) / plassert
+
+    # Bordene med plasser, antall opptatte og relasjonene ved bordet
+    def oversikt(self, selskaper):
+        selskaper = self._som_dict(selskaper)
+        opptatt = collections.Counter()
+        relasjoner = collections.defaultdict(collections.Counter)
+        for gjest, nummer in self.plassering.items():
+            if gjest in selskaper:
+                antall, relasjon = selskaper[gjest]
+                opptatt[nummer] += antall
+                relasjoner[nummer][relasjon] += antall
+        return pd.DataFrame({
+            'Bord': list(self.bord),
+            'Plasser': list(self.bord.values()),
+            'Opptatt': [opptatt[nummer] for nummer in self.bord],
+            'Relasjoner': [", ".join(f"{relasjon} ({antall})" for relasjon, antall in relasjoner[nummer].most_common()) for nummer in self.bord],
+        })
@@ -0,0 +1,626 @@
+import collections
+import itertools
+import threading
+
+import pandas as pd
+
+from bordplassering import Bordplan
+from gjestelager import SIDESTØRRELSE, GjesteLager
+from lagring import NØKLER
+from nokkeltall import BudsjettTall, åpningsposteringer
+from oppgaver import OppgaveLager
+from skjema import tilpass, tilpass_rad
+from tidsplan import Tidsindeks, tildel_ider
+
+# Felles lager for ett bryllup.
+# Alle økter (nettleserfaner) som planlegger samme bryllup deler ett Bryllup i prosessen,
+# i stedet for at hver økt har sin egen kopi av tabellene. Alle endringer går gjennom
+# metodene her: de gjøres under en lås, skrives til lagringen og får et nytt, stigende
+# versjonsnummer. Hver rad (gjest, budsjettkategori, postering, oppgave eller aktivitet) husker versjonen den sist ble
+# endret i. En endring sendes med versjonen av dataene økten så da den begynte å
+# redigere; er raden endret av noen andre etter det, avvises endringen med Konflikt
+# (optimistisk låsing).
+# Alle endringer føres i en logg, slik at en økt kan hente bare det som er endret siden
+# sist (endringer_siden) i stedet for å laste tabellene på nytt.
+# Budsjettet, posteringene, nøkkeltallene for dem, tidsplanen, tidsindeksen for den og de
+# andre tabellene byttes ut ved endring i stedet for å endres på stedet, så en tabell en
+# økt har fått, endres aldri under den. Nøkkeltallene for budsjettet og tidsindeksen
+# bygges først når noen trenger dem.
+# Faktisk og Betalt i budsjettet summeres fra posteringene. Finnes ingen posteringer fra
+# før (en eldre database), lages de fra Faktisk og Betalt slik de står i budsjettet.
+# Gjestelageret og oppgavelageret endres på stedet; lesing fra dem gjøres under bryllup.lås.
+# Sidene av gjestetabellen (gjesteside) huskes til gjestelisten endres, felles for alle økter.
+# Bordplanen (se bordplassering.py) endres også på stedet. Den følger gjestelisten: første
+# gang noen trenger den etter at gjestelisten er endret, plasseres bare gjestene som er
+# endret på nytt, og bare plassene som er endret, lagres.
+# Flere prosesser kan dele samme lagring. Har en annen prosess skrevet til den (se
+# Lagring.dataversjon), glemmes alt som er lastet før neste lesing eller endring, så
+# tabellene leses på nytt, og alle rader får en ny versjon. En økt som redigerte en rad
+# før det, får da Konflikt i stedet for å skrive over den andre prosessens endring.
+
+# Antall endringer som huskes i loggen. En økt som er lenger bak, må lese alt på nytt.
+LOGG_LENGDE = 1000
+
+# Antall sider av gjestetabellen som huskes
+SIDE_MAKS_ANTALL = 64
+
+# Tabellene bordplanen lagres i
+BORD_TABELLER = ["Bord", "Bordplan", "Bordregler"]
+
+STANDARD_KATEGORIER = ['Lokale', 'Catering', 'Fotograf', 'Blomster', 'Kake', 'Klær', 'Ringer',
+                       'Dekorasjoner', 'Transport', 'Musikk', 'Invitasjoner', 'Annet']
+
+# handling er 'ny', 'endret', 'slettet' eller 'erstattet' (hele tabellen). nøkkel er
+# ID-en eller kategorien til raden (None når flere rader er lagt til på én gang), og
+# gammel er raden før endringen. Endres mange rader på én gang, får hver rad sin egen
+# Endring, alle med samme versjon.
+Endring = collections.namedtuple('Endring', ['versjon', 'økt', 'tabell', 'handling', 'nøkkel', 'gammel'])
+
+
+# Raden er endret eller slettet av noen andre siden økten leste den.
+# nøkler er ID-ene eller kategoriene til radene det gjelder.
+class Konflikt(Exception):
+    def __init__(self, melding, nøkler=()):
+        super().__init__(melding)
+        self.nøkler = list(nøkler)
+
+
+# Lager en tom tabell når ingenting er lagret fra før.
+# Tabellene får kolonnene og typene fra skjema.py.
+def ny_tabell(navn):
+    if navn == "Budsjett":
+        return tilpass(pd.DataFrame({'Kategori': STANDARD_KATEGORIER}), navn)
+    return tilpass(pd.DataFrame(), navn)
+
+
+class Bryllup:
+    def __init__(self, lagring):
+        self.lagring = lagring
+        self.lås = threading.RLock()
+        self.versjon = 0
+        self._logg = collections.deque(maxlen=LOGG_LENGDE)
+        self._glemt = 0
+        self._tabellversjoner = {}
+        # Versjonen hver tabell sist ble endret i, uansett rad (se endret_i)
+        self._endret = {}
+        self._radversjoner = {'Gjester': {}, 'Budsjett': {}, 'Posteringer': {}, 'Oppgaver': {}, 'Tidsplan': {}, 'Bordregler': {}}
+        self._gjester = None
+        self._tabeller = {}
+        self._budsjetttall = None
+        self._tidsindeks = None
+        # Neste ID for tidsplanen, posteringene og bordreglene. Den bare øker, som i
+        # gjestelageret, så ID-en til en slettet rad aldri gis til en ny.
+        self._neste_id = {}
+        self._ventende = {}
+        self._gjestesider = collections.OrderedDict()
+        self._bordplan = None
+        self._bordplan_oppdatert = False
+        self._dataversjon = lagring.dataversjon()
+
+    # ----------------------------------------
+    # Innlasting
+
+    # Glemmer tabellene og det som er bygget av dem hvis en annen prosess har skrevet til
+    # lagringen siden sist. Loggen går da ikke lenger tilbake enn hit (endringer_siden gir
+    # None), og alle rader får den nye versjonen.
+    def synkroniser(self):
+        with self.lås:
+            dataversjon = self.lagring.dataversjon()
+            if dataversjon == self._dataversjon:
+                return
+            self._dataversjon = dataversjon
+            self._gjester = None
+            self._tabeller.clear()
+            self._budsjetttall = None
+            self._tidsindeks = None
+            self._gjestesider.clear()
+            self._bordplan = None
+            self._bordplan_oppdatert = False
+            self.versjon += 1
+            self._logg.clear()
+            self._glemt = self.versjon
+            for radversjoner in self._radversjoner.values():
+                radversjoner.clear()
+            self._tabellversjoner = {tabell: self.versjon for tabell in list(self._radversjoner) + ["Bordplan"]}
+            self._endret = dict(self._tabellversjoner)
+
+    def er_lastet(self, navn):
+        if navn in self._ventende:
+            return False
+        if navn == "Gjester":
+            return self._gjester is not None
+        return navn in self._tabeller
+
+    def _sett_tabell(self, navn, df):
+        if navn == "Gjester":
+            self._gjester = GjesteLager(df)
+            self._gjestesider.clear()
+        elif navn == "Oppgaver":
+            self._tabeller[navn] = OppgaveLager(df)
+        else:
+            df = tilpass(df, navn)
+            if navn in ("Tidsplan", "Posteringer"):
+                df = tildel_ider(df)
+                neste = int(df['ID'].max()) + 1 if len(df) else 1
+                self._neste_id[navn] = max(self._neste_id.get(navn, 1), neste)
+            if navn == "Tidsplan":
+                self._tidsindeks = None
+            if navn in ("Budsjett", "Posteringer"):
+                self._budsjetttall = None
+            self._tabeller[navn] = df
+
+    # Tabellen slik den lagres: gjestelageret og oppgavelageret bygger den selv
+    def _dataramme(self, navn):
+        if navn == "Gjester":
+            return self._gjester.tabell()
+        tabell = self._tabeller[navn]
+        return tabell.tabell() if isinstance(tabell, OppgaveLager) else tabell
+
+    # Sørger for at tabellen er lastet og ikke er eldre enn lagringen. Kalles før låsen tas.
+    def _hent(self, navn):
+        self.synkroniser()
+        self._last_inn(navn)
+
+    # Laster tabellen: fra en opplastet fil hvis den venter på å bli lest, ellers fra
+    # lagringen, ellers som en ny tabell. En ny tabell lagres med en gang, slik at senere
+    # endringer av enkeltrader havner i en komplett tabell. Det samme gjelder en lagret
+    # tabell der radene mangler nøkkel (fra før tabellen fikk en).
+    # Arket i en opplastet fil leses uten låsen, så andre økter ikke må vente på det.
+    def _last_inn(self, navn):
+        leser = self._ventende.get(navn)
+        if leser is not None:
+            df = leser()
+            with self.lås:
+                if self._ventende.get(navn) is leser:
+                    del self._ventende[navn]
+                    self._sett_tabell(navn, df)
+                    self.lagring.erstatt(navn, self._dataramme(navn))
+        with self.lås:
+            if self.er_lastet(navn):
+                return
+            df = self.lagring.last(navn)
+            nøkkel = NØKLER[navn]
+            if df is None or (nøkkel is not None and df[nøkkel].isna().any()):
+                if df is None:
+                    df = åpningsposteringer(self._lastet("Budsjett")) if navn == "Posteringer" else ny_tabell(navn)
+                self._sett_tabell(navn, df)
+                self.lagring.erstatt(navn, self._dataramme(navn))
+            else:
+                self._sett_tabell(navn, df)
+
+    # Den lastede tabellen (gjestelageret for Gjester, oppgavelageret for Oppgaver). Kalles under låsen, og laster
+    # tabellen på nytt hvis en opplastet fil eller en annen prosess har erstattet den siden _hent.
+    def _lastet(self, navn):
+        if not self.er_lastet(navn):
+            self._last_inn(navn)
+        return self._gjester if navn == "Gjester" else self._tabeller[navn]
+
+    # Tar i bruk en opplastet fil. lesere er en dict ark -> funksjon som leser arket;
+    # arkene leses først når noen trenger tabellen.
+    def vent_på_fil(self, lesere, økt):
+        with self.lås:
+            for navn, leser in lesere.items():
+                self._ventende[navn] = leser
+                if navn == "Gjester":
+                    self._gjester = None
+                else:
+                    self._tabeller.pop(navn, None)
+                self._ny_versjon(økt, navn, 'erstattet', None, None)
+
+    # ----------------------------------------
+    # Lesing
+
+    # Tabellen som DataFrame. Den endres ikke etterpå, heller ikke av andre økter.
+    # Budsjettet får Faktisk og Betalt fra posteringene.
+    def tabell(self, navn):
+        if navn == "Budsjett":
+            return self.budsjetttall().budsjett
+        self._hent(navn)
+        with self.lås:
+            self._lastet(navn)
+            return self._dataramme(navn)
+
+    # Gjestelageret, bare for lesing. Lesing som går over flere kall gjøres under self.lås.
+    def gjestelager(self):
+        self._hent("Gjester")
+        with self.lås:
+            return self._lastet("Gjester")
+
+    # Oppgavelageret, bare for lesing, som gjestelager
+    def oppgavelager(self):
+        self._hent("Oppgaver")
+        with self.lås:
+            return self._lastet("Oppgaver")
+
+    # Nøkkeltallene for budsjettet (se nokkeltall.py). De regnes ut på nytt første gang
+    # noen trenger dem etter en endring av budsjettet eller posteringene.
+    def budsjetttall(self):
+        self._hent("Budsjett")
+        self._hent("Posteringer")
+        with self.lås:
+            budsjett, posteringer = self._lastet("Budsjett"), self._lastet("Posteringer")
+            if self._budsjetttall is None:
+                self._budsjetttall = BudsjettTall(budsjett, posteringer)
+            return self._budsjetttall
+
+    # Tidsindeksen for tidsplanen (se tidsplan.py). Den bygges på nytt første gang noen
+    # trenger den etter en endring, og endres ikke etterpå.
+    def tidsindeks(self):
+        self._hent("Tidsplan")
+        with self.lås:
+            self._lastet("Tidsplan")
+            if self._tidsindeks is None:
+                self._tidsindeks = Tidsindeks(self._tabeller["Tidsplan"])
+            return self._tidsindeks
+
+    # Bordplanen, bare for lesing under bryllup.lås som gjestelageret. Er gjestelisten endret
+    # siden sist, oppdateres planen først (se øverst).
+    def bordplan(self):
+        self._hent("Gjester")
+        with self.lås:
+            plan = self._lastet_bordplan()
+            if not self._bordplan_oppdatert:
+                self._lagre_plasser(plan, *plan.oppdater(self._kommer()))
+            return plan
+
+    # Gjestene som kommer, med følge: ID, Relasjon og Antall gjester. Kalles under låsen.
+    def _kommer(self):
+        return self._lastet("Gjester").utvalg("", {'RSVP Status': 'Kommer'})[['ID', 'Relasjon', 'Antall gjester']]
+
+    def utvalg(self, tekst="", filtre=None):
+        self._hent("Gjester")
+        with self.lås:
+            return self._lastet("Gjester").utvalg(tekst, filtre)
+
+    # Én side av gjestetabellen (se GjesteLager.side). Siden huskes til gjestelisten endres,
+    # så å bla tilbake eller veksle mellom filtre henter den ferdige siden.
+    def gjesteside(self, tekst="", filtre=None, sorter_etter=None, stigende=True, start=0, antall=SIDESTØRRELSE):
+        nøkkel = (tekst, tuple(sorted((filtre or {}).items())), sorter_etter, stigende, start, antall)
+        self._hent("Gjester")
+        with self.lås:
+            side = self._gjestesider.get(nøkkel)
+            if side is not None:
+                self._gjestesider.move_to_end(nøkkel)
+                return side
+            side = self._lastet("Gjester").side(tekst, filtre, sorter_etter, stigende, start, antall)
+            self._gjestesider[nøkkel] = side
+            if len(self._gjestesider) > SIDE_MAKS_ANTALL:
+                self._gjestesider.popitem(last=False)
+            return side
+
+    # Tabellene i arkrekkefølge for eksport. Ark fra en opplastet fil som ingen har
+    # trengt ennå, tas med som funksjonen som leser dem.
+    def eksporttabeller(self, ark):
+        with self.lås:
+            ventende = dict(self._ventende)
+        return {navn: ventende[navn] if navn in ventende else self.tabell(navn) for navn in ark}
+
+    # Versjonen raden sist ble endret i. Rader som ikke er endret siden tabellen ble
+    # lastet eller erstattet, har versjonen til tabellen.
+    def radversjon(self, tabell, nøkkel):
+        with self.lås:
+            return self._radversjoner[tabell].get(nøkkel, self._tabellversjoner.get(tabell, 0))
+
+    # Versjonen noen av tabellene sist ble endret i. Er den uendret, er tabellene det også,
+    # så det som er bygget av dem (som figurene), kan gjenbrukes.
+    def endret_i(self, *tabeller):
+        with self.lås:
+            return max(self._endret.get(tabell, 0) for tabell in tabeller)
+
+    # Endringene etter versjon, eldste først. None betyr at loggen ikke går så langt
+    # tilbake, og at alt må leses på nytt.
+    def endringer_siden(self, versjon):
+        with self.lås:
+            if versjon >= self.versjon:
+                return []
+            if versjon < self._glemt:
+                return None
+            nyere = itertools.takewhile(lambda endring: endring.versjon > versjon, reversed(self._logg))
+            return list(nyere)[::-1]
+
+    # ----------------------------------------
+    # Endringer
+
+    # Endringer med versjon til og med _glemt kan mangle i loggen
+    def _logg_endring(self, endring):
+        if len(self._logg) == self._logg.maxlen:
+            self._glemt = self._logg[0].versjon
+        self._logg.append(endring)
+
+    def _ny_versjon(self, økt, tabell, handling, nøkkel, gammel):
+        self.versjon += 1
+        self._logg_endring(Endring(self.versjon, økt, tabell, handling, nøkkel, gammel))
+        self._endret[tabell] = self.versjon
+        if handling == 'erstattet':
+            self._tabellversjoner[tabell] = self.versjon
+            self._radversjoner.get(tabell, {}).clear()
+        elif nøkkel is not None:
+            self._radversjoner[tabell][nøkkel] = self.versjon
+        if tabell == "Gjester":
+            self._gjestesider.clear()
+            self._bordplan_oppdatert = False
+        return self.versjon
+
+    # Én ny versjon for mange rader. gamle er en dict nøkkel -> raden før endringen.
+    def _ny_versjon_mange(self, økt, tabell, handling, gamle):
+        self.versjon += 1
+        for nøkkel, gammel in gamle.items():
+            self._logg_endring(Endring(self.versjon, økt, tabell, handling, nøkkel, gammel))
+            self._radversjoner[tabell][nøkkel] = self.versjon
+        self._endret[tabell] = self.versjon
+        if tabell == "Gjester":
+            self._gjestesider.clear()
+            self._bordplan_oppdatert = False
+        return self.versjon
+
+    # Kalles under låsen, etter at tabellen er lastet
+    def _ny_id(self, navn):
+        ny_id = self._neste_id[navn]
+        self._neste_id[navn] = ny_id + 1
+        return ny_id
+
+    # versjon er versjonen av dataene økten så (radversjonen eller hele lagerets versjon).
+    # None betyr at endringen gjøres uansett hva andre har gjort.
+    def _sjekk_versjon(self, tabell, nøkkel, finnes, versjon):
+        if not finnes:
+            raise Konflikt(f"{nøkkel} er slettet av noen andre", [nøkkel])
+        if versjon is not None and self.radversjon(tabell, nøkkel) > versjon:
+            raise Konflikt(f"{nøkkel} er endret av noen andre", [nøkkel])
+
+    # Legger til én gjest og returnerer ID-en
+    def legg_til_gjest(self, rad, økt):
+        self._hent("Gjester")
+        with self.lås:
+            lager = self._lastet("Gjester")
+            gjest_id = lager.legg_til(rad)
+            self.lagring.lagre_rader("Gjester", [lager.rad(gjest_id)])
+            self._ny_versjon(økt, "Gjester", 'ny', gjest_id, None)
+        return gjest_id
+
+    # Legger til alle gjestene i en DataFrame og returnerer ID-ene
+    def legg_til_gjester(self, gjester, økt):
+        self._hent("Gjester")
+        with self.lås:
+            lager = self._lastet("Gjester")
+            ider = lager.legg_til_tabell(gjester)
+            self.lagring.lagre_rader("Gjester", [lager.rad(gjest_id) for gjest_id in ider])
+            self._ny_versjon(økt, "Gjester", 'ny', None, None)
+        return ider
+
+    def oppdater_gjest(self, gjest_id, endringer, versjon, økt):
+        self._hent("Gjester")
+        with self.lås:
+            lager = self._lastet("Gjester")
+            self._sjekk_versjon("Gjester", gjest_id, gjest_id in lager, versjon)
+            gammel = lager.rad(gjest_id)
+            lager.oppdater(gjest_id, endringer)
+            self.lagring.lagre_rader("Gjester", [lager.rad(gjest_id)])
+            self._ny_versjon(økt, "Gjester", 'endret', gjest_id, gammel)
+
+    # Endrer mange gjester i én omgang (masseredigering). redigert har en ID-kolonne og
+    # kolonnene som redigeres; bare gjester der noe faktisk er endret, lagres, og alle
+    # lagres samlet. Er noen av dem slettet, eller endret av andre etter versjon, lagres
+    # ingenting. Returnerer de endrede radene.
+    def oppdater_gjester(self, redigert, versjon, økt):
+        self._hent("Gjester")
+        with self.lås:
+            lager = self._lastet("Gjester")
+            slettet = [gjest_id for gjest_id in redigert['ID'].tolist() if gjest_id not in lager]
+            if slettet:
+                raise Konflikt(f"{len(slettet)} gjester er slettet av noen andre", slettet)
+            endret = lager.forskjeller(redigert)
+            if versjon is not None:
+                andres = [gjest_id for gjest_id in endret['ID'].tolist() if self.radversjon("Gjester", gjest_id) > versjon]
+                if andres:
+                    raise Konflikt(f"{len(andres)} gjester er endret av noen andre", andres)
+            if endret.empty:
+                return endret
+            gamle = lager.oppdater_mange(endret)
+            self.lagring.lagre_rader("Gjester", endret.to_dict('records'))
+            self._ny_versjon_mange(økt, "Gjester", 'endret', dict(zip(gamle['ID'].tolist(), gamle.to_dict('records'))))
+        return endret
+
+    def slett_gjest(self, gjest_id, versjon, økt):
+        self._hent("Gjester")
+        with self.lås:
+            lager = self._lastet("Gjester")
+            self._sjekk_versjon("Gjester", gjest_id, gjest_id in lager, versjon)
+            gammel = lager.rad(gjest_id)
+            lager.slett(gjest_id)
+            self.lagring.slett_rader("Gjester", [gjest_id])
+            self._ny_versjon(økt, "Gjester", 'slettet', gjest_id, gammel)
+
+    def oppdater_budsjett(self, kategori, endringer, versjon, økt):
+        self._hent("Budsjett")
+        with self.lås:
+            budsjett = self._lastet("Budsjett")
+            treff = budsjett.index[budsjett['Kategori'] == kategori]
+            self._sjekk_versjon("Budsjett", kategori, len(treff) > 0, versjon)
+            gammel = budsjett.loc[treff[0]].to_dict()
+            ny = tilpass_rad(dict(gammel, **endringer, Kategori=kategori), "Budsjett")
+            budsjett = budsjett.copy()
+            for kolonne, verdi in ny.items():
+                budsjett.at[treff[0], kolonne] = verdi
+            self.lagring.lagre_rader("Budsjett", [ny])
+            self._tabeller["Budsjett"] = budsjett
+            self._budsjetttall = None
+            self._ny_versjon(økt, "Budsjett", 'endret', kategori, gammel)
+
+    def legg_til_kategori(self, kategori, økt):
+        self._hent("Budsjett")
+        with self.lås:
+            budsjett = self._lastet("Budsjett")
+            if kategori in budsjett['Kategori'].values:
+                raise ValueError(f"Kategorien {kategori} finnes allerede")
+            ny = tilpass(pd.DataFrame({'Kategori': [kategori]}), "Budsjett")
+            self.lagring.lagre_rader("Budsjett", ny.to_dict('records'))
+            self._tabeller["Budsjett"] = pd.concat([budsjett, ny], ignore_index=True)
+            self._budsjetttall = None
+            self._ny_versjon(økt, "Budsjett", 'ny', kategori, None)
+
+    # Fører en faktura eller betaling og returnerer ID-en
+    def legg_til_postering(self, rad, økt):
+        self._hent("Posteringer")
+        with self.lås:
+            posteringer = self._lastet("Posteringer")
+            postering_id = self._ny_id("Posteringer")
+            ny = tilpass(pd.DataFrame([dict(rad, ID=postering_id)]), "Posteringer")
+            self.lagring.lagre_rader("Posteringer", ny.to_dict('records'))
+            self._tabeller["Posteringer"] = pd.concat([posteringer, ny], ignore_index=True)
+            self._budsjetttall = None
+            self._ny_versjon(økt, "Posteringer", 'ny', postering_id, None)
+        return postering_id
+
+    def slett_postering(self, postering_id, versjon, økt):
+        self._hent("Posteringer")
+        with self.lås:
+            posteringer = self._lastet("Posteringer")
+            treff = posteringer.index[posteringer['ID'] == postering_id]
+            self._sjekk_versjon("Posteringer", postering_id, len(treff) > 0, versjon)
+            gammel = posteringer.loc[treff[0]].to_dict()
+            self.lagring.slett_rader("Posteringer", [postering_id])
+            self._tabeller["Posteringer"] = posteringer.drop(index=treff).reset_index(drop=True)
+            self._budsjetttall = None
+            self._ny_versjon(økt, "Posteringer", 'slettet', postering_id, gammel)
+
+    # Legger til én oppgave og returnerer ID-en
+    def legg_til_oppgave(self, rad, økt):
+        self._hent("Oppgaver")
+        with self.lås:
+            lager = self._lastet("Oppgaver")
+            oppgave_id = lager.legg_til(rad)
+            self.lagring.lagre_rader("Oppgaver", [lager.rad(oppgave_id)])
+            self._ny_versjon(økt, "Oppgaver", 'ny', oppgave_id, None)
+        return oppgave_id
+
+    def oppdater_oppgave(self, oppgave_id, endringer, versjon, økt):
+        self._hent("Oppgaver")
+        with self.lås:
+            lager = self._lastet("Oppgaver")
+            self._sjekk_versjon("Oppgaver", oppgave_id, oppgave_id in lager, versjon)
+            gammel = lager.rad(oppgave_id)
+            lager.oppdater(oppgave_id, endringer)
+            self.lagring.lagre_rader("Oppgaver", [lager.rad(oppgave_id)])
+            self._ny_versjon(økt, "Oppgaver", 'endret', oppgave_id, gammel)
+
+    def slett_oppgave(self, oppgave_id, versjon, økt):
+        self._hent("Oppgaver")
+        with self.lås:
+            lager = self._lastet("Oppgaver")
+            self._sjekk_versjon("Oppgaver", oppgave_id, oppgave_id in lager, versjon)
+            gammel = lager.rad(oppgave_id)
+            lager.slett(oppgave_id)
+            self.lagring.slett_rader("Oppgaver", [oppgave_id])
+            self._ny_versjon(økt, "Oppgaver", 'slettet', oppgave_id, gammel)
+
+    # Legger til én aktivitet i tidsplanen og returnerer ID-en
+    def legg_til_aktivitet(self, rad, økt):
+        self._hent("Tidsplan")
+        with self.lås:
+            tidsplan = self._lastet("Tidsplan")
+            aktivitet_id = self._ny_id("Tidsplan")
+            ny = tilpass(pd.DataFrame([dict(rad, ID=aktivitet_id)]), "Tidsplan")
+            self.lagring.lagre_rader("Tidsplan", ny.to_dict('records'))
+            self._tabeller["Tidsplan"] = pd.concat([tidsplan, ny], ignore_index=True)
+            self._tidsindeks = None
+            self._ny_versjon(økt, "Tidsplan", 'ny', aktivitet_id, None)
+        return aktivitet_id
+
+    def oppdater_aktivitet(self, aktivitet_id, endringer, versjon, økt):
+        self._hent("Tidsplan")
+        with self.lås:
+            tidsplan = self._lastet("Tidsplan")
+            treff = tidsplan.index[tidsplan['ID'] == aktivitet_id]
+            self._sjekk_versjon("Tidsplan", aktivitet_id, len(treff) > 0, versjon)
+            gammel = tidsplan.loc[treff[0]].to_dict()
+            ny = tilpass_rad(dict(gammel, **endringer, ID=aktivitet_id), "Tidsplan")
+            tidsplan = tidsplan.copy()
+            for kolonne, verdi in ny.items():
+                tidsplan.at[treff[0], kolonne] = verdi
+            self.lagring.lagre_rader("Tidsplan", [ny])
+            self._tabeller["Tidsplan"] = tidsplan
+            self._tidsindeks = None
+            self._ny_versjon(økt, "Tidsplan", 'endret', aktivitet_id, gammel)
+
+    def slett_aktivitet(self, aktivitet_id, versjon, økt):
+        self._hent("Tidsplan")
+        with self.lås:
+            tidsplan = self._lastet("Tidsplan")
+            treff = tidsplan.index[tidsplan['ID'] == aktivitet_id]
+            self._sjekk_versjon("Tidsplan", aktivitet_id, len(treff) > 0, versjon)
+            gammel = tidsplan.loc[treff[0]].to_dict()
+            self.lagring.slett_rader("Tidsplan", [aktivitet_id])
+            self._tabeller["Tidsplan"] = tidsplan.drop(index=treff).reset_index(drop=True)
+            self._tidsindeks = None
+            self._ny_versjon(økt, "Tidsplan", 'slettet', aktivitet_id, gammel)
+
+    # Kalles under låsen
+    def _lastet_bordplan(self):
+        if self._bordplan is None:
+            tabeller = [self.lagring.last(navn) for navn in BORD_TABELLER]
+            tabeller = [ny_tabell(navn) if df is None else df for navn, df in zip(BORD_TABELLER, tabeller)]
+            self._bordplan = Bordplan.fra_tabeller(*tabeller)
+            self._bordplan_oppdatert = False
+            neste = max(self._bordplan.regler, default=0) + 1
+            self._neste_id["Bordregler"] = max(self._neste_id.get("Bordregler", 1), neste)
+        return self._bordplan
+
+    # Lagrer plassene som er endret i planen. Plassene følger av gjestelisten og reglene,
+    # så de får ikke en egen versjon.
+    def _lagre_plasser(self, plan, endret, fjernet):
+        if endret:
+            self.lagring.lagre_rader("Bordplan", [{'ID': gjest_id, 'Bord': nummer} for gjest_id, nummer in endret.items()])
+        if fjernet:
+            self.lagring.slett_rader("Bordplan", fjernet)
+        self._bordplan_oppdatert = True
+
+    # Lager en ny bordplan med antall_bord bord med plasser plasser hver
+    def lag_bordplan(self, antall_bord, plasser, økt):
+        self._hent("Gjester")
+        with self.lås:
+            plan = self._lastet_bordplan()
+            plan.lag(self._kommer(), {nummer: plasser for nummer in range(1, antall_bord + 1)})
+            self.lagring.erstatt("Bord", plan.bordtabell())
+            self.lagring.erstatt("Bordplan", plan.plasstabell())
+            self._bordplan_oppdatert = True
+            self._ny_versjon(økt, "Bordplan", 'erstattet', None, None)
+            return plan
+
+    # Legger til en regel for to gjester, eller endrer regelen hvis de har en fra før, og
+    # flytter gjestene som ikke lenger sitter riktig. Returnerer ID-en til regelen.
+    def legg_til_bordregel(self, gjest_id, annen_id, regel, økt):
+        if gjest_id == annen_id:
+            raise ValueError("Velg to forskjellige gjester")
+        self._hent("Gjester")
+        with self.lås:
+            lager = self._lastet("Gjester")
+            if gjest_id not in lager or annen_id not in lager:
+                raise Konflikt("Gjesten er slettet av noen andre", [gjest_id, annen_id])
+            plan = self._lastet_bordplan()
+            par = {gjest_id, annen_id}
+            regel_id = next((regel_id for regel_id, (gjest, annen, _) in plan.regler.items() if {gjest, annen} == par), None)
+            handling = 'endret' if regel_id is not None else 'ny'
+            if regel_id is None:
+                regel_id = self._ny_id("Bordregler")
+            plan.regler[regel_id] = (gjest_id, annen_id, regel)
+            self.lagring.lagre_rader("Bordregler", [{'ID': regel_id, 'Gjest': gjest_id, 'Annen gjest': annen_id, 'Regel': regel}])
+            self._lagre_plasser(plan, *plan.oppdater(self._kommer()))
+            self._ny_versjon(økt, "Bordregler", handling, regel_id, None)
+        return regel_id
+
+    def slett_bordregel(self, regel_id, økt):
+        self._hent("Gjester")
+        with self.lås:
+            plan = self._lastet_bordplan()
+            if plan.regler.pop(regel_id, None) is None:
+                return
+            self.lagring.slett_rader("Bordregler", [regel_id])
+            self._ny_versjon(økt, "Bordregler", 'slettet', regel_id, None)
+
+    # Erstatter hele tabellen (import o.l.)
+    def erstatt(self, navn, df, økt):
+        with self.lås:
+            self._ventende.pop(navn, None)
+            self._sett_tabell(navn, df)
+            self.lagring.erstatt(navn, self._dataramme(navn))
+            self._ny_versjon(økt, navn, 'erstattet', None, None)
@@ -0,0 +1,164 @@
+import hashlib
+import os
+import struct
+import zipfile
+from io import BytesIO
+
+import pandas as pd
+
+from nokkeltall import åpningsposteringer
+from skjema import excel_dtyper, tilpass
+
+# Eksport og import av alle tabellene.
+# Excel (xlsx) er formatet for utveksling med andre programmer. For å lagre og hente
+# inn igjen arbeidet finnes i tillegg et øyeblikksbilde: en ukomprimert zip-fil med én
+# Arrow IPC-fil per tabell. Arrow-filene leses rett fra bufferet (eller fra en
+# minnekartlagt fil på disk) uten tolking av celler, så det er mange ganger raskere
+# enn Excel begge veier. Formatet på en opplastet fil gjenkjennes ut fra innholdet.
+# Arkene kan leses hvert for seg (les_ark), og får typene fra skjema.py.
+# Filer fra før det fantes posteringer, mangler arket med dem; posteringene lages da fra
+# Faktisk og Betalt i budsjettarket.
+
+ARK = ["Gjester", "Budsjett", "Posteringer", "Oppgaver", "Tidsplan"]
+
+# Ark som kan mangle i filen
+VALGFRIE_ARK = ["Posteringer"]
+
+SNAPSHOT_MANIFEST = "bryllup-snapshot.txt"
+SNAPSHOT_VERSJON = "1"
+
+
+# Lager en innholdsnøkkel for en DataFrame. Nøkkelen endres bare når kolonner,
+# datatyper eller verdier endres, og er billig å regne ut sammenlignet med en eksport.
+def tabell_hash(df):
+    radhasher = pd.util.hash_pandas_object(df, index=False).to_numpy()
+    return (
+        tuple(df.columns),
+        tuple(str(dtype) for dtype in df.dtypes),
+        hashlib.sha1(radhasher.tobytes()).hexdigest()
+    )
+
+
+def bygg_excel(tabeller):
+    output = BytesIO()
+    with pd.ExcelWriter(output, engine='xlsxwriter') as writer:
+        for ark, df in tabeller.items():
+            df.to_excel(writer, sheet_name=ark, index=False)
+    return output.getvalue()
+
+
+def les_excel(innhold, ark=ARK):
+    xls = pd.ExcelFile(BytesIO(innhold))
+
+    def les(navn):
+        if navn in VALGFRIE_ARK and navn not in xls.sheet_names:
+            return åpningsposteringer(les("Budsjett"))
+        return tilpass(pd.read_excel(xls, sheet_name=navn, dtype=excel_dtyper(navn)), navn)
+
+    return {navn: les(navn) for navn in ark}
+
+
+# Arrow krever én type per kolonne. Tekstkolonner med blandede verdier (f.eks. True og
+# "" i Invitert) lagres derfor som tekst.
+def _til_arrow(df):
+    import pyarrow as pa
+
+    kolonner = {}
+    for kolonne in df.columns:
+        try:
+            kolonner[kolonne] = pa.array(df[kolonne], from_pandas=True)
+        except (pa.ArrowInvalid, pa.ArrowTypeError):
+            kolonner[kolonne] = pa.array(df[kolonne].map(lambda verdi: verdi if pd.isna(verdi) else str(verdi)), from_pandas=True)
+    return pa.table(kolonner)
+
+
+def bygg_snapshot(tabeller):
+    import pyarrow as pa
+
+    output = BytesIO()
+    with zipfile.ZipFile(output, 'w', compression=zipfile.ZIP_STORED) as zf:
+        zf.writestr(SNAPSHOT_MANIFEST, SNAPSHOT_VERSJON)
+        for ark, df in tabeller.items():
+            tabell = _til_arrow(df)
+            sink = pa.BufferOutputStream()
+            with pa.ipc.new_file(sink, tabell.schema) as skriver:
+                skriver.write_table(tabell)
+            zf.writestr(f"{ark}.arrow", sink.getvalue().to_pybytes())
+    return output.getvalue()
+
+
+# Finner bufferet til et ukomprimert medlem av zip-filen uten å kopiere det
+def _medlem(buffer, info):
+    hode = buffer.slice(info.header_offset, 30).to_pybytes()
+    navn_lengde, ekstra_lengde = struct.unpack('<HH', hode[26:30])
+    start = info.header_offset + 30 + navn_lengde + ekstra_lengde
+    return buffer.slice(start, info.file_size)
+
+
+# Leser et øyeblikksbilde fra bytes, eller fra en sti (da minnekartlegges filen)
+def les_snapshot(kilde, ark=ARK):
+    import pyarrow as pa
+
+    if isinstance(kilde, (str, os.PathLike)):
+        buffer = pa.memory_map(os.fspath(kilde)).read_buffer()
+    else:
+        buffer = pa.py_buffer(kilde)
+    with zipfile.ZipFile(pa.BufferReader(buffer)) as zf:
+        def les(navn):
+            if navn in VALGFRIE_ARK and f"{navn}.arrow" not in zf.namelist():
+                return åpningsposteringer(les("Budsjett"))
+            info = zf.getinfo(f"{navn}.arrow")
+            if info.compress_type == zipfile.ZIP_STORED:
+                data = _medlem(buffer, info)
+            else:
+                data = pa.py_buffer(zf.read(info))
+            return tilpass(pa.ipc.open_file(data).read_all().to_pandas(), navn)
+
+        return {navn: les(navn) for navn in ark}
+
+
+# Returnerer "snapshot", "excel" eller None ut fra innholdet i filen
+def finn_format(innhold):
+    fil = BytesIO(innhold)
+    if not zipfile.is_zipfile(fil):
+        return None
+    with zipfile.ZipFile(fil) as zf:
+        navn = set(zf.namelist())
+    if SNAPSHOT_MANIFEST in navn:
+        return "snapshot"
+    if "[Content_Types].xml" in navn:
+        return "excel"
+    return None
+
+
+def _sjekk_format(format):
+    if format not in ("snapshot", "excel"):
+        raise ValueError("Filen er verken en Excel-fil eller et øyeblikksbilde fra bryllupsplanleggeren")
+
+
+# Navnene på arkene som finnes i filen
+def ark_i_fil(innhold, format=None):
+    format = format or finn_format(innhold)
+    _sjekk_format(format)
+    if format == "snapshot":
+        with zipfile.ZipFile(BytesIO(innhold)) as zf:
+            return [navn[:-len(".arrow")] for navn in zf.namelist() if navn.endswith(".arrow")]
+    return pd.ExcelFile(BytesIO(innhold)).sheet_names
+
+
+# Leser ett ark (én tabell) fra en opplastet fil, uansett format
+def les_ark(innhold, ark, format=None):
+    format = format or finn_format(innhold)
+    _sjekk_format(format)
+    if format == "snapshot":
+        return les_snapshot(innhold, [ark])[ark]
+    return les_excel(innhold, [ark])[ark]
+
+
+# Leser alle tabellene fra en opplastet fil, uansett format
+def les_fil(innhold):
+    format = finn_format(innhold)
+    _sjekk_format(format)
+    if format == "snapshot":
+        return les_snapshot(innhold)
+    return les_excel(innhold)
@@ -0,0 +1,149 @@
+import collections
+import threading
+
+import pandas as pd
+
+# Plotly-figurene i appen.
+# Figurene bygges fra RSVP-tallene, nøkkeltallene for budsjettet (se nokkeltall.py) og
+# tidsplanen. Hver figur gir None når det ikke er noe å vise.
+# st.plotly_chart kopierer figuren og gjør den om til JSON ved hver kjøring, også når den
+# er uendret, og for store figurer tar det mesteparten av tiden. Det som caches, er derfor
+# spesifikasjonen (figuren som JSON), på en nøkkel som er billig å lage: navnet på figuren
+# og versjonene av tabellene bak den (se Bryllup.endret_i). Er nøkkelen kjent, bygges
+# verken tallene bak figuren, figuren eller JSON-en på nytt. Samme spesifikasjon gir samme
+# melding til nettleseren, og store meldinger som er sendt før, sender Streamlit bare som
+# en referanse.
+# Cachen er felles for alle økter og har et fast tak på antall figurer. plotly.express
+# importeres først når en figur faktisk bygges, siden importen er tung.
+
+FIGUR_MAKS_ANTALL = 64
+
+_spesifikasjoner = collections.OrderedDict()
+_lås = threading.Lock()
+
+
+# Spesifikasjonen til figuren fra lag_figur(*args) som JSON (None uten figur), og om den
+# kom fra cachen. lag_figur kalles bare når nøkkelen er ny.
+def spesifikasjon(nøkkel, lag_figur, *args):
+    with _lås:
+        if nøkkel in _spesifikasjoner:
+            _spesifikasjoner.move_to_end(nøkkel)
+            return _spesifikasjoner[nøkkel], True
+    fig = lag_figur(*args)
+    if fig is not None:
+        import plotly.io
+
+        # Som st.plotly_chart gjør det
+        fig = plotly.io.to_json(fig, validate=False)
+    with _lås:
+        _spesifikasjoner[nøkkel] = fig
+        if len(_spesifikasjoner) > FIGUR_MAKS_ANTALL:
+            _spesifikasjoner.popitem(last=False)
+    return fig, False
+
+
+def rsvp_kake(kommer, kommer_ikke, venter):
+    import plotly.express as px
+
+    rsvp_data = pd.DataFrame({
+        'Status': ['Kommer', 'Kommer ikke', 'Venter på svar'],
+        'Antall': [kommer, kommer_ikke, venter]
+    })
+    return px.pie(rsvp_data, names='Status', values='Antall',
+                  title='RSVP-status',
+                  color_discrete_sequence=['#ffc107', '#28a745', '#dc3545'])
+
+
+# Beløpene per kategori fra nøkkeltallene, bare kategoriene der behold(beløp) er sann
+def _per_kategori(tall, kolonner, behold):
+    return pd.DataFrame(
+        [(kategori, *(beløp[kolonne] for kolonne in kolonner))
+         for kategori, beløp in tall.per_kategori.items() if behold(beløp)],
+        columns=['Kategori', *kolonner],
+    )
+
+
+# farger: fargene til de to søylene
+def budsjettfordeling(tall, farger):
+    budget_data = _per_kategori(tall, ['Budsjettert', 'Faktisk'], lambda beløp: beløp['Budsjettert'] > 0)
+    if budget_data.empty:
+        return None
+
+    import plotly.express as px
+
+    return px.bar(budget_data, x='Kategori', y=['Budsjettert', 'Faktisk'],
+                  title='Budsjett vs. Faktiske utgifter',
+                  barmode='group',
+                  color_discrete_sequence=list(farger))
+
+
+def budsjett_kake(tall):
+    kategori_df = _per_kategori(tall, ['Budsjettert'], lambda beløp: beløp['Budsjettert'] > 0)
+    if kategori_df.empty:
+        return None
+
+    import plotly.express as px
+
+    return px.pie(
+        kategori_df,
+        values='Budsjettert',
+        names='Kategori',
+        title='Budsjett fordeling',
+        color_discrete_sequence=px.colors.qualitative.Pastel
+    )
+
+
+# Kategorier der alt er 0, tas ikke med
+def budsjett_sammenligning(tall):
+    compare_df = _per_kategori(tall, ['Budsjettert', 'Faktisk', 'Betalt'],
+                               lambda beløp: beløp['Budsjettert'] > 0 or beløp['Faktisk'] > 0)
+    if compare_df.empty:
+        return None
+
+    import plotly.express as px
+
+    return px.bar(
+        compare_df,
+        x='Kategori',
+        y=['Budsjettert', 'Faktisk', 'Betalt'],
+        title='Budsjett vs. Faktisk vs. Betalt',
+        barmode='group'
+    )
+
+
+# Fakturert og betalt til og med hver dato, fra posteringene med dato
+def budsjett_forløp(tall):
+    forløp_df = tall.forløp().reset_index()
+    if forløp_df.empty:
+        return None
+
+    import plotly.express as px
+
+    return px.line(
+        forløp_df,
+        x='Dato',
+        y=['Faktisk', 'Betalt'],
+        title='Fakturert og betalt over tid',
+        line_shape='hv',
+        markers=True
+    )
+
+
+# indeks: tidsindeksen (se tidsplan.py); gruppe: kolonnen aktivitetene fordeles på (Sted
+# eller Ansvarlig)
+def tidsplan_gantt(indeks, gruppe):
+    import plotly.express as px
+
+    plan_df = indeks.aktiviteter.rename(columns={'Tid': 'Start'})
+    fig = px.timeline(
+        plan_df,
+        x_start='Start',
+        x_end='Slutt',
+        y=gruppe,
+        color='Ansvarlig' if gruppe == 'Sted' else 'Sted',
+        text='Aktivitet',
+        hover_data=['Aktivitet', 'Sted', 'Ansvarlig'],
+        title='Tidsplan'
+    )
+    fig.update_yaxes(categoryorder='category ascending', autorange='reversed')
+    return fig
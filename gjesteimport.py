@@ -0,0 +1,144 @@
+import hashlib
+from io import BytesIO
+
+import pandas as pd
+
+from gjestelager import GJESTE_KOLONNER
+from navnesok import normaliser
+from skjema import JA, MAKS_ANTALL, NEI, RELASJONER, RSVP_STATUSER, dtyper
+
+# Import av gjestelister fra CSV.
+# Filen leses i biter (chunks) med faste datatyper, slik at store lister fra lokaler
+# og byråer ikke må ligge i minnet som ett stort, typegjettet DataFrame. Hver bit
+# valideres for seg: rader uten navn hoppes over, og Antall gjester, Invitert, Relasjon
+# og RSVP Status rettes til gyldige verdier. Bitene får typene fra skjema.py før de
+# slås sammen. Resultatet kan caches på filens hash. Gjester som finnes fra før, og rader
+# som er helt like en annen rad i filen, fjernes etterpå med fjern_duplikater.
+# Svarlister som limes inn (navn og svar per linje) tolkes med les_svarliste.
+
+CSV_CHUNK_STORRELSE = 50_000
+
+# Alle kolonner leses som tekst; tall og ja/nei tolkes i valideringen
+CSV_DTYPER = {kolonne: str for kolonne in GJESTE_KOLONNER if kolonne != 'ID'}
+
+# Typene kolonnene får etter valideringen
+_DTYPER = {kolonne: dtype for kolonne, dtype in dtyper('Gjester').items() if kolonne in CSV_DTYPER}
+
+
+def fil_hash(innhold):
+    return hashlib.sha1(innhold).hexdigest()
+
+
+# Leser de første radene for forhåndsvisning
+def les_forhandsvisning(innhold, antall_rader=5):
+    return pd.read_csv(BytesIO(innhold), nrows=antall_rader, dtype=CSV_DTYPER, keep_default_na=False)
+
+
+def _valider(bit, rapport):
+    bit = bit.copy()
+    for kolonne in CSV_DTYPER:
+        if kolonne not in bit.columns:
+            bit[kolonne] = ""
+    bit = bit.apply(lambda kolonne: kolonne.str.strip())
+
+    uten_navn = bit['Navn'] == ""
+    rapport['uten_navn'] += int(uten_navn.sum())
+    bit = bit[~uten_navn]
+
+    antall = pd.to_numeric(bit['Antall gjester'], errors='coerce')
+    ugyldig = antall.isna() | (antall < 1) | (antall > MAKS_ANTALL)
+    rapport['antall_rettet'] += int((ugyldig & (bit['Antall gjester'] != "")).sum())
+    bit['Antall gjester'] = antall.where(~ugyldig, 1).round().astype(int)
+
+    invitert = bit['Invitert'].str.lower()
+    ukjent = ~invitert.isin(JA | NEI) & (invitert != "")
+    rapport['invitert_rettet'] += int(ukjent.sum())
+    bit['Invitert'] = ~invitert.isin(NEI)
+
+    relasjon_ukjent = ~bit['Relasjon'].isin(RELASJONER)
+    rapport['relasjon_rettet'] += int((relasjon_ukjent & (bit['Relasjon'] != "")).sum())
+    bit.loc[relasjon_ukjent, 'Relasjon'] = "Annet"
+
+    status_ukjent = ~bit['RSVP Status'].isin(RSVP_STATUSER)
+    rapport['status_rettet'] += int((status_ukjent & (bit['RSVP Status'] != "")).sum())
+    bit.loc[status_ukjent, 'RSVP Status'] = "Venter på svar"
+    return bit.astype(_DTYPER)
+
+
+# Leser og validerer hele filen bit for bit. fremdrift kalles med andelen (0-1)
+# av filen som er lest. Returnerer (gjester, rapport).
+def les_csv(innhold, chunk_storrelse=CSV_CHUNK_STORRELSE, fremdrift=None):
+    rapport = {'lest': 0, 'uten_navn': 0, 'antall_rettet': 0, 'invitert_rettet': 0, 'relasjon_rettet': 0, 'status_rettet': 0}
+    fil = BytesIO(innhold)
+    biter = []
+    with pd.read_csv(fil, chunksize=chunk_storrelse, dtype=CSV_DTYPER, keep_default_na=False,
+                     usecols=lambda kolonne: kolonne in CSV_DTYPER) as leser:
+        for bit in leser:
+            rapport['lest'] += len(bit)
+            biter.append(_valider(bit, rapport))
+            if fremdrift is not None:
+                fremdrift(min(fil.tell() / max(len(innhold), 1), 1.0))
+    if biter:
+        gjester = pd.concat(biter, ignore_index=True)
+    else:
+        gjester = pd.DataFrame({kolonne: [] for kolonne in CSV_DTYPER}).astype(_DTYPER)
+    return gjester[list(CSV_DTYPER)], rapport
+
+
+def _nøkler(gjester):
+    return gjester['Navn'].map(normaliser) + "\x00" + gjester['Relasjon'].fillna("").astype(str)
+
+
+# Fjerner gjester som allerede finnes i gjestelisten (samme navn og relasjon), og rader som
+# er like en tidligere rad i filen i alle kolonner. To gjester i filen med samme navn og
+# relasjon kan være to forskjellige personer, så de beholdes. Returnerer (nye gjester,
+# rapport): rapporten fra les_csv (den endres ikke) med antallet som fantes fra før
+# (fantes_fra_før) og som var like i filen (duplikat_i_filen), og navnene på radene
+# som ble hoppet over (hoppet_over).
+def fjern_duplikater(gjester, eksisterende, rapport=None):
+    rapport = dict(rapport or {})
+    fantes = pd.Series(False, index=gjester.index)
+    if not gjester.empty and not eksisterende.empty:
+        fantes = _nøkler(gjester).isin(set(_nøkler(eksisterende)))
+    i_filen = gjester.duplicated() & ~fantes
+    rapport['fantes_fra_før'] = int(fantes.sum())
+    rapport['duplikat_i_filen'] = int(i_filen.sum())
+    rapport['hoppet_over'] = gjester.loc[fantes | i_filen, 'Navn'].tolist()
+    return gjester[~(fantes | i_filen)], rapport
+
+
+# Innlimte svarlister (f.eks. fra svarkortene): én gjest per linje med navn, svar og
+# eventuelt antall, skilt med tabulator (kopiert fra et regneark), semikolon eller komma.
+# Svaret kan være en RSVP-status, "venter" eller ja/nei.
+SVAR = {
+    **{status.lower(): status for status in RSVP_STATUSER},
+    'venter': "Venter på svar",
+    **dict.fromkeys(JA, "Kommer"),
+    **dict.fromkeys(NEI, "Kommer ikke"),
+}
+
+
+# Skilletegnet velges per linje: tabulator før semikolon før komma
+def _skilletegn(linje):
+    return "\t" if "\t" in linje else ";" if ";" in linje else ","
+
+
+# Leser en innlimt svarliste. Returnerer (svar, ugyldige): svar har kolonnene Navn,
+# RSVP Status og Antall gjester (tom der antallet ikke er oppgitt), og ugyldige er
+# linjene som ikke kunne tolkes.
+def les_svarliste(tekst):
+    linjer = pd.Series([linje for linje in tekst.splitlines() if linje.strip()], dtype=object)
+    svar = pd.DataFrame({'Navn': pd.Series(dtype='str'), 'RSVP Status': pd.Series(dtype='str'), 'Antall gjester': pd.Series(dtype='Int64')})
+    if linjer.empty:
+        return svar, []
+    felt = pd.DataFrame([linje.split(_skilletegn(linje), 2) for linje in linjer]).reindex(columns=range(3)).fillna("").astype(str)
+    felt = felt.apply(lambda kolonne: kolonne.str.strip())
+    status = felt[1].str.lower().map(SVAR)
+    antall = pd.to_numeric(felt[2], errors='coerce')
+    ugyldig = (felt[0] == "") | status.isna() | ((felt[2] != "") & (antall.isna() | (antall < 1) | (antall > MAKS_ANTALL)))
+    svar = pd.DataFrame({
+        'Navn': felt[0][~ugyldig].astype('str'),
+        'RSVP Status': status[~ugyldig].astype('str'),
+        'Antall gjester': antall[~ugyldig].round().astype('Int64'),
+    }).reset_index(drop=True)
+    return svar, linjer[ugyldig].tolist()
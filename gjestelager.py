@@ -0,0 +1,283 @@
+import collections
+
+import numpy as np
+import pandas as pd
+
+from navnesok import FILTER_KOLONNER, NavneIndeks, normaliser
+from nokkeltall import GjesteTall
+from skjema import TABELLER, dtyper, tilpass, tilpass_rad
+
+# Lager for gjestelisten.
+# Radene ligger i kolonnevise lister som vokser ved append (amortisert O(1) per gjest),
+# i stedet for at hele DataFrame-en kopieres med pd.concat for hver ny gjest.
+# Slettede rader merkes bare som slettet og fjernes samlet (komprimering) når de utgjør
+# mer enn halvparten av lageret. DataFrame-visningen bygges først når noen ber om den,
+# og gjenbrukes til neste endring.
+# Hver gjest har en fast ID. Lageret holder en oppslagstabell ID -> posisjon og
+# Navn -> ID-er, så redigering og sletting er O(1) og gjester med samme navn holdes
+# fra hverandre. ID-ene endres aldri, heller ikke når lageret komprimeres.
+# Søk og filtrering går via en NavneIndeks (se navnesok.py) som følger posisjonene.
+# Alle rader som kommer inn tilpasses skjemaet (skjema.py), og tabellen får typene derfra.
+# Gjestetabellen i appen vises én side om gangen (side): filtrering, sortering og
+# summene for utvalget gjøres her, og bare radene på siden bygges som DataFrame.
+# Sorteringsrekkefølgen for en kolonne huskes til neste endring, så å bla til en ny side
+# eller endre filtrene sorterer ikke hele listen på nytt.
+# Masseredigering (mange svar på én gang) går via forskjeller og oppdater_mange: bare
+# rader som faktisk er endret skrives, og nøkkeltallene og søkeindeksen oppdateres én
+# gang for hele omgangen i stedet for én gang per gjest.
+
+GJESTE_KOLONNER = list(TABELLER['Gjester'])
+
+SIDESTØRRELSE = 50
+
+# rader er gjestene på siden; antall, personer og spesielle_behov gjelder hele utvalget
+Gjesteside = collections.namedtuple('Gjesteside', ['rader', 'antall', 'personer', 'spesielle_behov'])
+
+
+def _navnenøkkel(navn):
+    return " ".join(normaliser(navn).replace('aa', 'å').split())
+
+
+class GjesteLager:
+    def __init__(self, gjester=None):
+        self._kolonner = {kolonne: [] for kolonne in GJESTE_KOLONNER}
+        self._slettet = set()
+        self._tabell = None
+        self._rekkefølger = {}
+        self._har_behov = None
+        self._posisjon_for_id = {}
+        self._ider_for_navn = {}
+        self._neste_id = 1
+        self._sokeindeks = NavneIndeks()
+        self.tall = GjesteTall()
+        if gjester is not None:
+            self.legg_til_tabell(gjester)
+
+    def __len__(self):
+        return self._antall_rader() - len(self._slettet)
+
+    def _antall_rader(self):
+        return len(self._kolonner['Navn'])
+
+    def _endret(self):
+        self._tabell = None
+        self._rekkefølger = {}
+        self._har_behov = None
+
+    # Velger ID-er for nye rader. Eksisterende ID-er (f.eks. fra en eksportert
+    # Excel-fil) beholdes når de er gyldige og ikke allerede i bruk.
+    def _tildel_ider(self, kandidater):
+        ider = []
+        brukt = set()
+        for kandidat in kandidater:
+            try:
+                gjest_id = int(kandidat)
+            except (TypeError, ValueError):
+                gjest_id = None
+            if gjest_id is None or gjest_id < 1 or gjest_id in self._posisjon_for_id or gjest_id in brukt:
+                gjest_id = self._neste_id
+            self._neste_id = max(self._neste_id, gjest_id + 1)
+            brukt.add(gjest_id)
+            ider.append(gjest_id)
+        return ider
+
+    def _indekser(self, gjest_id, posisjon, navn):
+        self._posisjon_for_id[gjest_id] = posisjon
+        self._ider_for_navn.setdefault(navn, {})[gjest_id] = None
+
+    # Legger til én gjest. rad er en dict med kolonnenavn -> verdi.
+    # Returnerer ID-en gjesten fikk.
+    def legg_til(self, rad):
+        rad = tilpass_rad(rad, 'Gjester')
+        gjest_id = self._tildel_ider([rad['ID']])[0]
+        rad['ID'] = gjest_id
+        for kolonne, verdier in self._kolonner.items():
+            verdier.append(rad[kolonne])
+        posisjon = self._antall_rader() - 1
+        self._indekser(gjest_id, posisjon, rad['Navn'])
+        self._sokeindeks.legg_til(posisjon, rad)
+        self.tall.legg_til(rad)
+        self._endret()
+        return gjest_id
+
+    # Legger til alle radene i en DataFrame. Manglende kolonner fylles med standardverdien
+    # i skjemaet. Returnerer ID-ene radene fikk, i samme rekkefølge.
+    def legg_til_tabell(self, gjester):
+        gjester = tilpass(gjester, 'Gjester')
+        start = self._antall_rader()
+        ider = self._tildel_ider(gjester['ID'].tolist())
+        self._kolonner['ID'].extend(ider)
+        for kolonne, verdier in self._kolonner.items():
+            if kolonne != 'ID':
+                verdier.extend(gjester[kolonne].tolist())
+        for posisjon in range(start, self._antall_rader()):
+            self._indekser(self._kolonner['ID'][posisjon], posisjon, self._kolonner['Navn'][posisjon])
+        self._sokeindeks.legg_til_mange(start, self._kolonner)
+        self.tall.legg_til_tabell(gjester)
+        self._endret()
+        return ider
+
+    def __contains__(self, gjest_id):
+        return gjest_id in self._posisjon_for_id
+
+    # ID-ene til alle gjester, i rekkefølgen de ble lagt til
+    def ider(self):
+        return list(self._posisjon_for_id)
+
+    def ider_for_navn(self, navn):
+        return list(self._ider_for_navn.get(navn, ()))
+
+    def navn(self, gjest_id):
+        return self._kolonner['Navn'][self._posisjon_for_id[gjest_id]]
+
+    def rad(self, gjest_id):
+        posisjon = self._posisjon_for_id[gjest_id]
+        return {kolonne: verdier[posisjon] for kolonne, verdier in self._kolonner.items()}
+
+    def oppdater(self, gjest_id, endringer):
+        posisjon = self._posisjon_for_id[gjest_id]
+        gammel_rad = self.rad(gjest_id)
+        ny_rad = tilpass_rad(dict(gammel_rad, **endringer, ID=gjest_id), 'Gjester')
+        for kolonne, verdier in self._kolonner.items():
+            verdier[posisjon] = ny_rad[kolonne]
+        if ny_rad['Navn'] != gammel_rad['Navn']:
+            self._fjern_navn(gjest_id, gammel_rad['Navn'])
+            self._ider_for_navn.setdefault(ny_rad['Navn'], {})[gjest_id] = None
+        self._sokeindeks.endre(posisjon, gammel_rad, ny_rad)
+        self.tall.endre(gammel_rad, ny_rad)
+        self._endret()
+
+    # Radene på posisjonene som DataFrame med typene i skjemaet
+    def _rader(self, posisjoner):
+        rader = {kolonne: [verdier[posisjon] for posisjon in posisjoner] for kolonne, verdier in self._kolonner.items()}
+        return pd.DataFrame(rader, columns=GJESTE_KOLONNER).astype(dtyper('Gjester'))
+
+    # Radene i redigert (en ID-kolonne og kolonnene som redigeres) som er forskjellige
+    # fra lageret, som hele rader tilpasset skjemaet. Tomme verdier i redigert betyr at
+    # verdien ikke endres. Gjester som ikke finnes, hoppes over.
+    def forskjeller(self, redigert):
+        redigert = redigert[redigert['ID'].isin(list(self._posisjon_for_id))]
+        kolonner = [kolonne for kolonne in redigert.columns if kolonne != 'ID']
+        gamle = self._rader([self._posisjon_for_id[gjest_id] for gjest_id in redigert['ID']])
+        nye = gamle.astype(object)
+        for kolonne in kolonner:
+            verdier = pd.Series(redigert[kolonne].to_numpy(dtype=object), index=gamle.index)
+            nye[kolonne] = verdier.where(verdier.notna(), nye[kolonne])
+        nye = tilpass(nye, 'Gjester')
+        endret = np.zeros(len(nye), dtype=bool)
+        for kolonne in kolonner:
+            endret |= (gamle[kolonne] != nye[kolonne]).to_numpy(dtype=bool)
+        return nye[endret].reset_index(drop=True)
+
+    # Erstatter gjestene med ID-ene i nye (hele rader tilpasset skjemaet, f.eks. fra
+    # forskjeller) i én omgang. Returnerer radene slik de var før.
+    def oppdater_mange(self, nye):
+        ider = nye['ID'].tolist()
+        posisjoner = [self._posisjon_for_id[gjest_id] for gjest_id in ider]
+        gamle = self._rader(posisjoner)
+        for kolonne, verdier in self._kolonner.items():
+            for posisjon, verdi in zip(posisjoner, nye[kolonne].tolist()):
+                verdier[posisjon] = verdi
+        for gjest_id, posisjon, gammelt, nytt in zip(ider, posisjoner, gamle['Navn'].tolist(), nye['Navn'].tolist()):
+            if gammelt != nytt:
+                self._fjern_navn(gjest_id, gammelt)
+                self._ider_for_navn.setdefault(nytt, {})[gjest_id] = None
+                self._sokeindeks.endre_navn(posisjon, nytt)
+        for kolonne in FILTER_KOLONNER:
+            self._sokeindeks.endre_filter(kolonne, posisjoner, gamle[kolonne].tolist(), nye[kolonne].tolist())
+        self.tall.fjern_tabell(gamle)
+        self.tall.legg_til_tabell(nye)
+        self._endret()
+        return gamle
+
+    # ID-ene til gjestene med hvert av navnene. Navnene sammenlignes uten forskjell på
+    # store og små bokstaver, aa og å og mellomrom.
+    def finn_navn(self, navneliste):
+        ider_for_navn = {}
+        for navn, ider in self._ider_for_navn.items():
+            ider_for_navn.setdefault(_navnenøkkel(navn), []).extend(ider)
+        return [ider_for_navn.get(_navnenøkkel(navn), []) for navn in navneliste]
+
+    def _fjern_navn(self, gjest_id, navn):
+        ider = self._ider_for_navn[navn]
+        del ider[gjest_id]
+        if not ider:
+            del self._ider_for_navn[navn]
+
+    def slett(self, gjest_id):
+        if gjest_id not in self._posisjon_for_id:
+            return
+        rad = self.rad(gjest_id)
+        posisjon = self._posisjon_for_id.pop(gjest_id)
+        self.tall.fjern(rad)
+        self._sokeindeks.fjern(posisjon, rad)
+        self._slettet.add(posisjon)
+        self._fjern_navn(gjest_id, rad['Navn'])
+        self._endret()
+        if len(self._slettet) * 2 > self._antall_rader():
+            self._komprimer()
+
+    # Fjerner slettede rader fra listene. Posisjonene til gjenværende rader endres,
+    # men ID-ene er de samme.
+    def _komprimer(self):
+        beholdes = [posisjon for posisjon in range(self._antall_rader()) if posisjon not in self._slettet]
+        for kolonne, verdier in self._kolonner.items():
+            self._kolonner[kolonne] = [verdier[posisjon] for posisjon in beholdes]
+        self._slettet = set()
+        self._posisjon_for_id = {gjest_id: posisjon for posisjon, gjest_id in enumerate(self._kolonner['ID'])}
+        self._sokeindeks = NavneIndeks.fra_kolonner(self._kolonner)
+
+    # Gjestelisten som DataFrame. Indeksen er posisjonen i lageret; bruk ID-kolonnen
+    # for å peke på en bestemt gjest.
+    def tabell(self):
+        if self._tabell is None:
+            tabell = pd.DataFrame(self._kolonner, columns=GJESTE_KOLONNER).astype(dtyper('Gjester'))
+            if self._slettet:
+                tabell = tabell.drop(index=list(self._slettet))
+            self._tabell = tabell
+        return self._tabell
+
+    # Gjestene som passer med søketeksten (del av navnet) og filtrene
+    # (dict kolonne -> verdi for RSVP Status og Relasjon)
+    def utvalg(self, tekst="", filtre=None):
+        tabell = self.tabell()
+        if not tekst and not filtre:
+            return tabell
+        posisjoner = self._sokeindeks.sok(tekst, filtre)
+        # Tabellen mangler de slettede radene, så lagerposisjonene oversettes til
+        # radnummer i tabellen (indeksen er sortert)
+        return tabell.take(np.searchsorted(tabell.index.to_numpy(), posisjoner))
+
+    # Radnumrene i tabell() sortert etter kolonnen (stabilt, tomme verdier sist).
+    # Kategorikolonner sorteres i rekkefølgen kategoriene har i skjemaet.
+    def _rekkefølge(self, kolonne, stigende):
+        nøkkel = (kolonne, stigende)
+        if nøkkel not in self._rekkefølger:
+            verdier = self.tabell()[kolonne].reset_index(drop=True)
+            self._rekkefølger[nøkkel] = verdier.sort_values(ascending=stigende, kind='stable', na_position='last').index.to_numpy()
+        return self._rekkefølger[nøkkel]
+
+    # Én side av utvalget (se utvalg), sortert etter kolonnen sorter_etter (None: i
+    # rekkefølgen gjestene ble lagt til). start er radnummeret i utvalget siden begynner på.
+    def side(self, tekst="", filtre=None, sorter_etter=None, stigende=True, start=0, antall=SIDESTØRRELSE):
+        tabell = self.tabell()
+        if tekst or filtre:
+            posisjoner = self._sokeindeks.sok(tekst, filtre)
+            radnumre = np.searchsorted(tabell.index.to_numpy(), posisjoner)
+        else:
+            radnumre = np.arange(len(tabell))
+        if sorter_etter is not None:
+            valgt = np.zeros(len(tabell), dtype=bool)
+            valgt[radnumre] = True
+            rekkefølge = self._rekkefølge(sorter_etter, stigende)
+            radnumre = rekkefølge[valgt[rekkefølge]]
+        elif not stigende:
+            radnumre = radnumre[::-1]
+        if self._har_behov is None:
+            self._har_behov = tabell['Spesielle behov'].fillna("").ne("").to_numpy(dtype=bool)
+        return Gjesteside(
+            rader=tabell.take(radnumre[start:start + antall]),
+            antall=len(radnumre),
+            personer=int(tabell['Antall gjester'].to_numpy()[radnumre].sum()),
+            spesielle_behov=int(self._har_behov[radnumre].sum()),
+        )
@@ -0,0 +1,180 @@
+import datetime
+import math
+import sqlite3
+import threading
+
+import numpy as np
+import pandas as pd
+
+from skjema import TABELLER, tilpass
+
+# Lagring av bryllupsdataene utenfor økten.
+# Lagring er grensesnittet appen skriver gjennom. Grunnklassen lagrer ingenting (dataene
+# lever da bare i økten, som før), mens SqliteLagring skriver til en lokal SQLite-fil.
+# Ved hver endring skrives bare radene som er endret; hele tabeller erstattes bare ved
+# import. Tabellene leses først når appen trenger dem, og får typene fra skjema.py.
+# Kolonner som mangler i en eldre fil, får standardverdien i skjemaet.
+# Flere prosesser kan dele SQLite-filen. Dataversjonen (PRAGMA data_version) endres når
+# en annen prosess har skrevet til filen, og da leser Bryllup tabellene på nytt.
+
+# SQL-typen for hver kolonnetype i skjema.py
+SQL_TYPER = {
+    'tekst': 'TEXT',
+    'kategori': 'TEXT',
+    'heltall': 'INTEGER',
+    'antall': 'INTEGER',
+    'kroner': 'INTEGER',
+    'bool': 'BOOLEAN',
+    'dato': 'TIMESTAMP',
+}
+
+# Nøkkelkolonnen som brukes ved endring av enkeltrader (None betyr at tabellen bare
+# kan erstattes i sin helhet)
+NØKLER = {
+    'Gjester': 'ID',
+    'Budsjett': 'Kategori',
+    'Posteringer': 'ID',
+    'Oppgaver': 'ID',
+    'Tidsplan': 'ID',
+    'Bord': 'Bord',
+    'Bordplan': 'ID',
+    'Bordregler': 'ID',
+}
+
+# Skjema per tabell: kolonne -> SQL-type, avledet fra kolonnetypene i skjema.py
+SKJEMA = {
+    tabell: {
+        'nøkkel': NØKLER[tabell],
+        'kolonner': {
+            kolonne: SQL_TYPER[type_] + (" PRIMARY KEY" if kolonne == NØKLER[tabell] else "")
+            for kolonne, (type_, _) in kolonner.items()
+        },
+    }
+    for tabell, kolonner in TABELLER.items()
+}
+
+
+def _sitat(navn):
+    return '"' + navn.replace('"', '""') + '"'
+
+
+# Gjør om en verdi fra pandas til noe sqlite3 kan lagre
+def _sql_verdi(verdi):
+    if isinstance(verdi, np.generic):
+        verdi = verdi.item()
+    if verdi is None or verdi is pd.NaT:
+        return None
+    if isinstance(verdi, float) and math.isnan(verdi):
+        return None
+    if isinstance(verdi, (pd.Timestamp, datetime.datetime, datetime.date, datetime.time)):
+        return verdi.isoformat()
+    if isinstance(verdi, bool):
+        return int(verdi)
+    return verdi
+
+
+# Lagring som ikke skriver noe; dataene finnes bare i økten
+class Lagring:
+    # Returnerer tabellen som DataFrame, eller None hvis den aldri er lagret
+    def last(self, tabell):
+        return None
+
+    # Erstatter hele tabellen
+    def erstatt(self, tabell, df):
+        pass
+
+    # Setter inn eller oppdaterer radene (dicts) med samme nøkkel
+    def lagre_rader(self, tabell, rader):
+        pass
+
+    def slett_rader(self, tabell, nøkler):
+        pass
+
+    # Endres når noen andre enn denne lagringen har skrevet til dataene
+    def dataversjon(self):
+        return 0
+
+    def lukk(self):
+        pass
+
+
+class SqliteLagring(Lagring):
+    def __init__(self, sti):
+        self.sti = sti
+        self._lås = threading.Lock()
+        self._tilkobling = sqlite3.connect(sti, check_same_thread=False)
+        self._tilkobling.execute("PRAGMA journal_mode=WAL")
+        self._tilkobling.execute("PRAGMA synchronous=NORMAL")
+
+    def _kolonner(self, tabell):
+        return SKJEMA[tabell]['kolonner']
+
+    def _opprett(self, tabell):
+        kolonner = ", ".join(f"{_sitat(kolonne)} {sql_type}" for kolonne, sql_type in self._kolonner(tabell).items())
+        self._tilkobling.execute(f"CREATE TABLE IF NOT EXISTS {_sitat(tabell)} ({kolonner})")
+
+    def _finnes(self, tabell):
+        rad = self._tilkobling.execute(
+            "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?", (tabell,)
+        ).fetchone()
+        return rad is not None
+
+    def last(self, tabell):
+        with self._lås:
+            if not self._finnes(tabell):
+                return None
+            lagret = {rad[1] for rad in self._tilkobling.execute(f"PRAGMA table_info({_sitat(tabell)})")}
+            valgt = ", ".join(_sitat(kolonne) for kolonne in self._kolonner(tabell) if kolonne in lagret)
+            df = pd.read_sql_query(f"SELECT {valgt} FROM {_sitat(tabell)} ORDER BY rowid", self._tilkobling)
+        return tilpass(df, tabell)
+
+    def _rader(self, tabell, rader):
+        kolonner = list(self._kolonner(tabell))
+        return [tuple(_sql_verdi(rad.get(kolonne)) for kolonne in kolonner) for rad in rader]
+
+    # Setter inn radene. Med upsert oppdateres eksisterende rader med samme nøkkel
+    # på stedet, slik at rekkefølgen (rowid) beholdes.
+    def _sett_inn(self, tabell, rader, upsert=False):
+        kolonner = self._kolonner(tabell)
+        plasser = ", ".join("?" for _ in kolonner)
+        navn = ", ".join(_sitat(kolonne) for kolonne in kolonner)
+        sql = f"INSERT INTO {_sitat(tabell)} ({navn}) VALUES ({plasser})"
+        if upsert:
+            nøkkel = SKJEMA[tabell]['nøkkel']
+            oppdater = ", ".join(f"{_sitat(kolonne)} = excluded.{_sitat(kolonne)}" for kolonne in kolonner if kolonne != nøkkel)
+            sql += f" ON CONFLICT({_sitat(nøkkel)}) DO UPDATE SET {oppdater}"
+        self._tilkobling.executemany(sql, self._rader(tabell, rader))
+
+    def erstatt(self, tabell, df):
+        with self._lås, self._tilkobling:
+            self._tilkobling.execute(f"DROP TABLE IF EXISTS {_sitat(tabell)}")
+            self._opprett(tabell)
+            self._sett_inn(tabell, df.to_dict('records'))
+
+    def lagre_rader(self, tabell, rader):
+        if SKJEMA[tabell]['nøkkel'] is None:
+            raise ValueError(f"Tabellen {tabell} kan bare erstattes i sin helhet")
+        with self._lås, self._tilkobling:
+            self._opprett(tabell)
+            self._sett_inn(tabell, rader, upsert=True)
+
+    def slett_rader(self, tabell, nøkler):
+        nøkkel = SKJEMA[tabell]['nøkkel']
+        if nøkkel is None:
+            raise ValueError(f"Tabellen {tabell} kan bare erstattes i sin helhet")
+        with self._lås, self._tilkobling:
+            if self._finnes(tabell):
+                self._tilkobling.executemany(
+                    f"DELETE FROM {_sitat(tabell)} WHERE {_sitat(nøkkel)} = ?",
+                    [(_sql_verdi(verdi),) for verdi in nøkler]
+                )
+
+    # SQLite øker data_version når en annen tilkobling har skrevet til filen, men ikke
+    # for skrivingen gjennom denne tilkoblingen
+    def dataversjon(self):
+        with self._lås:
+            return self._tilkobling.execute("PRAGMA data_version").fetchone()[0]
+
+    def lukk(self):
+        with self._lås:
+            self._tilkobling.close()
@@ -0,0 +1,192 @@
+import unicodedata
+
+import numpy as np
+import pandas as pd
+
+# Søkeindeks for gjestelisten.
+# Navnene lagres normalisert (små bokstaver, ö/ä skrevet som ø/æ, aa og å regnes som
+# like), og hvert trigram (tre tegn etter hverandre) peker på radene som inneholder det.
+# Et søk på tre tegn eller mer slår derfor bare opp i noen få mengder i stedet for å
+# gå gjennom alle navn. Filtrene på RSVP Status og Relasjon er bitmapper (Python-int
+# der bit nr. p betyr rad p), så de kombineres med ett enkelt &.
+# Posisjonene er de samme som i GjesteLager, og lageret holder indeksen oppdatert.
+
+FILTER_KOLONNER = ('RSVP Status', 'Relasjon')
+
+_TEGN = str.maketrans({'ö': 'ø', 'ä': 'æ', 'œ': 'ø'})
+
+
+# Gjør om et navn eller søkeord til formen som brukes i indeksen
+def normaliser(tekst):
+    if not isinstance(tekst, str):
+        return ""
+    return unicodedata.normalize('NFC', tekst).casefold().translate(_TEGN)
+
+
+# "Aase" og "Åse" skal finne hverandre, så søkeordet prøves med begge skrivemåter
+def _varianter(søk):
+    return {søk, søk.replace('aa', 'å'), søk.replace('å', 'aa')}
+
+
+def _trigrammer(navn):
+    return {navn[i:i + 3] for i in range(len(navn) - 2)}
+
+
+def _bitmap(posisjoner, lengde):
+    biter = np.zeros(lengde, dtype=bool)
+    biter[posisjoner] = True
+    return int.from_bytes(np.packbits(biter, bitorder='little').tobytes(), 'little')
+
+
+def _biter(bitmap, lengde):
+    antall_bytes = (lengde + 7) // 8
+    biter = np.unpackbits(np.frombuffer(bitmap.to_bytes(antall_bytes, 'little'), dtype=np.uint8), bitorder='little')
+    return biter[:lengde].astype(bool)
+
+
+def _posisjoner(bitmap):
+    return np.flatnonzero(_biter(bitmap, bitmap.bit_length()))
+
+
+def _per_verdi(posisjoner, verdier):
+    grupper = {}
+    for posisjon, verdi in zip(posisjoner, verdier):
+        grupper.setdefault(verdi, []).append(posisjon)
+    return grupper
+
+
+class NavneIndeks:
+    def __init__(self):
+        self._navn = []
+        self._navneserie = None
+        self._trigrammer = {}
+        self._levende = 0
+        self._per_verdi = {kolonne: {} for kolonne in FILTER_KOLONNER}
+
+    # Bygger indeksen for kolonnene i et GjesteLager. slettet er posisjoner som skal hoppes over.
+    @classmethod
+    def fra_kolonner(cls, kolonner, slettet=()):
+        indeks = cls()
+        indeks.legg_til_mange(0, kolonner, slettet)
+        return indeks
+
+    def legg_til(self, posisjon, rad):
+        navn = normaliser(rad.get('Navn'))
+        self._navn.append(navn)
+        self._navneserie = None
+        for trigram in _trigrammer(navn):
+            self._trigrammer.setdefault(trigram, set()).add(posisjon)
+        bit = 1 << posisjon
+        self._levende |= bit
+        for kolonne in FILTER_KOLONNER:
+            verdier = self._per_verdi[kolonne]
+            verdi = rad.get(kolonne)
+            verdier[verdi] = verdier.get(verdi, 0) | bit
+
+    # Legger til radene fra posisjon start og utover i én omgang
+    def legg_til_mange(self, start, kolonner, slettet=()):
+        slutt = len(kolonner['Navn'])
+        nye = [posisjon for posisjon in range(start, slutt) if posisjon not in slettet]
+        self._navneserie = None
+        for posisjon in range(start, slutt):
+            navn = normaliser(kolonner['Navn'][posisjon])
+            self._navn.append(navn)
+            if posisjon in slettet:
+                continue
+            for trigram in _trigrammer(navn):
+                self._trigrammer.setdefault(trigram, set()).add(posisjon)
+        self._levende |= _bitmap(nye, slutt)
+        for kolonne in FILTER_KOLONNER:
+            grupper = {}
+            for posisjon in nye:
+                grupper.setdefault(kolonner[kolonne][posisjon], []).append(posisjon)
+            verdier = self._per_verdi[kolonne]
+            for verdi, posisjoner in grupper.items():
+                verdier[verdi] = verdier.get(verdi, 0) | _bitmap(posisjoner, slutt)
+
+    def fjern(self, posisjon, rad):
+        for trigram in _trigrammer(self._navn[posisjon]):
+            self._trigrammer[trigram].discard(posisjon)
+        bit = 1 << posisjon
+        self._levende &= ~bit
+        for kolonne in FILTER_KOLONNER:
+            verdier = self._per_verdi[kolonne]
+            verdi = rad.get(kolonne)
+            if verdi in verdier:
+                verdier[verdi] &= ~bit
+
+    def endre(self, posisjon, gammel_rad, ny_rad):
+        self.fjern(posisjon, gammel_rad)
+        navn = normaliser(ny_rad.get('Navn'))
+        self._navn[posisjon] = navn
+        self._navneserie = None
+        for trigram in _trigrammer(navn):
+            self._trigrammer.setdefault(trigram, set()).add(posisjon)
+        bit = 1 << posisjon
+        self._levende |= bit
+        for kolonne in FILTER_KOLONNER:
+            verdier = self._per_verdi[kolonne]
+            verdi = ny_rad.get(kolonne)
+            verdier[verdi] = verdier.get(verdi, 0) | bit
+
+    # Gir raden et nytt navn uten å røre filtrene
+    def endre_navn(self, posisjon, navn):
+        for trigram in _trigrammer(self._navn[posisjon]):
+            self._trigrammer[trigram].discard(posisjon)
+        navn = normaliser(navn)
+        self._navn[posisjon] = navn
+        self._navneserie = None
+        for trigram in _trigrammer(navn):
+            self._trigrammer.setdefault(trigram, set()).add(posisjon)
+
+    # Endrer verdien i en filterkolonne for mange rader i én omgang. gamle og nye er
+    # verdiene før og etter, i samme rekkefølge som posisjonene.
+    def endre_filter(self, kolonne, posisjoner, gamle, nye):
+        lengde = len(self._navn)
+        verdier = self._per_verdi[kolonne]
+        for verdi, fra in _per_verdi(posisjoner, gamle).items():
+            if verdi in verdier:
+                verdier[verdi] &= ~_bitmap(fra, lengde)
+        for verdi, til in _per_verdi(posisjoner, nye).items():
+            verdier[verdi] = verdier.get(verdi, 0) | _bitmap(til, lengde)
+
+    def _navnetreff(self, variant):
+        mengder = sorted((self._trigrammer.get(trigram, set()) for trigram in _trigrammer(variant)), key=len)
+        kandidater = mengder[0].intersection(*mengder[1:])
+        return {posisjon for posisjon in kandidater if variant in self._navn[posisjon]}
+
+    # Finner posisjonene til radene som passer med søketeksten og filtrene.
+    # filtre er en dict kolonne -> verdi; kolonner som ikke er med filtreres ikke.
+    # Resultatet er sortert i samme rekkefølge som gjestelisten.
+    def sok(self, tekst="", filtre=None):
+        utvalg = self._levende
+        for kolonne, verdi in (filtre or {}).items():
+            utvalg &= self._per_verdi[kolonne].get(verdi, 0)
+        søk = normaliser(tekst)
+        if not søk:
+            return _posisjoner(utvalg)
+
+        treff = set()
+        korte = []
+        for variant in _varianter(søk):
+            if len(variant) >= 3:
+                treff |= self._navnetreff(variant)
+            else:
+                korte.append(variant)
+        # Korte søk (ett eller to tegn) treffer så mange navn at et vektorisert søk
+        # i de normaliserte navnene i utvalget er raskere enn en indeks
+        if korte:
+            if self._navneserie is None:
+                self._navneserie = pd.Series(self._navn, dtype='string')
+            kandidater = _posisjoner(utvalg)
+            navn = self._navneserie.iloc[kandidater]
+            passer = np.zeros(len(kandidater), dtype=bool)
+            for variant in korte:
+                passer |= navn.str.contains(variant, regex=False).to_numpy(dtype=bool)
+            treff.update(kandidater[passer].tolist())
+        if not treff:
+            return np.array([], dtype=np.int64)
+        treff = np.fromiter(treff, dtype=np.int64, count=len(treff))
+        treff = treff[_biter(utvalg, len(self._navn))[treff]]
+        treff.sort()
+        return treff
@@ -0,0 +1,150 @@
+import math
+from collections import Counter
+
+import numpy as np
+import pandas as pd
+
+from skjema import POSTERINGSTYPER, tilpass
+
+# Nøkkeltall for gjestelisten og budsjettet.
+# Gjestetallene vedlikeholdes: de oppdateres i O(1) når én rad legges til, endres eller
+# slettes, slik at oversiktssiden kan vise dem uten å gå gjennom hele tabellen ved hver
+# omkjøring. Når en hel tabell byttes ut (Excel-import o.l.) bygges tallene på nytt med
+# én vektorisert gjennomgang. Endres mange gjester på én gang, trekkes de gamle radene fra
+# og de nye legges til, også det med én gjennomgang per omgang.
+# Budsjettallene summeres fra posteringene (fakturaer og betalinger) med groupby, én gang
+# per utgave av budsjettet og posteringene; Bryllup bygger dem på nytt etter neste endring.
+
+BUDSJETT_KOLONNER = ["Budsjettert", "Faktisk", "Betalt"]
+
+# Kolonnen i budsjettet hver type postering summeres til
+POSTERING_KOLONNER = {'Faktura': 'Faktisk', 'Betaling': 'Betalt'}
+
+
+# Gjør om en celleverdi til et tall. Tomme celler og tekst teller som 0.
+def _tall(verdi):
+    try:
+        tall = float(verdi)
+    except (TypeError, ValueError):
+        return 0
+    if math.isnan(tall):
+        return 0
+    return int(tall) if tall.is_integer() else tall
+
+
+def _tall_kolonne(df, kolonne):
+    if kolonne not in df.columns:
+        return pd.Series(0, index=df.index)
+    return pd.to_numeric(df[kolonne], errors='coerce').fillna(0)
+
+
+def _grupper(antall, nøkler):
+    summer = antall.groupby(nøkler).sum()
+    return Counter({nøkkel: _tall(verdi) for nøkkel, verdi in summer.items()})
+
+
+class GjesteTall:
+    def __init__(self):
+        self.antall_gjester = 0
+        self.per_status = Counter()
+        self.per_relasjon = Counter()
+
+    @classmethod
+    def fra_tabell(cls, gjester):
+        tall = cls()
+        tall.legg_til_tabell(gjester)
+        return tall
+
+    # Legger til mange rader på én gang (brukes ved import)
+    def legg_til_tabell(self, gjester):
+        self._juster_tabell(gjester, 1)
+
+    # Trekker fra mange rader på én gang (brukes ved masseendring)
+    def fjern_tabell(self, gjester):
+        self._juster_tabell(gjester, -1)
+
+    def _juster_tabell(self, gjester, fortegn):
+        if gjester.empty:
+            return
+        antall = _tall_kolonne(gjester, 'Antall gjester') * fortegn
+        self.antall_gjester = _tall(self.antall_gjester + antall.sum())
+        if 'RSVP Status' in gjester.columns:
+            self.per_status.update(_grupper(antall, gjester['RSVP Status']))
+        if 'Relasjon' in gjester.columns:
+            self.per_relasjon.update(_grupper(antall, gjester['Relasjon']))
+
+    # rad er en dict med kolonnenavn -> verdi
+    def legg_til(self, rad):
+        self._juster(rad, 1)
+
+    def fjern(self, rad):
+        self._juster(rad, -1)
+
+    def endre(self, gammel_rad, ny_rad):
+        self._juster(gammel_rad, -1)
+        self._juster(ny_rad, 1)
+
+    def _juster(self, rad, fortegn):
+        antall = fortegn * _tall(rad.get('Antall gjester'))
+        self.antall_gjester += antall
+        self.per_status[rad.get('RSVP Status')] += antall
+        self.per_relasjon[rad.get('Relasjon')] += antall
+
+    def status(self, status):
+        return self.per_status.get(status, 0)
+
+
+# Posteringer for et budsjett fra før det fantes posteringer: én faktura med Faktisk og
+# én betaling med Betalt for hver kategori der beløpet ikke er 0, uten dato
+def åpningsposteringer(budsjett):
+    deler = [
+        budsjett.loc[budsjett[kolonne] != 0, ['Kategori', kolonne]].rename(columns={kolonne: 'Beløp'}).assign(Type=type_)
+        for type_, kolonne in POSTERING_KOLONNER.items()
+    ]
+    posteringer = pd.concat(deler, ignore_index=True)
+    posteringer = posteringer.assign(ID=np.arange(1, len(posteringer) + 1), Beskrivelse="Overført fra budsjettet")
+    return tilpass(posteringer, 'Posteringer')
+
+
+# Summene for budsjettet. Budsjettert kommer fra budsjettet, mens Faktisk (fakturert) og
+# Betalt summeres fra posteringene per kategori og type. Tallene endres ikke etterpå.
+class BudsjettTall:
+    def __init__(self, budsjett, posteringer):
+        # Kategoriene i budsjettet, og deretter kategorier som bare finnes i posteringene
+        summer = self._summer(posteringer, 'Kategori')
+        kategorier = pd.Index(budsjett['Kategori'], name='Kategori')
+        kategorier = kategorier.append(summer.index.difference(kategorier))
+        tabell = summer.reindex(kategorier, fill_value=0)
+        tabell.insert(0, 'Budsjettert', budsjett.set_index('Kategori')['Budsjettert'].reindex(kategorier, fill_value=0).astype('int64'))
+        tabell['Gjenstående'] = tabell['Faktisk'] - tabell['Betalt']
+        tabell['Avvik'] = tabell['Budsjettert'] - tabell['Faktisk']
+        # Per kategori: Budsjettert, Faktisk, Betalt, Gjenstående (å betale) og Avvik
+        # (budsjettert minus faktisk)
+        self.tabell = tabell
+        self.per_kategori = {
+            kategori: dict(zip(BUDSJETT_KOLONNER, beløp))
+            for kategori, beløp in zip(kategorier.tolist(), zip(*(tabell[kolonne].tolist() for kolonne in BUDSJETT_KOLONNER)))
+        }
+        self.totalt = {kolonne: int(sum_) for kolonne, sum_ in tabell.sum().items()}
+        # Budsjettet med Faktisk og Betalt fra posteringene
+        self.budsjett = budsjett.assign(
+            Faktisk=tabell['Faktisk'].to_numpy()[:len(budsjett)],
+            Betalt=tabell['Betalt'].to_numpy()[:len(budsjett)],
+        )
+        self._posteringer = posteringer
+        self._forløp = None
+
+    # Beløpene summert per verdi av nøkkel (kolonne eller serie) med én kolonne per type
+    # postering: Faktisk og Betalt
+    @staticmethod
+    def _summer(posteringer, nøkkel):
+        summer = posteringer.groupby([nøkkel, 'Type'], observed=True)['Beløp'].sum().unstack('Type')
+        return summer.reindex(columns=POSTERINGSTYPER).fillna(0).astype('int64').rename(columns=POSTERING_KOLONNER).rename_axis(columns=None)
+
+    # Fakturert (Faktisk) og betalt til og med hver dag med posteringer, etter dato.
+    # Posteringer uten dato er ikke med.
+    def forløp(self):
+        if self._forløp is None:
+            datert = self._posteringer[self._posteringer['Dato'].notna()]
+            self._forløp = self._summer(datert, datert['Dato'].dt.normalize().rename('Dato')).cumsum()
+        return self._forløp
@@ -0,0 +1,192 @@
+import bisect
+import collections
+import datetime
+
+import pandas as pd
+
+from skjema import PRIORITETER, TABELLER, dtyper, tilpass, tilpass_rad
+
+# Lager for oppgavelisten.
+# Oppgavene ligger i en dict ID -> rad. De åpne oppgavene (alle som ikke er ferdige) står
+# i tillegg i lister sortert etter frist: én for alle oppgavene og én per ansvarlig.
+# Listene holdes sortert med bisect ved hver endring, så "forfalt", "frist de neste N
+# dagene" og "neste oppgaver for en ansvarlig" er et binærsøk pluss radene som hentes, i
+# stedet for en gjennomgang av hele listen. Ved lik frist kommer høyest prioritet først,
+# og oppgaver uten frist står sist.
+# Antall oppgaver per status vedlikeholdes ved hver endring, så nøkkeltallene på
+# oversiktssiden (Oppgavetall) regnes ut uten å gå gjennom oppgavene.
+# Hver oppgave har en fast ID, som gjestene. Alle rader som kommer inn tilpasses
+# skjemaet (skjema.py).
+
+OPPGAVE_KOLONNER = list(TABELLER['Oppgaver'])
+
+FERDIG = "Ferdig"
+
+# Dagen oppgaver uten frist sorteres på, etter alle andre
+_UTEN_FRIST = datetime.date.max.toordinal()
+
+# åpne: alle som ikke er ferdige; forfalt: åpne med frist før i dag; snart: åpne med
+# frist fra i dag og de neste dagene
+Oppgavetall = collections.namedtuple('Oppgavetall', ['åpne', 'forfalt', 'snart', 'ferdige'])
+
+
+# Plassen oppgaven har i de sorterte listene: (frist som dagnummer, prioritet, ID)
+def _oppføring(oppgave_id, rad):
+    frist = rad['Frist']
+    dag = _UTEN_FRIST if pd.isna(frist) else frist.date().toordinal()
+    rang = PRIORITETER.index(rad['Prioritet']) if rad['Prioritet'] in PRIORITETER else len(PRIORITETER)
+    return (dag, rang, oppgave_id)
+
+
+def _fjern(liste, oppføring):
+    del liste[bisect.bisect_left(liste, oppføring)]
+
+
+class OppgaveLager:
+    def __init__(self, oppgaver=None):
+        self._rader = {}
+        self._neste_id = 1
+        self._frister = []
+        self._frister_for = {}
+        self.per_status = collections.Counter()
+        self._tabell = None
+        if oppgaver is not None:
+            self.legg_til_tabell(oppgaver)
+
+    def __len__(self):
+        return len(self._rader)
+
+    def __contains__(self, oppgave_id):
+        return oppgave_id in self._rader
+
+    # Velger ID-er for nye rader. Eksisterende ID-er (f.eks. fra en eksportert
+    # Excel-fil) beholdes når de er gyldige og ikke allerede i bruk.
+    def _tildel_ider(self, kandidater):
+        ider = []
+        brukt = set()
+        for kandidat in kandidater:
+            try:
+                oppgave_id = int(kandidat)
+            except (TypeError, ValueError):
+                oppgave_id = None
+            if oppgave_id is None or oppgave_id < 1 or oppgave_id in self._rader or oppgave_id in brukt:
+                oppgave_id = self._neste_id
+            self._neste_id = max(self._neste_id, oppgave_id + 1)
+            brukt.add(oppgave_id)
+            ider.append(oppgave_id)
+        return ider
+
+    def _indekser(self, oppgave_id, rad):
+        self.per_status[rad['Status']] += 1
+        if rad['Status'] != FERDIG:
+            oppføring = _oppføring(oppgave_id, rad)
+            bisect.insort(self._frister, oppføring)
+            bisect.insort(self._frister_for.setdefault(rad['Ansvarlig'], []), oppføring)
+
+    def _fjern_indeks(self, oppgave_id, rad):
+        self.per_status[rad['Status']] -= 1
+        if rad['Status'] != FERDIG:
+            oppføring = _oppføring(oppgave_id, rad)
+            _fjern(self._frister, oppføring)
+            frister = self._frister_for[rad['Ansvarlig']]
+            _fjern(frister, oppføring)
+            if not frister:
+                del self._frister_for[rad['Ansvarlig']]
+
+    # Legger til én oppgave. rad er en dict med kolonnenavn -> verdi.
+    # Returnerer ID-en oppgaven fikk.
+    def legg_til(self, rad):
+        rad = tilpass_rad(rad, 'Oppgaver')
+        oppgave_id = self._tildel_ider([rad['ID']])[0]
+        rad['ID'] = oppgave_id
+        self._rader[oppgave_id] = rad
+        self._indekser(oppgave_id, rad)
+        self._tabell = None
+        return oppgave_id
+
+    # Legger til alle radene i en DataFrame. De sorterte listene bygges på nytt med én
+    # sortering i stedet for én innsetting per oppgave. Returnerer ID-ene radene fikk.
+    def legg_til_tabell(self, oppgaver):
+        oppgaver = tilpass(oppgaver, 'Oppgaver')
+        ider = self._tildel_ider(oppgaver['ID'].tolist())
+        kolonner = [ider if kolonne == 'ID' else oppgaver[kolonne].tolist() for kolonne in OPPGAVE_KOLONNER]
+        rader = [dict(zip(OPPGAVE_KOLONNER, verdier)) for verdier in zip(*kolonner)]
+        for oppgave_id, rad in zip(ider, rader):
+            self._rader[oppgave_id] = rad
+            self.per_status[rad['Status']] += 1
+            if rad['Status'] != FERDIG:
+                oppføring = _oppføring(oppgave_id, rad)
+                self._frister.append(oppføring)
+                self._frister_for.setdefault(rad['Ansvarlig'], []).append(oppføring)
+        self._frister.sort()
+        for frister in self._frister_for.values():
+            frister.sort()
+        self._tabell = None
+        return ider
+
+    def rad(self, oppgave_id):
+        return dict(self._rader[oppgave_id])
+
+    def oppdater(self, oppgave_id, endringer):
+        gammel_rad = self._rader[oppgave_id]
+        ny_rad = tilpass_rad(dict(gammel_rad, **endringer, ID=oppgave_id), 'Oppgaver')
+        self._fjern_indeks(oppgave_id, gammel_rad)
+        self._rader[oppgave_id] = ny_rad
+        self._indekser(oppgave_id, ny_rad)
+        self._tabell = None
+
+    def slett(self, oppgave_id):
+        rad = self._rader.pop(oppgave_id, None)
+        if rad is None:
+            return
+        self._fjern_indeks(oppgave_id, rad)
+        self._tabell = None
+
+    # Oppgavelisten som DataFrame, i rekkefølgen oppgavene ble lagt til
+    def tabell(self):
+        if self._tabell is None:
+            self._tabell = self.rader(list(self._rader))
+        return self._tabell
+
+    # Oppgavene med ID-ene, i samme rekkefølge, som DataFrame med typene i skjemaet
+    def rader(self, ider):
+        rader = [self._rader[oppgave_id] for oppgave_id in ider]
+        return pd.DataFrame(rader, columns=OPPGAVE_KOLONNER).astype(dtyper('Oppgaver'))
+
+    # De ansvarlige som har åpne oppgaver. Åpne oppgaver uten ansvarlig finnes med
+    # neste_for("").
+    def ansvarlige(self):
+        return sorted(ansvarlig for ansvarlig in self._frister_for if ansvarlig)
+
+    # ID-ene til de åpne oppgavene med frist før idag, eldste frist først. antall
+    # begrenser hvor mange som hentes (None: alle).
+    def forfalt(self, idag, antall=None):
+        slutt = bisect.bisect_left(self._frister, (idag.toordinal(),))
+        return self._ider(0, slutt, antall)
+
+    # ID-ene til de åpne oppgavene med frist fra idag til og med dager dager etter,
+    # tidligste frist først
+    def frist_innen(self, idag, dager, antall=None):
+        start = bisect.bisect_left(self._frister, (idag.toordinal(),))
+        slutt = bisect.bisect_left(self._frister, (idag.toordinal() + dager + 1,))
+        return self._ider(start, slutt, antall)
+
+    def _ider(self, start, slutt, antall):
+        if antall is not None:
+            slutt = min(slutt, start + antall)
+        return [oppføring[2] for oppføring in self._frister[start:slutt]]
+
+    # ID-ene til de antall neste åpne oppgavene for den ansvarlige (også forfalte),
+    # tidligste frist først
+    def neste_for(self, ansvarlig, antall=5):
+        return [oppføring[2] for oppføring in self._frister_for.get(ansvarlig, [])[:antall]]
+
+    def tall(self, idag, dager=7):
+        dag = idag.toordinal()
+        forfalt = bisect.bisect_left(self._frister, (dag,))
+        return Oppgavetall(
+            åpne=len(self._frister),
+            forfalt=forfalt,
+            snart=bisect.bisect_left(self._frister, (dag + dager + 1,)) - forfalt,
+            ferdige=self.per_status[FERDIG],
+        )
@@ -0,0 +1,178 @@
+import numpy as np
+import pandas as pd
+
+# Deklarerte kolonnetyper for tabellene.
+# Alle veier inn i tabellene (nye tabeller, nye og endrede gjester, CSV-, Excel- og
+# SQLite-innlesing) går gjennom tilpass eller tilpass_rad, slik at kolonnene alltid har
+# de samme, kompakte typene i stedet for det pandas gjetter: kategorier for faste
+# verdier (RSVP Status, Relasjon, Status og Prioritet for oppgaver, Regel for bordplasseringen,
+# Type for posteringer), bool for Invitert, små heltall for antall gjester og plasser, hele
+# kroner i budsjettet og posteringene og datoer i Frist, Tid, Slutt og Dato.
+# Hver kolonne har en type og en standardverdi for tomme og ugyldige celler.
+
+RSVP_STATUSER = ["Kommer", "Kommer ikke", "Venter på svar"]
+RELASJONER = ["Familie brud", "Familie brudgom", "Venn brud", "Venn brudgom", "Kollega", "Annet"]
+OPPGAVE_STATUSER = ["Ikke startet", "Pågår", "Ferdig"]
+# Høyeste prioritet først
+PRIORITETER = ["Høy", "Middels", "Lav"]
+BORDREGLER = ["Sammen", "Adskilt"]
+POSTERINGSTYPER = ["Faktura", "Betaling"]
+
+# Lovlige verdier for kolonnene av typen kategori
+KATEGORIER = {
+    'RSVP Status': RSVP_STATUSER,
+    'Relasjon': RELASJONER,
+    'Status': OPPGAVE_STATUSER,
+    'Prioritet': PRIORITETER,
+    'Regel': BORDREGLER,
+    'Type': POSTERINGSTYPER,
+}
+
+# Antall gjester lagres som int16
+MAKS_ANTALL = np.iinfo(np.int16).max
+
+TABELLER = {
+    'Gjester': {
+        'ID': ('heltall', None),
+        'Navn': ('tekst', ""),
+        'Relasjon': ('kategori', "Annet"),
+        'Invitert': ('bool', True),
+        'RSVP Status': ('kategori', "Venter på svar"),
+        'Antall gjester': ('antall', 1),
+        'Spesielle behov': ('tekst', ""),
+    },
+    # Faktisk og Betalt regnes ut fra posteringene (se nokkeltall.py)
+    'Budsjett': {
+        'Kategori': ('tekst', ""),
+        'Budsjettert': ('kroner', 0),
+        'Faktisk': ('kroner', 0),
+        'Betalt': ('kroner', 0),
+        'Beskrivelse': ('tekst', ""),
+    },
+    # Fakturaer og betalinger per budsjettkategori
+    'Posteringer': {
+        'ID': ('heltall', None),
+        'Dato': ('dato', None),
+        'Kategori': ('tekst', ""),
+        'Type': ('kategori', "Faktura"),
+        'Beløp': ('kroner', 0),
+        'Beskrivelse': ('tekst', ""),
+    },
+    'Oppgaver': {
+        'ID': ('heltall', None),
+        'Oppgave': ('tekst', ""),
+        'Beskrivelse': ('tekst', ""),
+        'Frist': ('dato', None),
+        'Ansvarlig': ('tekst', ""),
+        'Status': ('kategori', "Ikke startet"),
+        'Prioritet': ('kategori', "Middels"),
+        'Notater': ('tekst', ""),
+    },
+    'Tidsplan': {
+        'ID': ('heltall', None),
+        'Tid': ('dato', None),
+        'Slutt': ('dato', None),
+        'Aktivitet': ('tekst', ""),
+        'Sted': ('tekst', ""),
+        'Ansvarlig': ('tekst', ""),
+        'Notater': ('tekst', ""),
+    },
+    # Bordene i bordplanen og hvor mange som får plass ved hvert
+    'Bord': {
+        'Bord': ('heltall', None),
+        'Plasser': ('antall', 8),
+    },
+    # Bordet hver gjest (med følge) er plassert ved
+    'Bordplan': {
+        'ID': ('heltall', None),
+        'Bord': ('heltall', None),
+    },
+    # Gjester som skal sitte sammen eller ikke ved samme bord
+    'Bordregler': {
+        'ID': ('heltall', None),
+        'Gjest': ('heltall', None),
+        'Annen gjest': ('heltall', None),
+        'Regel': ('kategori', "Sammen"),
+    },
+}
+
+JA = {'ja', 'j', 'yes', 'y', 'true', 'sann', '1', 'x'}
+NEI = {'nei', 'n', 'no', 'false', 'usann', '0'}
+
+
+# Tolker ja/nei-verdier (bool, 1/0 eller tekst). Ukjente og tomme verdier blir standard.
+def til_bool(serie, standard=True):
+    if pd.api.types.is_bool_dtype(serie):
+        return serie.astype(bool)
+    if pd.api.types.is_numeric_dtype(serie):
+        return pd.Series(np.where(serie == 1, True, np.where(serie == 0, False, standard)), index=serie.index)
+    tekst = serie.map(lambda verdi: str(verdi).strip().lower() if pd.notna(verdi) else "")
+    return tekst.map(lambda verdi: True if verdi in JA else False if verdi in NEI else standard).astype(bool)
+
+
+# Datatyper som sendes til pd.read_excel, slik at tekstkolonner ikke tolkes som tall
+def excel_dtyper(tabell):
+    return {kolonne: object for kolonne, (type_, _) in TABELLER[tabell].items() if type_ in ('tekst', 'kategori')}
+
+
+def _dtype(kolonne, type_):
+    if type_ == 'kategori':
+        return pd.CategoricalDtype(KATEGORIER[kolonne])
+    return {
+        'tekst': 'str',
+        'heltall': 'Int64',
+        'antall': 'int16',
+        'kroner': 'int64',
+        'bool': 'bool',
+        'dato': 'datetime64[ns]',
+    }[type_]
+
+
+# Datatypene i skjemaet, for tabeller der verdiene allerede er gyldige
+def dtyper(tabell):
+    return {kolonne: _dtype(kolonne, type_) for kolonne, (type_, _) in TABELLER[tabell].items()}
+
+
+def _kolonne(serie, kolonne, type_, standard):
+    if type_ == 'tekst':
+        if serie.dtype == 'str':
+            return serie.fillna(standard)
+        if pd.api.types.infer_dtype(serie, skipna=False) == 'string':
+            return serie.astype('str')
+        return serie.map(lambda verdi: standard if pd.isna(verdi) else str(verdi)).astype('str')
+    if type_ == 'kategori':
+        dtype = _dtype(kolonne, type_)
+        if serie.dtype == dtype:
+            return serie.fillna(standard)
+        return serie.where(serie.isin(dtype.categories), standard).astype(dtype)
+    if type_ in ('heltall', 'antall', 'kroner'):
+        tall = pd.to_numeric(serie, errors='coerce').round()
+        if standard is None:
+            return tall.astype('Int64')
+        if type_ == 'antall':
+            tall = tall.where((tall >= 1) & (tall <= MAKS_ANTALL))
+        return tall.fillna(standard).astype(_dtype(kolonne, type_))
+    if type_ == 'bool':
+        return til_bool(serie, standard)
+    if type_ == 'dato':
+        return pd.to_datetime(serie, errors='coerce').astype(_dtype(kolonne, type_))
+    raise ValueError(f"Ukjent kolonnetype: {type_}")
+
+
+# Gir tabellen kolonnene og typene i skjemaet. Manglende kolonner legges til med
+# standardverdien, ugyldige verdier erstattes med den, og kolonner som ikke er i
+# skjemaet tas bort.
+def tilpass(df, tabell):
+    kolonner = {}
+    for kolonne, (type_, standard) in TABELLER[tabell].items():
+        if kolonne in df.columns:
+            serie = df[kolonne]
+        else:
+            serie = pd.Series([standard] * len(df), index=df.index, dtype=object)
+        kolonner[kolonne] = _kolonne(serie, kolonne, type_, standard)
+    return pd.DataFrame(kolonner, index=df.index)
+
+
+# Som tilpass, for én rad (dict kolonne -> verdi). Verdiene blir vanlige Python-verdier.
+def tilpass_rad(rad, tabell):
+    return tilpass(pd.DataFrame([rad]), tabell).to_dict('records')[0]
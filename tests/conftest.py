@@ -0,0 +1,5 @@
+import os
+import sys
+
+# Testene kjøres fra rotmappen (python -m pytest) eller fra tests/; modulene ligger i rotmappen
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -0,0 +1,176 @@
+import collections
+import itertools
+import random
+
+import numpy as np
+import pandas as pd
+
+from benchmark.datasett import lag_bord, lag_gjester
+from bordplassering import Bordplan
+
+# Bordplanen sjekkes mot regler som alltid skal holde (plassene ved hvert bord, Sammen
+# og Adskilt), og små planer mot en gjennomgang av alle mulige plasseringer: finnes en
+# plassering for alle og er det minst ett bord til overs, skal alle få plass, og ingen
+# flytting av ett selskap (med de det skal sitte sammen med) skal gi flere poeng.
+
+
+def _selskaper(selskaper):
+    return pd.DataFrame({
+        'ID': list(selskaper),
+        'Antall gjester': [antall for antall, _ in selskaper.values()],
+        'Relasjon': [relasjon for _, relasjon in selskaper.values()],
+    })
+
+
+# Poengene lokalsøket øker: par av personer med samme relasjon ved samme bord
+def _poeng(plassering, selskaper):
+    per_bord = collections.defaultdict(collections.Counter)
+    for gjest, nummer in plassering.items():
+        antall, relasjon = selskaper[gjest]
+        per_bord[nummer][relasjon] += antall
+    return sum(antall * (antall - 1) // 2 for relasjoner in per_bord.values() for antall in relasjoner.values())
+
+
+def _gyldig(plassering, selskaper, bord, regler):
+    opptatt = collections.Counter()
+    for gjest, nummer in plassering.items():
+        opptatt[nummer] += selskaper[gjest][0]
+    if any(opptatt[nummer] > plasser for nummer, plasser in bord.items()):
+        return False
+    for gjest, annen, regel in regler.values():
+        if gjest in plassering and annen in plassering and (plassering[gjest] == plassering[annen]) != (regel == "Sammen"):
+            return False
+    return True
+
+
+# Gjestene som skal sitte sammen, som grupper
+def _grupper(selskaper, regler):
+    gruppe_for = {gjest: {gjest} for gjest in selskaper}
+    for gjest, annen, regel in regler.values():
+        if regel == "Sammen" and gruppe_for[gjest] is not gruppe_for[annen]:
+            samlet = gruppe_for[gjest] | gruppe_for[annen]
+            for medlem in samlet:
+                gruppe_for[medlem] = samlet
+    return list({id(gruppe): gruppe for gruppe in gruppe_for.values()}.values())
+
+
+def _beste_poeng(selskaper, bord, regler):
+    beste = None
+    for valg in itertools.product(list(bord), repeat=len(selskaper)):
+        plassering = dict(zip(selskaper, valg))
+        if _gyldig(plassering, selskaper, bord, regler):
+            poeng = _poeng(plassering, selskaper)
+            beste = poeng if beste is None else max(beste, poeng)
+    return beste
+
+
+def _sjekk_regler(plan, selskaper, bord):
+    assert set(plan.plassering) | set(plan.ikke_plassert) == set(selskaper)
+    assert not set(plan.plassering) & set(plan.ikke_plassert)
+    assert set(plan.plassering.values()) <= set(bord)
+    assert _gyldig(plan.plassering, selskaper, bord, plan.regler)
+    for gjest, annen, regel in plan.regler.values():
+        if regel == "Sammen":
+            assert (gjest in plan.plassering) == (annen in plan.plassering)
+
+
+def test_små_planer_mot_alle_plasseringer():
+    for frø in range(60):
+        rng = random.Random(frø)
+        bord = {nummer: rng.choice([4, 5, 6]) for nummer in range(1, rng.randint(2, 4) + 1)}
+        selskaper = {gjest: (rng.randint(1, 3), rng.choice("ABC")) for gjest in range(1, rng.randint(3, 7) + 1)}
+        # Appen har høyst én regel per par av gjester
+        par = rng.sample(list(itertools.combinations(selskaper, 2)), rng.randint(0, 2))
+        regler = {regel_id: (gjest, annen, rng.choice(["Sammen", "Adskilt"])) for regel_id, (gjest, annen) in enumerate(par)}
+        plan = Bordplan(regler=regler)
+        plan.lag(_selskaper(selskaper), bord, tidsgrense=1)
+        _sjekk_regler(plan, selskaper, bord)
+
+        beste = _beste_poeng(selskaper, bord, regler)
+        til_overs = sum(bord.values()) - sum(antall for antall, _ in selskaper.values())
+        if beste is not None and til_overs >= max(bord.values()):
+            assert not plan.ikke_plassert, frø
+        if plan.ikke_plassert:
+            continue
+        poeng = _poeng(plan.plassering, selskaper)
+        assert beste is not None and poeng <= beste
+        for gruppe in _grupper(selskaper, regler):
+            for nummer in bord:
+                flyttet = {**plan.plassering, **dict.fromkeys(gruppe, nummer)}
+                if _gyldig(flyttet, selskaper, bord, regler):
+                    assert _poeng(flyttet, selskaper) <= poeng, frø
+
+
+# Blokken får bare plass ved bordet der et selskap den skal sitte adskilt fra, sitter;
+# det selskapet flyttes til et annet bord
+def test_adskilt_selskap_flyttes_for_å_gi_plass():
+    selskaper = {1: (1, 'B'), 2: (3, 'C'), 3: (2, 'A'), 4: (2, 'B')}
+    regler = {1: (2, 3, "Adskilt"), 2: (4, 2, "Sammen")}
+    bord = {1: 4, 2: 5, 3: 4}
+    plan = Bordplan(regler=regler)
+    plan.lag(_selskaper(selskaper), bord)
+    assert plan.ikke_plassert == []
+    assert plan.plassering[2] == plan.plassering[4] == 2
+    _sjekk_regler(plan, selskaper, bord)
+
+
+def test_sammen_gjelder_hele_kjeden():
+    selskaper = {gjest: (1, relasjon) for gjest, relasjon in enumerate("ABCABC", start=1)}
+    regler = {1: (1, 2, "Sammen"), 2: (2, 3, "Sammen"), 3: (3, 4, "Adskilt")}
+    plan = Bordplan(regler=regler)
+    plan.lag(_selskaper(selskaper), {1: 4, 2: 4})
+    assert plan.plassering[1] == plan.plassering[2] == plan.plassering[3] != plan.plassering[4]
+
+
+def _store_selskaper(antall, frø):
+    kommer, bord = lag_bord(lag_gjester(antall, np.random.default_rng(frø)))
+    selskaper = dict(zip(kommer['ID'].tolist(), zip(kommer['Antall gjester'].tolist(), kommer['Relasjon'].astype(str).tolist())))
+    return kommer, selskaper, bord
+
+
+def test_store_planer_holder_reglene():
+    kommer, selskaper, bord = _store_selskaper(2000, 11)
+    ider = kommer['ID'].tolist()
+    regler = {nummer: (ider[2 * nummer], ider[2 * nummer + 1], "Sammen" if nummer % 2 else "Adskilt") for nummer in range(50)}
+    plan = Bordplan(regler=regler)
+    plan.lag(kommer, bord, tidsgrense=0.2)
+    _sjekk_regler(plan, selskaper, bord)
+    assert plan.ikke_plassert == []
+    # For få bord: noen får ikke plass, men reglene holder fortsatt
+    færre = dict(list(bord.items())[:len(bord) // 2])
+    plan.lag(kommer, færre, tidsgrense=0.2)
+    _sjekk_regler(plan, selskaper, færre)
+    assert plan.ikke_plassert
+
+
+# Etter endrede svar flyttes bare de nye og de endrede; de andre blir sittende
+def test_oppdatering_flytter_bare_de_endrede():
+    kommer, selskaper, bord = _store_selskaper(1000, 12)
+    plan = Bordplan()
+    plan.lag(kommer, bord, tidsgrense=0.2)
+    før = dict(plan.plassering)
+
+    borte, større = kommer['ID'].iloc[0], kommer['ID'].iloc[1]
+    svar = kommer.iloc[1:].copy()
+    svar.loc[svar['ID'] == større, 'Antall gjester'] += 1
+    ny = svar['ID'].max() + 1
+    svar = pd.concat([svar, pd.DataFrame({'ID': [ny], 'Relasjon': [svar['Relasjon'].iloc[0]], 'Antall gjester': [2]})], ignore_index=True)
+
+    endret, fjernet = plan.oppdater(svar)
+    assert fjernet == [borte]
+    assert set(endret) <= {større, ny}
+    assert ny in plan.plassering
+    for gjest, nummer in før.items():
+        if gjest not in (borte, større):
+            assert plan.plassering[gjest] == nummer
+    _sjekk_regler(plan, dict(zip(svar['ID'], zip(svar['Antall gjester'], svar['Relasjon']))), bord)
+
+
+def test_tabellene_gir_samme_plan():
+    kommer, _, bord = _store_selskaper(300, 13)
+    plan = Bordplan(regler={1: (kommer['ID'].iloc[0], kommer['ID'].iloc[1], "Sammen")})
+    plan.lag(kommer, bord)
+    regler = pd.DataFrame([(regel_id, gjest, annen, regel) for regel_id, (gjest, annen, regel) in plan.regler.items()],
+                          columns=['ID', 'Gjest', 'Annen gjest', 'Regel'])
+    kopi = Bordplan.fra_tabeller(plan.bordtabell(), plan.plasstabell(), regler)
+    assert (kopi.bord, kopi.plassering, kopi.regler) == (plan.bord, plan.plassering, plan.regler)
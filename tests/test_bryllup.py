@@ -0,0 +1,201 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+import bryllup
+from benchmark.datasett import lag_gjester
+from bryllup import Bryllup, Konflikt
+from lagring import Lagring, SqliteLagring
+
+# Det felles lageret for et bryllup: optimistisk låsing med versjoner per rad, loggen
+# over endringer og innlesing på nytt når en annen prosess har skrevet til SQLite-filen.
+
+
+@pytest.fixture
+def felles():
+    felles = Bryllup(Lagring())
+    felles.legg_til_gjester(lag_gjester(50, np.random.default_rng(9)).drop(columns=['ID']), "a")
+    return felles
+
+
+def test_endring_mot_gammel_versjon_avvises(felles):
+    gjest_id = felles.gjestelager().ider()[0]
+    sett = felles.versjon
+    felles.oppdater_gjest(gjest_id, {'Navn': "Økt A"}, sett, "a")
+    with pytest.raises(Konflikt) as feil:
+        felles.oppdater_gjest(gjest_id, {'Navn': "Økt B"}, sett, "b")
+    assert feil.value.nøkler == [gjest_id]
+    with pytest.raises(Konflikt):
+        felles.slett_gjest(gjest_id, sett, "b")
+    assert felles.gjestelager().navn(gjest_id) == "Økt A"
+    # Med versjonen etter endringen går det bra, og en slettet gjest gir Konflikt
+    felles.oppdater_gjest(gjest_id, {'Navn': "Økt B"}, felles.radversjon("Gjester", gjest_id), "b")
+    felles.slett_gjest(gjest_id, None, "a")
+    with pytest.raises(Konflikt):
+        felles.oppdater_gjest(gjest_id, {'Navn': "Økt B"}, None, "b")
+
+
+def test_andre_tabeller_har_samme_låsing(felles):
+    sett = felles.versjon
+    felles.oppdater_budsjett("Lokale", {'Budsjettert': 1000}, sett, "a")
+    with pytest.raises(Konflikt):
+        felles.oppdater_budsjett("Lokale", {'Budsjettert': 2000}, sett, "b")
+    oppgave_id = felles.legg_til_oppgave({'Oppgave': "Bestille kake"}, "a")
+    sett = felles.versjon
+    felles.oppdater_oppgave(oppgave_id, {'Status': "Ferdig"}, sett, "a")
+    with pytest.raises(Konflikt):
+        felles.slett_oppgave(oppgave_id, sett, "b")
+    aktivitet_id = felles.legg_til_aktivitet({'Aktivitet': "Vielse", 'Tid': pd.Timestamp("2026-06-20 14:00")}, "a")
+    sett = felles.versjon
+    felles.oppdater_aktivitet(aktivitet_id, {'Sted': "Kirken"}, sett, "a")
+    with pytest.raises(Konflikt):
+        felles.oppdater_aktivitet(aktivitet_id, {'Sted': "Låven"}, sett, "b")
+    # En erstattet tabell gir alle radene en ny versjon
+    felles.erstatt("Tidsplan", felles.tabell("Tidsplan"), "a")
+    with pytest.raises(Konflikt):
+        felles.slett_aktivitet(aktivitet_id, sett + 1, "b")
+
+
+# Er én av radene endret av andre, lagres ingen av dem
+def test_masseendring_med_én_gammel_rad_avvises(felles):
+    ider = felles.gjestelager().ider()[:10]
+    sett = felles.versjon
+    felles.oppdater_gjest(ider[3], {'Antall gjester': 4}, sett, "a")
+    før, versjon = felles.tabell("Gjester"), felles.versjon
+    redigert = pd.DataFrame({'ID': ider, 'RSVP Status': "Kommer ikke", 'Antall gjester': 1})
+    with pytest.raises(Konflikt) as feil:
+        felles.oppdater_gjester(redigert, sett, "b")
+    assert feil.value.nøkler == [ider[3]]
+    pd.testing.assert_frame_equal(felles.tabell("Gjester"), før)
+    assert felles.versjon == versjon
+    endret = felles.oppdater_gjester(redigert, versjon, "b")
+    assert set(endret['ID']) <= set(ider)
+    assert (felles.tabell("Gjester").set_index('ID').loc[ider, 'RSVP Status'] == "Kommer ikke").all()
+
+
+# endringer_siden gir nøyaktig radene som er endret etter versjonen, eldste først
+def test_endringer_siden_gir_de_endrede_radene(felles):
+    rng = np.random.default_rng(10)
+    endret_etter = {}
+    for steg in range(200):
+        ider = felles.gjestelager().ider()
+        gjest_id = int(rng.choice(ider))
+        valg = rng.random()
+        if valg < 0.5:
+            felles.oppdater_gjest(gjest_id, {'Navn': f"Gjest {steg}"}, None, "a")
+            nøkler = {("Gjester", gjest_id)}
+        elif valg < 0.6:
+            felles.slett_gjest(gjest_id, None, "a")
+            nøkler = {("Gjester", gjest_id)}
+        elif valg < 0.8:
+            nøkler = {("Gjester", felles.legg_til_gjest({'Navn': f"Ny {steg}"}, "a"))}
+        else:
+            valgt = [int(gjest_id) for gjest_id in rng.choice(ider, 5, replace=False)]
+            endret = felles.oppdater_gjester(pd.DataFrame({'ID': valgt, 'Relasjon': "Kollega"}), None, "a")
+            nøkler = {("Gjester", gjest_id) for gjest_id in endret['ID'].tolist()}
+        for versjon in endret_etter:
+            endret_etter[versjon] |= nøkler
+        endret_etter[felles.versjon] = set()
+    for versjon, nøkler in endret_etter.items():
+        endringer = felles.endringer_siden(versjon)
+        assert {(endring.tabell, endring.nøkkel) for endring in endringer} == nøkler
+        assert all(endring.versjon > versjon for endring in endringer)
+        assert [endring.versjon for endring in endringer] == sorted(endring.versjon for endring in endringer)
+    assert felles.endringer_siden(felles.versjon) == []
+
+
+def test_endringer_siden_når_loggen_er_for_kort(monkeypatch):
+    monkeypatch.setattr(bryllup, 'LOGG_LENGDE', 5)
+    felles = Bryllup(Lagring())
+    gjest_id = felles.legg_til_gjest({'Navn': "Kari"}, "a")
+    start = felles.versjon
+    for steg in range(5):
+        felles.oppdater_gjest(gjest_id, {'Navn': f"Kari {steg}"}, None, "a")
+    assert len(felles.endringer_siden(start)) == 5
+    # Den sjette endringen skyver den første ut av loggen
+    felles.oppdater_gjest(gjest_id, {'Navn': "Kari"}, None, "a")
+    assert felles.endringer_siden(start) is None
+    assert len(felles.endringer_siden(start + 1)) == 5
+
+
+# Figurene caches på endret_i, så den må øke ved hver endring av tabellene og bare da
+def test_endret_i_følger_tabellene(felles):
+    budsjett = felles.endret_i("Budsjett", "Posteringer")
+    felles.legg_til_postering({'Dato': pd.Timestamp("2027-06-01"), 'Kategori': "Lokale", 'Type': "Faktura",
+                               'Beløp': 500, 'Beskrivelse': ""}, "a")
+    assert felles.endret_i("Budsjett", "Posteringer") > budsjett
+    budsjett = felles.endret_i("Budsjett", "Posteringer")
+    tidsplan = felles.endret_i("Tidsplan")
+    felles.oppdater_gjester(felles.tabell("Gjester").head(3).assign(**{'Antall gjester': 4}), None, "a")
+    assert felles.endret_i("Budsjett", "Posteringer") == budsjett
+    assert felles.endret_i("Tidsplan") == tidsplan
+    felles.legg_til_aktivitet({'Tid': pd.Timestamp("2027-06-19 14:00"), 'Aktivitet': "Vielse"}, "a")
+    assert felles.endret_i("Tidsplan") > tidsplan
+
+
+# En opplastet fil leses først når noen trenger tabellen
+def test_vent_på_fil_leser_når_tabellen_trengs(felles):
+    lest = []
+
+    def les():
+        lest.append(True)
+        return lag_gjester(5, np.random.default_rng(11))
+
+    gjest_id = felles.gjestelager().ider()[0]
+    sett = felles.versjon
+    felles.vent_på_fil({"Gjester": les}, "a")
+    assert not lest and not felles.er_lastet("Gjester")
+    assert felles.endringer_siden(sett)[-1].handling == 'erstattet'
+    assert len(felles.tabell("Gjester")) == 5
+    assert len(felles.tabell("Gjester")) == 5
+    # Arket er bare lest én gang
+    assert lest == [True]
+    with pytest.raises(Konflikt):
+        felles.oppdater_gjest(gjest_id, {'Navn': "Gammel"}, sett, "b")
+
+
+# To prosesser (her: to tilkoblinger) som deler SQLite-filen
+def test_annen_prosess_sine_endringer_leses_inn(tmp_path):
+    sti = str(tmp_path / "bryllup.db")
+    første, andre = Bryllup(SqliteLagring(sti)), Bryllup(SqliteLagring(sti))
+    gjest_id = første.legg_til_gjest({'Navn': "Ola"}, "a")
+    assert andre.gjestelager().ider() == [gjest_id]
+    sett = andre.versjon
+    første.oppdater_gjest(gjest_id, {'Navn': "Ola Nordmann"}, None, "a")
+    første.legg_til_gjest({'Navn': "Kari"}, "a")
+    andre.synkroniser()
+    assert andre.versjon > sett
+    assert andre.endringer_siden(sett) is None
+    assert andre.tabell("Gjester")['Navn'].tolist() == ["Ola Nordmann", "Kari"]
+    # Endringen andre begynte på før synkroniseringen, ville skrevet over den første
+    with pytest.raises(Konflikt):
+        andre.oppdater_gjest(gjest_id, {'Navn': "Ola Hansen"}, sett, "b")
+    # Egne endringer gjør ikke at tabellene leses på nytt
+    andre.oppdater_gjest(gjest_id, {'Navn': "Ola Hansen"}, andre.versjon, "b")
+    versjon = andre.versjon
+    andre.synkroniser()
+    assert andre.versjon == versjon
+    første.synkroniser()
+    assert første.gjestelager().navn(gjest_id) == "Ola Hansen"
+    første.lagring.lukk()
+    andre.lagring.lukk()
+
+
+# En slettet regel sin ID gis ikke til en ny, heller ikke etter at planen er lest på nytt
+def test_bordregler_får_nye_ider(tmp_path):
+    sti = str(tmp_path / "bryllup.db")
+    felles = Bryllup(SqliteLagring(sti))
+    felles.legg_til_gjester(lag_gjester(6, np.random.default_rng(2)).drop(columns=['ID']).assign(**{'RSVP Status': "Kommer"}), "a")
+    ider = felles.gjestelager().ider()
+    felles.lag_bordplan(4, 8, "a")
+    første = felles.legg_til_bordregel(ider[0], ider[1], "Sammen", "a")
+    andre = felles.legg_til_bordregel(ider[2], ider[3], "Adskilt", "a")
+    assert felles.legg_til_bordregel(ider[1], ider[0], "Adskilt", "a") == første
+    felles.slett_bordregel(andre, "a")
+    tredje = felles.legg_til_bordregel(ider[4], ider[5], "Sammen", "a")
+    assert tredje > andre
+    felles.lagring.lukk()
+    felles = Bryllup(SqliteLagring(sti))
+    felles.slett_bordregel(tredje, "a")
+    assert felles.legg_til_bordregel(ider[2], ider[5], "Sammen", "a") == tredje + 1
+    felles.lagring.lukk()
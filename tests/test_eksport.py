@@ -0,0 +1,56 @@
+import pandas as pd
+import pytest
+
+from benchmark.datasett import lag_tabeller
+from eksport import ARK, bygg_excel, bygg_snapshot, les_ark, les_fil, tabell_hash
+from lagring import SqliteLagring
+from skjema import tilpass
+
+# Tabellene skal komme tilbake med samme kolonner, datatyper og verdier etter en tur
+# gjennom Excel, et øyeblikksbilde og SQLite, slik at tabell_hash og indeksene som
+# bygges på dem, gir det samme som før lagringen.
+
+
+@pytest.fixture(scope='module')
+def tabeller():
+    return {navn: tilpass(df, navn) for navn, df in lag_tabeller(200).items()}
+
+
+def _sjekk_like(lest, tabeller):
+    assert list(lest) == list(tabeller)
+    for navn, df in tabeller.items():
+        assert lest[navn].dtypes.to_dict() == df.dtypes.to_dict(), navn
+        pd.testing.assert_frame_equal(lest[navn], df, obj=navn)
+        assert tabell_hash(lest[navn]) == tabell_hash(df), navn
+
+
+@pytest.mark.parametrize('bygg', [bygg_excel, bygg_snapshot])
+def test_fil_gir_samme_tabeller(tabeller, bygg):
+    innhold = bygg(tabeller)
+    _sjekk_like(les_fil(innhold), tabeller)
+    for navn in ARK:
+        pd.testing.assert_frame_equal(les_ark(innhold, navn), tabeller[navn], obj=navn)
+
+
+def test_sqlite_gir_samme_tabeller(tabeller, tmp_path):
+    lagring = SqliteLagring(str(tmp_path / "bryllup.db"))
+    for navn, df in tabeller.items():
+        lagring.erstatt(navn, df)
+    lagring.lukk()
+    lagring = SqliteLagring(str(tmp_path / "bryllup.db"))
+    _sjekk_like({navn: lagring.last(navn) for navn in tabeller}, tabeller)
+    lagring.lukk()
+
+
+# En fil fra før det fantes posteringer får dem fra Faktisk og Betalt i budsjettet
+@pytest.mark.parametrize('bygg', [bygg_excel, bygg_snapshot])
+def test_fil_uten_posteringer(tabeller, bygg):
+    budsjett = tabeller['Budsjett']
+    uten = {navn: df for navn, df in tabeller.items() if navn != 'Posteringer'}
+    posteringer = les_fil(bygg(uten))['Posteringer']
+    assert posteringer.dtypes.to_dict() == tabeller['Posteringer'].dtypes.to_dict()
+    assert posteringer['Dato'].isna().all()
+    for type_, kolonne in [('Faktura', 'Faktisk'), ('Betaling', 'Betalt')]:
+        summer = posteringer[posteringer['Type'] == type_].groupby('Kategori', observed=True)['Beløp'].sum()
+        forventet = budsjett.set_index('Kategori')[kolonne]
+        assert summer.to_dict() == forventet[forventet != 0].to_dict()
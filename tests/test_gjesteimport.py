@@ -0,0 +1,110 @@
+import numpy as np
+import pandas as pd
+
+from benchmark.datasett import lag_gjeste_csv, lag_gjester
+from gjesteimport import fjern_duplikater, les_csv, les_svarliste
+from gjestelager import GjesteLager
+from skjema import tilpass
+
+# Import av gjestelister fra CSV: lesing i biter, retting av ugyldige verdier og fjerning
+# av gjester som finnes fra før. Og innlimte svarlister, der gjestene finnes på navn.
+
+UGYLDIG_CSV = """Navn,Relasjon,RSVP Status,Antall gjester,Invitert,Spesielle behov
+Ola,Venn brud,Kommer,2,ja,
+ ,Kollega,Kommer,1,ja,
+Kari,Nabo,Kanskje,0,kanskje,Nøtter
+Per,,,,,
+Lise,Kollega,Kommer ikke,100000,nei,
+"""
+
+
+def test_biter_gir_samme_gjester_som_hele_filen():
+    gjester = lag_gjester(1000, np.random.default_rng(4))
+    csv = lag_gjeste_csv(gjester)
+    hele, _ = les_csv(csv)
+    andeler = []
+    biter, rapport = les_csv(csv, chunk_storrelse=128, fremdrift=andeler.append)
+    pd.testing.assert_frame_equal(biter, hele)
+    assert rapport['lest'] == 1000
+    forventet = tilpass(gjester, 'Gjester').drop(columns=['ID'])[list(biter.columns)]
+    pd.testing.assert_frame_equal(biter, forventet)
+    # Fremdriften meldes én gang per bit, stiger og ender på hele filen
+    assert len(andeler) == 8
+    assert andeler == sorted(andeler) and 0 < andeler[0] and andeler[-1] == 1.0
+
+
+def test_ugyldige_rader_rettes_eller_hoppes_over():
+    gjester, rapport = les_csv(UGYLDIG_CSV.encode('utf-8'), chunk_storrelse=2)
+    assert gjester['Navn'].tolist() == ["Ola", "Kari", "Per", "Lise"]
+    assert rapport == {'lest': 5, 'uten_navn': 1, 'antall_rettet': 2, 'invitert_rettet': 1,
+                       'relasjon_rettet': 1, 'status_rettet': 1}
+    assert gjester['Antall gjester'].tolist() == [2, 1, 1, 1]
+    assert gjester['Invitert'].tolist() == [True, True, True, False]
+    assert gjester['Relasjon'].tolist() == ["Venn brud", "Annet", "Annet", "Kollega"]
+    assert gjester['RSVP Status'].tolist() == ["Kommer", "Venter på svar", "Venter på svar", "Kommer ikke"]
+
+
+def test_tom_fil():
+    gjester, rapport = les_csv(b"Navn,Relasjon\n")
+    assert gjester.empty and rapport['lest'] == 0
+    assert fjern_duplikater(gjester, gjester, rapport)[1]['hoppet_over'] == []
+
+
+def test_duplikater():
+    csv = """Navn,Relasjon,Antall gjester,Spesielle behov
+Ola Hansen,Kollega,1,
+ola  hansen,Kollega,1,
+Ola Hansen,Kollega,1,
+Ola Hansen,Kollega,2,Vegetar
+Kari,Familie brud,1,
+Kari,Venn brud,1,
+"""
+    gjester, rapport = les_csv(csv.encode('utf-8'))
+    eksisterende, _ = les_csv(b"Navn,Relasjon\nKARI,Familie brud\n")
+    nye, oppdatert = fjern_duplikater(gjester, eksisterende, rapport)
+    # Bare rader som er like i alle kolonner er duplikater i filen; to med samme navn og
+    # relasjon kan være forskjellige personer. Mot gjestelisten teller navn og relasjon.
+    assert nye['Navn'].tolist() == ["Ola Hansen", "ola  hansen", "Ola Hansen", "Kari"]
+    assert nye['Relasjon'].tolist()[-1] == "Venn brud"
+    assert oppdatert['fantes_fra_før'] == 1
+    assert oppdatert['duplikat_i_filen'] == 1
+    assert oppdatert['hoppet_over'] == ["Ola Hansen", "Kari"]
+    assert oppdatert['lest'] == 6
+    # Rapporten fra les_csv endres ikke, så en ny import fra samme fil teller på nytt
+    assert 'hoppet_over' not in rapport
+
+
+def test_svarliste_med_blandede_skilletegn():
+    tekst = ("Ola Nordmann; Kommer; 2\n"
+             "Kari Nordmann\tnei\n"
+             "\n"
+             "Per, venter\n"
+             "Lise; ja, med følge; 3\n"
+             "Nils;JA;1\n")
+    svar, ugyldige = les_svarliste(tekst)
+    assert svar['Navn'].tolist() == ["Ola Nordmann", "Kari Nordmann", "Per", "Nils"]
+    assert svar['RSVP Status'].tolist() == ["Kommer", "Kommer ikke", "Venter på svar", "Kommer"]
+    assert svar['Antall gjester'].tolist() == [2, pd.NA, pd.NA, 1]
+    # Skilletegnet velges per linje; her er det semikolon, så «ja, med følge» er ikke et svar
+    assert ugyldige == ["Lise; ja, med følge; 3"]
+
+
+def test_svarliste_med_ugyldige_linjer():
+    svar, ugyldige = les_svarliste("; Kommer\nOla; kanskje\nKari; ja; 0\nPer; ja; to\nLise; ja; 2\nrot")
+    assert svar['Navn'].tolist() == ["Lise"]
+    assert ugyldige == ["; Kommer", "Ola; kanskje", "Kari; ja; 0", "Per; ja; to", "rot"]
+    assert les_svarliste("  \n")[0].empty
+
+
+# Navnene i svarlisten som ikke finnes, eller finnes flere ganger, i gjestelisten
+def test_svarliste_med_ukjente_og_flertydige_navn():
+    lager = GjesteLager(tilpass(pd.DataFrame({
+        'ID': [1, 2, 3, 4],
+        'Navn': ["Ola Nordmann", "Kari Nordmann", "Kari  Nordmann", "Åse Li"],
+    }), 'Gjester'))
+    svar, _ = les_svarliste("ola nordmann; ja\nKARI NORDMANN; nei\nAase Li, ja\nIngen Slik; ja")
+    treff = lager.finn_navn(svar['Navn'].tolist())
+    assert treff[0] == [1]
+    assert sorted(treff[1]) == [2, 3]
+    assert treff[2] == [4]
+    assert treff[3] == []
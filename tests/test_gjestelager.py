@@ -0,0 +1,103 @@
+import numpy as np
+import pandas as pd
+
+from gjestelager import GJESTE_KOLONNER, GjesteLager
+from skjema import tilpass
+
+# Gjestelageret sammenlignes med en enkel referanse: en dict ID -> rad i rekkefølgen
+# gjestene ble lagt til. Tilfeldige innsettinger, endringer og slettinger skal gi samme
+# tabell, de samme ID-ene og de samme oppslagene, også etter at lageret er komprimert.
+
+
+def _gjester(antall, rng):
+    return pd.DataFrame({
+        'Navn': [f"Gjest {nummer}" for nummer in rng.integers(0, 10_000, antall)],
+        'Relasjon': rng.choice(["Familie brud", "Venn", "Kollega"], antall),
+        'RSVP Status': rng.choice(["Kommer", "Kommer ikke", "Venter på svar"], antall),
+        'Antall gjester': rng.integers(1, 4, antall),
+    })
+
+
+def _sjekk(lager, referanse):
+    assert len(lager) == len(referanse)
+    assert lager.ider() == list(referanse)
+    forventet = tilpass(pd.DataFrame(list(referanse.values()), columns=GJESTE_KOLONNER), 'Gjester')
+    pd.testing.assert_frame_equal(lager.tabell().reset_index(drop=True), forventet)
+    for gjest_id, rad in referanse.items():
+        assert gjest_id in lager
+        assert lager.rad(gjest_id) == rad
+        assert gjest_id in lager.ider_for_navn(rad['Navn'])
+
+
+def test_tilfeldige_endringer_som_referansen():
+    rng = np.random.default_rng(1)
+    lager = GjesteLager(_gjester(200, rng))
+    referanse = {gjest_id: lager.rad(gjest_id) for gjest_id in lager.ider()}
+    _sjekk(lager, referanse)
+    brukte = set(referanse)
+    for steg in range(300):
+        valg = rng.random()
+        if valg < 0.3 or not referanse:
+            gjest_id = lager.legg_til({'Navn': f"Gjest {steg}", 'Antall gjester': int(rng.integers(1, 4))})
+            assert gjest_id not in brukte
+            referanse[gjest_id] = lager.rad(gjest_id)
+        elif valg < 0.4:
+            før = set(lager.ider())
+            lager.legg_til_tabell(_gjester(int(rng.integers(1, 20)), rng))
+            for gjest_id in lager.ider():
+                if gjest_id not in før:
+                    assert gjest_id not in brukte
+                    referanse[gjest_id] = lager.rad(gjest_id)
+        elif valg < 0.7:
+            gjest_id = int(rng.choice(list(referanse)))
+            endringer = {'RSVP Status': "Kommer", 'Navn': f"Endret {steg}"}
+            lager.oppdater(gjest_id, endringer)
+            referanse[gjest_id] = dict(referanse[gjest_id], **endringer)
+        else:
+            gjest_id = int(rng.choice(list(referanse)))
+            lager.slett(gjest_id)
+            del referanse[gjest_id]
+            assert gjest_id not in lager
+        brukte.update(referanse)
+        if steg % 50 == 0:
+            _sjekk(lager, referanse)
+    _sjekk(lager, referanse)
+
+
+def test_komprimering_beholder_ider():
+    lager = GjesteLager(pd.DataFrame({'Navn': [f"Gjest {nummer}" for nummer in range(10)]}))
+    for gjest_id in range(1, 7):
+        lager.slett(gjest_id)
+    # Mer enn halvparten er slettet, så lageret er komprimert
+    assert lager._antall_rader() == 4
+    assert lager.ider() == [7, 8, 9, 10]
+    assert [lager.navn(gjest_id) for gjest_id in lager.ider()] == ["Gjest 6", "Gjest 7", "Gjest 8", "Gjest 9"]
+    assert lager.legg_til({'Navn': "Ny"}) == 11
+
+
+def test_ider_fra_fil_beholdes_når_de_er_ledige():
+    lager = GjesteLager(pd.DataFrame({'ID': [5, 5, None, -1], 'Navn': ["A", "B", "C", "D"]}))
+    assert lager.ider() == [5, 6, 7, 8]
+    lager.legg_til_tabell(pd.DataFrame({'ID': [2, 6], 'Navn': ["E", "F"]}))
+    assert lager.ider() == [5, 6, 7, 8, 2, 9]
+
+
+def test_samme_navn_holdes_fra_hverandre():
+    lager = GjesteLager(pd.DataFrame({'Navn': ["Ola Hansen", "Ola Hansen", "Kari"]}))
+    assert lager.ider_for_navn("Ola Hansen") == [1, 2]
+    lager.oppdater(1, {'Navn': "Kari"})
+    assert lager.ider_for_navn("Ola Hansen") == [2]
+    assert lager.ider_for_navn("Kari") == [3, 1]
+
+
+def test_forskjeller_og_oppdater_mange():
+    rng = np.random.default_rng(2)
+    lager = GjesteLager(_gjester(100, rng))
+    før = lager.tabell().reset_index(drop=True)
+    redigert = pd.DataFrame({'ID': før['ID'], 'RSVP Status': ["Kommer"] * len(før)})
+    endret = lager.forskjeller(redigert)
+    assert sorted(endret['ID']) == sorted(før.loc[før['RSVP Status'] != "Kommer", 'ID'])
+    gamle = lager.oppdater_mange(endret)
+    assert gamle['RSVP Status'].tolist() == før.set_index('ID').loc[endret['ID'], 'RSVP Status'].tolist()
+    assert (lager.tabell()['RSVP Status'] == "Kommer").all()
+    assert len(lager.forskjeller(redigert)) == 0
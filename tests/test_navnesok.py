@@ -0,0 +1,69 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from gjestelager import GjesteLager
+from navnesok import normaliser
+
+# Navnesøket (trigramindeksen og bitmappene for filtrene) sammenlignes med et søk som
+# går gjennom alle gjestene: navnet skal inneholde søketeksten, med aa og å regnet som
+# like og uten forskjell på store og små bokstaver.
+
+FORNAVN = ["Ola", "Kari", "Aase", "Åse", "Søren", "Ærlend", "Håkon", "Haakon", "Björn", "Mäja"]
+ETTERNAVN = ["Hansen", "Olsen", "Aasen", "Ødegård", "Nilsen", "Bræk", "Sæther"]
+
+
+def _gjester(antall, rng):
+    return pd.DataFrame({
+        'Navn': [f"{fornavn} {etternavn}" for fornavn, etternavn in zip(rng.choice(FORNAVN, antall), rng.choice(ETTERNAVN, antall))],
+        'Relasjon': rng.choice(["Familie brud", "Venn", "Kollega", "Annet"], antall),
+        'RSVP Status': rng.choice(["Kommer", "Kommer ikke", "Venter på svar"], antall),
+        'Antall gjester': rng.integers(1, 4, antall),
+    })
+
+
+def _brute_force(tabell, tekst, filtre):
+    søk = normaliser(tekst)
+    varianter = {søk, søk.replace('aa', 'å'), søk.replace('å', 'aa')}
+    passer = tabell['Navn'].map(lambda navn: any(variant in normaliser(navn) for variant in varianter))
+    for kolonne, verdi in filtre.items():
+        passer &= tabell[kolonne] == verdi
+    return tabell.loc[passer.to_numpy(dtype=bool), 'ID'].tolist()
+
+
+SØK = ["", "o", "ol", "ola", "OLA HAN", "aase", "åse", "Aa", "å", "sø", "ærl", "sen", "ødegård", "björn", "x", "zzz"]
+FILTRE = [{}, {'RSVP Status': "Kommer"}, {'Relasjon': "Kollega"}, {'RSVP Status': "Kommer ikke", 'Relasjon': "Annet"}]
+
+
+@pytest.fixture(scope="module")
+def lager():
+    return GjesteLager(_gjester(500, np.random.default_rng(3)))
+
+
+@pytest.mark.parametrize("tekst", SØK)
+@pytest.mark.parametrize("filtre", FILTRE)
+def test_søk_som_gjennomgang(lager, tekst, filtre):
+    assert lager.utvalg(tekst, filtre)['ID'].tolist() == _brute_force(lager.tabell(), tekst, filtre)
+
+
+# Indeksen følger med når gjester endres, slettes og lageret komprimeres
+def test_søk_etter_endringer():
+    rng = np.random.default_rng(4)
+    lager = GjesteLager(_gjester(300, rng))
+    ider = lager.ider()
+    for gjest_id in ider[:100]:
+        lager.oppdater(gjest_id, {'Navn': "Åsmund Aasen", 'RSVP Status': "Kommer"})
+    for gjest_id in ider[100:260]:
+        lager.slett(gjest_id)
+    lager.oppdater_mange(lager.forskjeller(pd.DataFrame({'ID': ider[260:], 'Relasjon': "Kollega"})))
+    lager.legg_til({'Navn': "Aase Ødegård", 'Relasjon': "Kollega"})
+    for tekst in SØK + ["åsmund", "aasmund", "aasen"]:
+        for filtre in FILTRE:
+            assert lager.utvalg(tekst, filtre)['ID'].tolist() == _brute_force(lager.tabell(), tekst, filtre)
+
+
+def test_aa_og_å_finner_hverandre():
+    lager = GjesteLager(pd.DataFrame({'Navn': ["Aase Hansen", "Åse Olsen", "Kari Nilsen"]}))
+    assert lager.utvalg("åse")['Navn'].tolist() == ["Aase Hansen", "Åse Olsen"]
+    assert lager.utvalg("AASE")['Navn'].tolist() == ["Aase Hansen", "Åse Olsen"]
+    assert lager.finn_navn(["aase  hansen", "ÅSE OLSEN", "Per"]) == [[1], [2], []]
@@ -0,0 +1,133 @@
+import numpy as np
+import pandas as pd
+
+from benchmark.datasett import BRYLLUPSDAG, lag_budsjett, lag_posteringer
+from gjestelager import GjesteLager
+from nokkeltall import BudsjettTall, GjesteTall, åpningsposteringer
+from skjema import tilpass
+
+# Nøkkeltallene sammenlignes med tall regnet ut fra hele tabellen: gjestetallene etter
+# hver endring, og budsjettallene med en løkke over posteringene.
+
+STATUSER = ["Kommer", "Kommer ikke", "Venter på svar"]
+RELASJONER = ["Familie brud", "Familie brudgom", "Venn", "Kollega", "Annet"]
+
+
+def _gjester(antall, rng):
+    return pd.DataFrame({
+        'Navn': [f"Gjest {nummer}" for nummer in range(antall)],
+        'Relasjon': rng.choice(RELASJONER, antall),
+        'RSVP Status': rng.choice(STATUSER, antall),
+        'Antall gjester': rng.integers(1, 5, antall),
+    })
+
+
+def _sjekk_gjestetall(tall, tabell):
+    assert tall.antall_gjester == tabell['Antall gjester'].sum()
+    for kolonne, per_verdi in [('RSVP Status', tall.per_status), ('Relasjon', tall.per_relasjon)]:
+        forventet = tabell.groupby(kolonne)['Antall gjester'].sum()
+        assert {verdi: antall for verdi, antall in per_verdi.items() if antall} == {verdi: antall for verdi, antall in forventet.items() if antall}
+
+
+def test_gjestetall_følger_endringene():
+    rng = np.random.default_rng(5)
+    tabell = _gjester(200, rng)
+    tall = GjesteTall.fra_tabell(tabell)
+    _sjekk_gjestetall(tall, tabell)
+    for _ in range(300):
+        posisjon = int(rng.integers(len(tabell)))
+        valg = rng.random()
+        if valg < 0.4:
+            gammel = tabell.loc[posisjon].to_dict()
+            tabell.loc[posisjon, 'RSVP Status'] = rng.choice(STATUSER)
+            tabell.loc[posisjon, 'Antall gjester'] = int(rng.integers(1, 5))
+            tall.endre(gammel, tabell.loc[posisjon].to_dict())
+        elif valg < 0.7:
+            tall.fjern(tabell.loc[posisjon].to_dict())
+            tabell = tabell.drop(index=posisjon).reset_index(drop=True)
+        else:
+            rad = {'Navn': "Ny", 'Relasjon': rng.choice(RELASJONER), 'RSVP Status': rng.choice(STATUSER), 'Antall gjester': int(rng.integers(1, 5))}
+            tall.legg_til(rad)
+            tabell = pd.concat([tabell, pd.DataFrame([rad])], ignore_index=True)
+    nye = _gjester(30, rng)
+    tall.legg_til_tabell(nye)
+    _sjekk_gjestetall(tall, pd.concat([tabell, nye], ignore_index=True))
+
+
+# Gjestetallene i lageret etter enkeltendringer og masseendring
+def test_gjestetall_i_lageret():
+    rng = np.random.default_rng(7)
+    lager = GjesteLager(_gjester(200, rng))
+    ider = lager.ider()
+    for gjest_id in ider[:40]:
+        lager.oppdater(gjest_id, {'RSVP Status': "Kommer", 'Antall gjester': int(rng.integers(1, 5))})
+    for gjest_id in ider[40:80]:
+        lager.slett(gjest_id)
+    lager.legg_til({'Navn': "Ny", 'Antall gjester': 3, 'RSVP Status': "Kommer ikke"})
+    _sjekk_gjestetall(lager.tall, lager.tabell())
+    lager.oppdater_mange(lager.forskjeller(pd.DataFrame({'ID': ider[80:], 'RSVP Status': "Venter på svar"})))
+    _sjekk_gjestetall(lager.tall, lager.tabell())
+
+
+# Tomme celler og tekst i Antall gjester teller som 0
+def test_gjestetall_med_tomme_celler():
+    tabell = pd.DataFrame({'RSVP Status': ["Kommer", "Kommer", "Kommer ikke"], 'Relasjon': ["Venn", "Venn", "Annet"], 'Antall gjester': [2, None, "to"]})
+    tall = GjesteTall.fra_tabell(tabell)
+    assert tall.antall_gjester == 2
+    assert tall.status("Kommer") == 2
+    assert tall.status("Venter på svar") == 0
+
+
+def _budsjett_og_posteringer(antall, frø):
+    rng = np.random.default_rng(frø)
+    budsjett = tilpass(lag_budsjett(antall, rng), 'Budsjett')
+    posteringer = tilpass(lag_posteringer(antall * 5, rng), 'Posteringer')
+    # Noen posteringer uten dato og én kategori som ikke er i budsjettet
+    posteringer.loc[posteringer.index[::7], 'Dato'] = pd.NaT
+    posteringer.loc[posteringer.index[0], 'Kategori'] = "Ukjent"
+    return budsjett, posteringer
+
+
+def test_budsjettall_som_løkke():
+    budsjett, posteringer = _budsjett_og_posteringer(12, 6)
+    tall = BudsjettTall(budsjett, posteringer)
+    summer = {}
+    for rad in posteringer.itertuples(index=False):
+        kolonne = 'Faktisk' if rad.Type == "Faktura" else 'Betalt'
+        summer.setdefault(rad.Kategori, {'Faktisk': 0, 'Betalt': 0})[kolonne] += rad.Beløp
+    budsjettert = dict(zip(budsjett['Kategori'], budsjett['Budsjettert']))
+    kategorier = list(budsjett['Kategori']) + sorted(set(summer) - set(budsjettert))
+    assert tall.tabell.index.tolist() == kategorier
+    for kategori in kategorier:
+        faktisk = summer.get(kategori, {}).get('Faktisk', 0)
+        betalt = summer.get(kategori, {}).get('Betalt', 0)
+        rad = tall.tabell.loc[kategori]
+        assert rad.tolist() == [budsjettert.get(kategori, 0), faktisk, betalt, faktisk - betalt, budsjettert.get(kategori, 0) - faktisk]
+        assert tall.per_kategori[kategori] == {'Budsjettert': budsjettert.get(kategori, 0), 'Faktisk': faktisk, 'Betalt': betalt}
+    assert tall.totalt == {kolonne: int(tall.tabell[kolonne].sum()) for kolonne in tall.tabell.columns}
+    assert tall.budsjett['Faktisk'].tolist() == [summer.get(kategori, {}).get('Faktisk', 0) for kategori in budsjett['Kategori']]
+
+
+def test_forløp_er_summen_til_og_med_hver_dag():
+    budsjett, posteringer = _budsjett_og_posteringer(12, 7)
+    forløp = BudsjettTall(budsjett, posteringer).forløp()
+    datert = posteringer[posteringer['Dato'].notna()]
+    assert forløp.index.tolist() == sorted(datert['Dato'].dt.normalize().unique())
+    for dag in [forløp.index[0], forløp.index[len(forløp) // 2], forløp.index[-1]]:
+        til_og_med = datert[datert['Dato'] <= dag]
+        assert forløp.loc[dag, 'Faktisk'] == til_og_med.loc[til_og_med['Type'] == "Faktura", 'Beløp'].sum()
+        assert forløp.loc[dag, 'Betalt'] == til_og_med.loc[til_og_med['Type'] == "Betaling", 'Beløp'].sum()
+    assert forløp.index.max() <= BRYLLUPSDAG
+
+
+def test_åpningsposteringer_gir_samme_summer():
+    budsjett = tilpass(lag_budsjett(12, np.random.default_rng(8)), 'Budsjett')
+    tall = BudsjettTall(budsjett, åpningsposteringer(budsjett))
+    assert tall.budsjett[['Faktisk', 'Betalt']].equals(budsjett[['Faktisk', 'Betalt']])
+
+
+def test_tomme_posteringer():
+    budsjett = tilpass(pd.DataFrame({'Kategori': ["Lokale"], 'Budsjettert': [1000]}), 'Budsjett')
+    tall = BudsjettTall(budsjett, tilpass(pd.DataFrame(), 'Posteringer'))
+    assert tall.totalt == {'Budsjettert': 1000, 'Faktisk': 0, 'Betalt': 0, 'Gjenstående': 0, 'Avvik': 1000}
+    assert tall.forløp().empty
@@ -0,0 +1,59 @@
+import datetime
+
+import numpy as np
+import pandas as pd
+
+from benchmark.datasett import BRYLLUPSDAG, lag_oppgaver
+from oppgaver import FERDIG, OppgaveLager
+from skjema import PRIORITETER
+
+# Fristindeksen i oppgavelageret sammenlignes med en gjennomgang av alle oppgavene,
+# sortert på frist, prioritet og ID, etter tilfeldige endringer.
+
+
+def _åpne_sortert(lager, ansvarlig=None):
+    rader = [lager.rad(oppgave_id) for oppgave_id in lager.tabell()['ID']]
+    åpne = [rad for rad in rader if rad['Status'] != FERDIG and (ansvarlig is None or rad['Ansvarlig'] == ansvarlig)]
+    return sorted(åpne, key=lambda rad: (
+        datetime.date.max if pd.isna(rad['Frist']) else rad['Frist'].date(),
+        PRIORITETER.index(rad['Prioritet']),
+        rad['ID'],
+    ))
+
+
+def _sjekk(lager, idag):
+    åpne = _åpne_sortert(lager)
+    frister = [None if pd.isna(rad['Frist']) else rad['Frist'].date() for rad in åpne]
+    forfalt = [rad['ID'] for rad, frist in zip(åpne, frister) if frist is not None and frist < idag]
+    snart = [rad['ID'] for rad, frist in zip(åpne, frister) if frist is not None and idag <= frist <= idag + datetime.timedelta(days=7)]
+    assert lager.forfalt(idag) == forfalt
+    assert lager.forfalt(idag, 3) == forfalt[:3]
+    assert lager.frist_innen(idag, 7) == snart
+    tall = lager.tall(idag, 7)
+    assert (tall.åpne, tall.forfalt, tall.snart) == (len(åpne), len(forfalt), len(snart))
+    assert tall.ferdige == int((lager.tabell()['Status'] == FERDIG).sum())
+    assert lager.ansvarlige() == sorted({rad['Ansvarlig'] for rad in åpne} - {""})
+    for ansvarlig in lager.ansvarlige() + [""]:
+        assert lager.neste_for(ansvarlig, 4) == [rad['ID'] for rad in _åpne_sortert(lager, ansvarlig)[:4]]
+
+
+def test_frister_som_gjennomgang():
+    rng = np.random.default_rng(9)
+    oppgaver = lag_oppgaver(300, rng)
+    oppgaver.loc[oppgaver.index[::11], 'Frist'] = None
+    oppgaver.loc[oppgaver.index[::13], 'Ansvarlig'] = ""
+    lager = OppgaveLager(oppgaver)
+    idag = (BRYLLUPSDAG - datetime.timedelta(days=182)).date()
+    _sjekk(lager, idag)
+    ider = list(lager.tabell()['ID'])
+    for steg, oppgave_id in enumerate(ider[:120]):
+        if steg % 3 == 0:
+            lager.slett(oppgave_id)
+        elif steg % 3 == 1:
+            lager.oppdater(oppgave_id, {'Status': FERDIG if steg % 2 else "Pågår", 'Ansvarlig': "Forlover"})
+        else:
+            lager.oppdater(oppgave_id, {'Frist': BRYLLUPSDAG - datetime.timedelta(days=int(rng.integers(0, 365))), 'Prioritet': "Høy"})
+    nye = [lager.legg_til({'Oppgave': f"Ny {nummer}", 'Frist': BRYLLUPSDAG, 'Ansvarlig': "Brud"}) for nummer in range(5)]
+    assert not set(nye) & set(ider)
+    _sjekk(lager, idag)
+    _sjekk(lager, BRYLLUPSDAG.date())
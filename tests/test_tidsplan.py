@@ -0,0 +1,83 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from benchmark.datasett import BRYLLUPSDAG, lag_tidsplan
+from skjema import tilpass
+from tidsplan import STANDARD_VARIGHET, Tidsindeks, tildel_ider
+
+# Tidsindeksen sammenlignes med en gjennomgang av alle aktivitetene. Tidene ligger på
+# hele fem minutter, så mange aktiviteter starter eller slutter akkurat når en annen
+# gjør det.
+
+
+@pytest.fixture(scope="module")
+def tidsplan():
+    rng = np.random.default_rng(10)
+    tidsplan = tilpass(lag_tidsplan(400, rng), 'Tidsplan')
+    tidsplan['Tid'] = BRYLLUPSDAG + pd.to_timedelta(rng.integers(0, 12 * 12, len(tidsplan)) * 5, unit='min')
+    tidsplan['Slutt'] = tidsplan['Tid'] + pd.to_timedelta(rng.integers(-2, 24, len(tidsplan)) * 5, unit='min')
+    # Noen uten tid, og noen uten slutt
+    tidsplan.loc[tidsplan.index[::13], 'Tid'] = pd.NaT
+    tidsplan.loc[tidsplan.index[::7], 'Slutt'] = pd.NaT
+    return tilpass(tidsplan, 'Tidsplan')
+
+
+# Aktivitetene med tid og utregnet slutt, etter start (stabilt)
+def _planlagt(tidsplan):
+    planlagt = tidsplan[tidsplan['Tid'].notna()].copy()
+    ugyldig = ~(planlagt['Slutt'] > planlagt['Tid'])
+    planlagt.loc[ugyldig, 'Slutt'] = planlagt.loc[ugyldig, 'Tid'] + STANDARD_VARIGHET
+    return planlagt.sort_values('Tid', kind='stable')
+
+
+def _tidspunkter():
+    return [BRYLLUPSDAG + pd.Timedelta(minutes=minutter) for minutter in range(-30, 13 * 60, 25)]
+
+
+def test_pågår_som_gjennomgang(tidsplan):
+    indeks = Tidsindeks(tidsplan)
+    planlagt = _planlagt(tidsplan)
+    assert len(indeks) == len(planlagt)
+    for tid in _tidspunkter():
+        forventet = planlagt[(planlagt['Tid'] <= tid) & (planlagt['Slutt'] > tid)]
+        assert indeks.pågår(tid)['ID'].tolist() == forventet['ID'].tolist()
+
+
+def test_overlapper_som_gjennomgang(tidsplan):
+    indeks = Tidsindeks(tidsplan)
+    planlagt = _planlagt(tidsplan)
+    for fra in _tidspunkter():
+        for lengde in [pd.Timedelta(0), pd.Timedelta(minutes=5), pd.Timedelta(hours=2)]:
+            til = fra + lengde
+            forventet = planlagt[(planlagt['Tid'] < til) & (planlagt['Slutt'] > fra)]
+            assert indeks.overlapper(fra, til)['ID'].tolist() == forventet['ID'].tolist()
+
+
+@pytest.mark.parametrize("kolonne", ["Sted", "Ansvarlig"])
+def test_konflikter_som_gjennomgang(tidsplan, kolonne):
+    planlagt = _planlagt(tidsplan)
+    # Hver aktivitet som starter før en tidligere i gruppen er slutt, sammen med den
+    # første av de tidligere som slutter sist
+    forventet = []
+    for verdi, gruppe in planlagt[planlagt[kolonne] != ""].groupby(kolonne, sort=True):
+        rader = list(gruppe.itertuples(index=False))
+        for nummer, rad in enumerate(rader):
+            tidligere = rader[:nummer]
+            if tidligere and any(annen.Slutt > rad.Tid for annen in tidligere):
+                senest = max(tidligere, key=lambda annen: annen.Slutt)
+                forventet.append((verdi, rad.ID, senest.ID))
+    konflikter = Tidsindeks(tidsplan).konflikter(kolonne)
+    assert list(zip(konflikter[kolonne], konflikter['ID'], konflikter['Overlapper med ID'])) == forventet
+
+
+def test_tom_tidsplan():
+    indeks = Tidsindeks(tilpass(pd.DataFrame(), 'Tidsplan'))
+    assert len(indeks) == 0
+    assert indeks.pågår(BRYLLUPSDAG).empty
+    assert indeks.konflikter("Sted").empty
+
+
+def test_tildel_ider():
+    tidsplan = tilpass(pd.DataFrame({'ID': [3, None, 3, -1], 'Aktivitet': ["A", "B", "C", "D"]}), 'Tidsplan')
+    assert tildel_ider(tidsplan)['ID'].tolist() == [3, 4, 5, 6]
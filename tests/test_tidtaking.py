@@ -0,0 +1,75 @@
+import os
+import pstats
+import time
+import tracemalloc
+
+import pytest
+
+import tidtaking
+from tidtaking import Kjøring
+
+# Tidtakingen av seksjonene: spenn inni hverandre, minnemålingen som deles av øktene i
+# prosessen, og filene som skrives med BRYLLUP_PROFIL.
+
+
+@pytest.fixture(autouse=True)
+def uten_måling():
+    assert not tracemalloc.is_tracing()
+    yield
+    assert tidtaking._målere == 0
+    assert not tracemalloc.is_tracing()
+
+
+def test_spenn_inni_hverandre():
+    kjøring = Kjøring("Oversikt", mål_minne=True)
+    with kjøring.spenn("Ytre"):
+        with kjøring.spenn("Indre"):
+            liste = [0] * 1_000_000
+            time.sleep(0.01)
+        del liste
+        with kjøring.spenn("Indre"):
+            time.sleep(0.01)
+    kjøring.avslutt()
+    assert kjøring.spenn_tider["Indre"] >= 0.02
+    assert kjøring.spenn_tider["Ytre"] >= kjøring.spenn_tider["Indre"]
+    assert kjøring.totalt >= kjøring.spenn_tider["Ytre"]
+    # Lista er frigjort igjen, men toppen er med i begge spennene
+    assert kjøring.allokert["Indre"] >= 8_000_000
+    assert kjøring.allokert["Ytre"] >= kjøring.allokert["Indre"]
+
+
+# To økter som måler samtidig: den ene stopper ikke målingen eller nullstiller toppen for
+# den andre
+def test_minnemålingen_deles_av_øktene():
+    første = Kjøring("A", mål_minne=True)
+    with første.spenn("Stor"):
+        liste = [0] * 1_000_000
+        del liste
+        andre = Kjøring("B", mål_minne=True)
+        with andre.spenn("Liten"):
+            pass
+        andre.avslutt()
+        assert tracemalloc.is_tracing()
+    første.avslutt()
+    assert første.allokert["Stor"] >= 8_000_000
+    assert andre.allokert["Liten"] < 1_000_000
+
+
+# En kjøring som aldri ble avsluttet, teller ikke lenger når den er borte
+def test_glemt_kjøring_slutter_å_måle():
+    kjøring = Kjøring("A", mål_minne=True)
+    assert tracemalloc.is_tracing()
+    del kjøring
+    assert not tracemalloc.is_tracing()
+
+
+def test_profilfiler(tmp_path):
+    kjøring = Kjøring("Oversikt: Budsjett/../ølbrygg", profilmappe=str(tmp_path))
+    with kjøring.spenn("Seksjon"):
+        sum(range(1000))
+    kjøring.avslutt()
+    filer = sorted(os.listdir(tmp_path))
+    assert [os.path.splitext(fil)[1] for fil in filer] == [".minne", ".prof"]
+    assert all(fil.endswith("-Oversikt_Budsjett_ølbrygg" + os.path.splitext(fil)[1]) for fil in filer)
+    assert pstats.Stats(str(tmp_path / filer[1])).total_calls > 0
+    assert tracemalloc.Snapshot.load(str(tmp_path / filer[0])).traces
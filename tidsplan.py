@@ -0,0 +1,87 @@
+import numpy as np
+import pandas as pd
+
+# Tidsplanen for bryllupsdagen som intervaller.
+# Hver aktivitet varer fra Tid til Slutt, eller STANDARD_VARIGHET når Slutt mangler eller
+# ikke er etter Tid. Aktiviteter uten tid er ikke med i planen.
+# Tidsindeksen bygges én gang per utgave av tabellen og huskes til tabellen endres.
+# Intervallene sorteres etter start, og for hver posisjon huskes den seneste slutten så
+# langt, som dermed aldri synker. "Hva skjer klokka T" og "hva overlapper dette
+# tidsrommet" blir da to binærsøk og en sjekk av vinduet mellom dem, i stedet for en
+# gjennomgang av hele planen. Aktiviteter som overlapper på samme sted eller med samme
+# ansvarlig, finnes med én stabil sortering og én gjennomgang per gruppe (O(n log n)).
+
+STANDARD_VARIGHET = pd.Timedelta(minutes=30)
+
+
+# Gir aktiviteter uten gyldig ID (f.eks. fra en Excel-fil eller en eldre database) en ny,
+# ubrukt ID. tidsplan er tilpasset skjemaet. Brukes også for posteringene.
+def tildel_ider(tidsplan):
+    ider = tidsplan['ID']
+    ugyldig = ider.isna() | (ider < 1) | ider.duplicated()
+    if not ugyldig.any():
+        return tidsplan
+    neste = int(ider[~ugyldig].max()) + 1 if (~ugyldig).any() else 1
+    nye = ider.copy()
+    nye[ugyldig] = np.arange(neste, neste + int(ugyldig.sum()))
+    return tidsplan.assign(ID=nye)
+
+
+def _tidspunkt(tid):
+    return np.datetime64(pd.Timestamp(tid), 'ns')
+
+
+class Tidsindeks:
+    def __init__(self, tidsplan):
+        planlagt = tidsplan[tidsplan['Tid'].notna()]
+        slutt = planlagt['Slutt'].where(planlagt['Slutt'] > planlagt['Tid'], planlagt['Tid'] + STANDARD_VARIGHET)
+        # Aktivitetene med utregnet slutt, sortert etter start
+        self.aktiviteter = planlagt.assign(Slutt=slutt).sort_values('Tid', kind='stable').reset_index(drop=True)
+        self._start = self.aktiviteter['Tid'].to_numpy()
+        self._slutt = self.aktiviteter['Slutt'].to_numpy()
+        self._senest = np.maximum.accumulate(self._slutt) if len(self._slutt) else self._slutt
+        self._konflikter = {}
+
+    def __len__(self):
+        return len(self.aktiviteter)
+
+    # Posisjonene til aktivitetene som har startet ved til (eller før, med
+    # side='left') og ikke er slutt ved fra
+    def _vindu(self, fra, til, side):
+        slutt = np.searchsorted(self._start, _tidspunkt(til), side=side)
+        start = np.searchsorted(self._senest, _tidspunkt(fra), side='right')
+        posisjoner = np.arange(start, max(start, slutt))
+        return posisjoner[self._slutt[posisjoner] > _tidspunkt(fra)]
+
+    # Aktivitetene som pågår på tidspunktet, etter start
+    def pågår(self, tid):
+        return self.aktiviteter.take(self._vindu(tid, tid, 'right'))
+
+    # Aktivitetene som overlapper tidsrommet [fra, til), etter start
+    def overlapper(self, fra, til):
+        return self.aktiviteter.take(self._vindu(fra, til, 'left'))
+
+    # Par av aktiviteter som overlapper med samme verdi i kolonnen (Sted eller Ansvarlig;
+    # tomme verdier teller ikke). Hver aktivitet som starter før en tidligere aktivitet i
+    # gruppen er slutt, er med én gang, sammen med den av de tidligere som slutter sist.
+    def konflikter(self, kolonne):
+        if kolonne not in self._konflikter:
+            aktiviteter = self.aktiviteter[self.aktiviteter[kolonne] != ""]
+            # Aktivitetene er allerede sortert etter start, så en stabil sortering på
+            # kolonnen gir dem etter start innen hver gruppe
+            sortert = aktiviteter.sort_values(kolonne, kind='stable')
+            par = []
+            forrige_verdi, senest = None, None
+            for rad in sortert.itertuples(index=False):
+                verdi = getattr(rad, kolonne)
+                if verdi != forrige_verdi:
+                    forrige_verdi, senest = verdi, None
+                if senest is not None and rad.Tid < senest.Slutt:
+                    par.append((verdi, rad.ID, rad.Aktivitet, rad.Tid, rad.Slutt, senest.ID, senest.Aktivitet, senest.Tid, senest.Slutt))
+                if senest is None or rad.Slutt > senest.Slutt:
+                    senest = rad
+            self._konflikter[kolonne] = pd.DataFrame(par, columns=[
+                kolonne, 'ID', 'Aktivitet', 'Tid', 'Slutt',
+                'Overlapper med ID', 'Overlapper med', 'Fra', 'Til',
+            ])
+        return self._konflikter[kolonne]
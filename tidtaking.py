@@ -0,0 +1,153 @@
+import cProfile
+import collections
+import contextlib
+import datetime
+import os
+import re
+import threading
+import time
+import tracemalloc
+import weakref
+
+# Tidtaking av seksjonene i appen.
+# Hver kjøring av skriptet får en Kjøring, og hver del av en side pakkes inn i et
+# navngitt spenn (kjøring.spenn("...")). For hvert spenn måles veggtid, og når
+# minnemåling er slått på også hvor mye minne som ble allokert (toppen i tracemalloc).
+# De siste kjøringene ligger i økten og vises i ytelsespanelet i sidefeltet.
+# tracemalloc er felles for hele prosessen, mens hver økt slår minnemålingen av og på for
+# seg. Antall kjøringer som måler minne telles derfor for prosessen: tracemalloc startes
+# av den første og stoppes når den siste er avsluttet (eller er borte fra historikken).
+# Toppen nullstilles bare når ingen andre kjøringer måler minne; ellers ville de andre
+# miste sin. Et spenn som startet mens andre målte, får bare økningen i minnet fra start
+# til slutt.
+#
+# Med miljøvariabelen BRYLLUP_PROFIL satt til en mappe skrives i tillegg en
+# cProfile-fil (.prof, les med pstats eller snakeviz) og et tracemalloc-øyeblikksbilde
+# (.minne, les med tracemalloc.Snapshot.load) for hver kjøring, uten endringer i koden.
+
+HISTORIKK_ANTALL = 10
+PROFIL_MAPPE = os.environ.get("BRYLLUP_PROFIL")
+
+_lås = threading.Lock()
+_målere = 0
+
+
+def _begynn_å_måle():
+    global _målere
+    with _lås:
+        _målere += 1
+        if not tracemalloc.is_tracing():
+            tracemalloc.start()
+
+
+def _slutt_å_måle():
+    global _målere
+    with _lås:
+        _målere -= 1
+        if _målere == 0:
+            tracemalloc.stop()
+
+
+# Nullstiller toppen hvis ingen andre måler. Gir om den ble nullstilt.
+def _nullstill_topp():
+    with _lås:
+        if _målere != 1:
+            return False
+        tracemalloc.reset_peak()
+        return True
+
+
+class Kjøring:
+    def __init__(self, navn, mål_minne=False, profilmappe=None):
+        self.navn = navn
+        self.tidspunkt = datetime.datetime.now()
+        self.spenn_tider = {}
+        self.allokert = {}
+        self.mål_minne = mål_minne or profilmappe is not None
+        self.profilmappe = profilmappe
+        self._profil = None
+        self._åpne = []
+        self._start = time.perf_counter()
+        self.totalt = None
+        self._slutt_å_måle = None
+        if self.mål_minne:
+            _begynn_å_måle()
+            # Kalles fra avslutt, eller når kjøringen er borte uten å ha blitt avsluttet
+            self._slutt_å_måle = weakref.finalize(self, _slutt_å_måle)
+        if profilmappe is not None:
+            self._profil = cProfile.Profile()
+            try:
+                self._profil.enable()
+            except ValueError:
+                # En annen profilering kjører allerede i prosessen (en annen økt)
+                self._profil = None
+
+    # Måler det som kjøres i with-blokken. Spenn med samme navn i samme kjøring legges
+    # sammen. Spenn kan ligge inni hverandre; det ytre spennet får da med seg det indre.
+    @contextlib.contextmanager
+    def spenn(self, navn):
+        if self.mål_minne:
+            nå, topp = tracemalloc.get_traced_memory()
+            # Toppen nullstilles for det nye spennet, så de åpne spennene husker sin egen
+            for åpent in self._åpne:
+                åpent[1] = max(åpent[1], topp)
+            self._åpne.append([nå, nå, _nullstill_topp()])
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.spenn_tider[navn] = self.spenn_tider.get(navn, 0.0) + time.perf_counter() - start
+            if self.mål_minne:
+                før, tidligere_topp, egen_topp = self._åpne.pop()
+                nå, topp = tracemalloc.get_traced_memory()
+                allokert = max(tidligere_topp, topp, før) - før if egen_topp else max(nå - før, 0)
+                self.allokert[navn] = max(self.allokert.get(navn, 0), allokert)
+
+    def avslutt(self):
+        if self.totalt is not None:
+            return
+        self.totalt = time.perf_counter() - self._start
+        if self.profilmappe is not None:
+            self._skriv_profil()
+        if self._slutt_å_måle is not None:
+            self._slutt_å_måle()
+
+    # Navnet på kjøringen kommer fra sidene og seksjonene, så alt annet enn bokstaver, tall,
+    # _ og - byttes ut før det brukes i filnavnet.
+    def _skriv_profil(self):
+        os.makedirs(self.profilmappe, exist_ok=True)
+        navn = re.sub(r"[^\w-]+", "_", self.navn)
+        filnavn = os.path.join(self.profilmappe, f"{self.tidspunkt:%Y%m%d-%H%M%S-%f}-{navn}")
+        if self._profil is not None:
+            self._profil.disable()
+            self._profil.dump_stats(filnavn + ".prof")
+        if tracemalloc.is_tracing():
+            tracemalloc.take_snapshot().dump(filnavn + ".minne")
+
+
+# Starter tidtakingen for en ny kjøring og legger den i historikken i økten.
+# En kjøring som ble avbrutt (f.eks. av st.rerun) avsluttes her.
+def start_kjøring(session_state, navn, mål_minne=False):
+    historikk = session_state.setdefault('kjøringer', collections.deque(maxlen=HISTORIKK_ANTALL))
+    if historikk and historikk[-1].totalt is None:
+        historikk[-1].avslutt()
+    kjøring = Kjøring(navn, mål_minne, PROFIL_MAPPE)
+    historikk.append(kjøring)
+    return kjøring
+
+
+# Tabell med én rad per seksjon og én kolonne per kjøring (nyeste først), i millisekunder
+def tidstabell(kjøringer):
+    kolonner = {}
+    for nummer, kjøring in enumerate(reversed(kjøringer)):
+        if kjøring.totalt is None:
+            continue
+        tider = {navn: sekunder * 1000 for navn, sekunder in kjøring.spenn_tider.items()}
+        tider["Totalt"] = kjøring.totalt * 1000
+        kolonner[f"{kjøring.navn} -{nummer}" if nummer else f"{kjøring.navn} (nå)"] = tider
+    return kolonner
+
+
+# Allokert minne per seksjon i siste kjøring, i KiB
+def minnetabell(kjøring):
+    return {navn: byte / 1024 for navn, byte in kjøring.allokert.items()}